@@ -1,5 +1,6 @@
 const express = require('express');
 const { spawn } = require('child_process');
+const net = require('net');
 const path = require('path');
 const cors = require('cors');
 
@@ -7,53 +8,167 @@ const app = express();
 app.use(cors());
 app.use(express.json());
 
-app.post('/api/launch-game', async (req, res) => {
-  try {
-    const { game } = req.body;
-    
-    if (game === 'treasure_coin_hunt') {
+const gamePath = path.join(__dirname, 'kid_zone_games', 'Treasure_Coin_Hunt.py');
+
+// The game runs in a resident Python "game host" that keeps pygame and the
+// fonts loaded, so a launch is a socket request instead of a cold start.
+const GAME_HOST_PORT = 3002;
+const GAME_HOST_START_TIMEOUT = 15000;
+const GAME_HOST_REPLY_TIMEOUT = 5000;  // the host answers at once; silence this long means it is stuck
+
+let pygameReady = null;
+let gameHost = null;
+
+function installPygame() {
+  // Install pygame once per server run, not on every launch
+  if (!pygameReady) {
+    pygameReady = new Promise((resolve, reject) => {
       console.log('Installing pygame...');
-      
-      // Install pygame first
-      const pipInstall = spawn('pip', ['install', 'pygame'], { 
+      const pipInstall = spawn('pip', ['install', 'pygame'], {
         stdio: 'pipe',
-        shell: true 
+        shell: true
       });
-      
       pipInstall.on('close', (code) => {
         if (code === 0) {
-          console.log('Pygame installed successfully, launching game...');
-          
-          // Launch the game
-          const gamePath = path.join(__dirname, 'kid_zone_games', 'Treasure_Coin_Hunt.py');
-          const python = spawn('python', [gamePath], { 
-            detached: true,
-            stdio: 'ignore',
-            shell: true 
-          });
-          
-          python.unref();
-          res.json({ success: true, message: 'Game launched successfully!' });
+          console.log('Pygame installed successfully');
+          resolve();
         } else {
-          res.status(500).json({ success: false, message: 'Failed to install pygame' });
+          reject(new Error('Failed to install pygame'));
         }
       });
-      
-      pipInstall.on('error', (error) => {
-        console.error('Error installing pygame:', error);
-        res.status(500).json({ success: false, message: 'Error installing pygame' });
-      });
+      pipInstall.on('error', reject);
+    }).catch((error) => {
+      pygameReady = null;  // try again on the next launch
+      throw error;
+    });
+  }
+  return pygameReady;
+}
+
+function startGameHost() {
+  if (gameHost) {
+    return;
+  }
+  console.log('Starting game host...');
+  // no shell, so gameHost.kill() reaches Python itself
+  gameHost = spawn('python', [gamePath, '--host', String(GAME_HOST_PORT)], {
+    stdio: 'inherit'
+  });
+  gameHost.on('exit', () => {
+    gameHost = null;
+  });
+}
+
+// Send one request to the game host and resolve with its first reply.
+// Later replies (the time to first frame) are only logged.
+function askGameHost(request) {
+  return new Promise((resolve, reject) => {
+    const socket = net.createConnection({ host: '127.0.0.1', port: GAME_HOST_PORT });
+    let buffer = '';
+    let answered = false;
+    const fail = (error) => {
+      if (!answered) {
+        answered = true;
+        socket.destroy();
+        reject(error);
+      }
+    };
+    socket.setEncoding('utf8');
+    socket.setTimeout(GAME_HOST_REPLY_TIMEOUT, () => fail(new Error('Game host did not reply')));
+    socket.on('connect', () => socket.write(JSON.stringify(request) + '\n'));
+    socket.on('data', (data) => {
+      buffer += data;
+      let newline;
+      while ((newline = buffer.indexOf('\n')) >= 0) {
+        const line = buffer.slice(0, newline);
+        buffer = buffer.slice(newline + 1);
+        let message;
+        try {
+          message = JSON.parse(line);
+        } catch (error) {
+          // a bad line must not throw out of the event handler and take the server down
+          if (!answered) {
+            fail(new Error(`Bad reply from game host: ${error.message}`));
+          } else {
+            console.error('Ignoring bad message from game host:', error.message);
+          }
+          continue;
+        }
+        if (!answered) {
+          answered = true;
+          socket.setTimeout(0);  // the connection may stay open for the first_frame report
+          resolve(message);
+        } else if (message.event === 'first_frame') {
+          console.log(`Game window ready in ${message.ms} ms`);
+        }
+      }
+    });
+    socket.on('error', fail);
+    // e.g. the host crashed or exited after accepting the connection
+    socket.on('close', () => fail(new Error('Game host closed the connection without replying')));
+  });
+}
+
+async function waitForGameHost() {
+  const deadline = Date.now() + GAME_HOST_START_TIMEOUT;
+  for (;;) {
+    try {
+      return await askGameHost({ cmd: 'ping' });
+    } catch (error) {
+      if (Date.now() > deadline) {
+        throw new Error('Game host did not start');
+      }
+      await new Promise((resolve) => setTimeout(resolve, 100));
+    }
+  }
+}
+
+async function launchTreasureHunt() {
+  await installPygame();
+  try {
+    return await askGameHost({ cmd: 'start' });
+  } catch (error) {
+    // No host listening yet (first launch, or it exited) - start one
+    startGameHost();
+    await waitForGameHost();
+    return askGameHost({ cmd: 'start' });
+  }
+}
+
+app.post('/api/launch-game', async (req, res) => {
+  try {
+    const { game } = req.body;
+
+    if (game === 'treasure_coin_hunt') {
+      const reply = await launchTreasureHunt();
+      if (reply.ok) {
+        res.json({ success: true, message: 'Game launched successfully!' });
+      } else if (reply.error === 'busy') {
+        res.status(409).json({ success: false, message: 'The game is already open' });
+      } else {
+        res.status(500).json({ success: false, message: 'Failed to launch game' });
+      }
     } else {
       res.status(400).json({ success: false, message: 'Unknown game' });
     }
   } catch (error) {
     console.error('Error launching game:', error);
-    res.status(500).json({ success: false, message: 'Internal server error' });
+    res.status(500).json({ success: false, message: error.message || 'Internal server error' });
   }
 });
 
 const PORT = 3001;
 app.listen(PORT, () => {
   console.log(`Game launcher server running on port ${PORT}`);
-  console.log('Ready to launch games!');
-});
\ No newline at end of file
+  // Warm the game host up front so the first launch is fast too
+  installPygame()
+    .then(startGameHost)
+    .then(() => console.log('Ready to launch games!'))
+    .catch((error) => console.error('Game host not started:', error.message));
+});
+
+process.on('exit', () => {
+  if (gameHost) {
+    gameHost.kill();
+  }
+});
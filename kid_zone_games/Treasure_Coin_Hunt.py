@@ -46,18 +46,33 @@ Level 4+: Bigger puzzles and bonus rewards
 - Try your best — every attempt teaches you something!
 """
 
+import time
+IMPORT_TIME = time.perf_counter()  # start of the time-to-first-frame measurement
+
 import pygame
 import random
 import math
-import time
-from collections import defaultdict
-
-pygame.init()
-pygame.mixer.init()  # optional sound channel
+import os
+import atexit
+import functools
+import itertools
+import json
+import mmap
+import queue
+import struct
+import threading
+from array import array
+from collections import Counter, defaultdict, deque, OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # optional - only used to speed things up
+    np = None
 
 # --------- CONSTANTS & COLORS ----------
 WIDTH, HEIGHT = 960, 640
 FPS = 60
+TICK = 1.0 / 60  # fixed simulation step; speeds are per tick, whatever the frame rate
 
 # Retro / treasure room palette
 BG = (18, 18, 30)
@@ -68,17 +83,73 @@ GOLD = (238, 201, 75)
 BAD = (235, 64, 52)
 WHITE = (245, 245, 245)
 
-FONT = pygame.font.SysFont("freesans", 20)
-BIGFONT = pygame.font.SysFont("freesans", 36)
-TITLEFONT = pygame.font.SysFont("freesans", 48)
+FONT_NAME = "freesans"
+FONT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "treasure_coin_hunt", "fonts.json")
+
+# set by init() and open_window(), so importing the module stays cheap
+FONT = BIGFONT = TITLEFONT = None
+screen = None
+clock = None
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Treasure Coin Hunt")
+def find_font(name):
+    """Path of a system font (None for pygame's default font).
 
-clock = pygame.time.Clock()
+    pygame.font.SysFont scans every installed font on each start; the
+    answer is kept in FONT_CACHE_FILE so later starts skip the scan.
+    """
+    try:
+        with open(FONT_CACHE_FILE) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    path = cache.get(name, "")
+    if path is None or (path and os.path.exists(path)):
+        return path
+    path = pygame.font.match_font(name)
+    cache[name] = path
+    try:
+        os.makedirs(os.path.dirname(FONT_CACHE_FILE), exist_ok=True)
+        with open(FONT_CACHE_FILE, "w") as f:
+            json.dump(cache, f)
+    except OSError:
+        pass  # no cache this time, the scan just runs again next start
+    return path
+
+def init():
+    """Start pygame and load the fonts; later calls do nothing."""
+    global FONT, BIGFONT, TITLEFONT, clock
+    if FONT is not None:
+        return
+    pygame.init()
+    try:
+        pygame.mixer.init()  # optional sound channel
+    except pygame.error:
+        pass  # no audio device - SOUNDS stays silent
+    path = find_font(FONT_NAME)
+    FONT = pygame.font.Font(path, 20)
+    BIGFONT = pygame.font.Font(path, 36)
+    TITLEFONT = pygame.font.Font(path, 48)
+    clock = pygame.time.Clock()
+
+def open_window():
+    global screen
+    init()
+    if screen is None or not pygame.display.get_init():
+        pygame.display.init()
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Treasure Coin Hunt")
+    return screen
+
+def close_window():
+    """Close the window but keep pygame, the fonts and the caches warm."""
+    global screen
+    pygame.display.quit()
+    screen = None
 
 # --------- GAME SETTINGS ----------
 START_LIVES = 3
+SPAWN = (80, HEIGHT-120)  # player's top-left at the start of every level
+PLAYER_SIZE = 32
 
 # Indian-like coin/note denominations (for recognition)
 LEVEL_DENOMS = {
@@ -88,6 +159,14 @@ LEVEL_DENOMS = {
     4: [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000],  # bigger puzzles
 }
 
+# Treasure slot targets per level (progressive difficulty)
+SLOT_TARGETS = {
+    1: [5, 10, 15],
+    2: [15, 25, 35, 50],
+    3: [30, 50, 75, 100],
+    4: [50, 100, 150, 200, 250],
+}
+
 # Rewards - unlocked cosmetics and achievements
 UNLOCKS = {
     "chests_unlocked": 0,
@@ -97,6 +176,17 @@ UNLOCKS = {
     "stars": 0,
 }
 
+# Coin placement budget - level generation must finish quickly even when the
+# board is crowded; if it runs out the level just gets fewer coins
+PLACEMENT_BATCH = 256  # candidate positions drawn and wall-tested per batch
+PLACEMENT_MAX_ATTEMPTS = 6000  # candidate positions per level
+PLACEMENT_TIME_BUDGET = 0.025  # seconds per level
+
+MAX_TICKS_PER_FRAME = 30  # after a longer stall, drop simulated time rather than catch up
+IDLE_AFTER = 1.0  # seconds without input before the redraw rate drops
+IDLE_MAX_WAIT = 0.25  # longest an idle frame sleeps when no input arrives
+HINT_AFTER = 8.0  # seconds without moving or acting before a hint shows the way
+
 # Badge system
 BADGE_REQUIREMENTS = {
     "Perfect Streak": "no_mistakes_level",
@@ -107,8 +197,56 @@ BADGE_REQUIREMENTS = {
 }
 
 # --------- UTILITIES ----------
-def draw_text(surf, text, pos, font=FONT, color=WHITE, center=False):
-    txt = font.render(str(text), True, color)
+class TextCache:
+    """Bounded LRU cache of rendered text surfaces.
+
+    Almost every label in the game (HUD, slot labels, coin values, inventory)
+    is the same from one frame to the next, so rasterizing it again with
+    font.render() is wasted work. Surfaces are keyed by
+    (text, font, color, antialias) and the least recently used one is dropped
+    once the cache is full.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, text, font, color, antialias=True):
+        key = (text, font, tuple(color), antialias)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+            self.evictions += 1
+        return surf
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.surfaces),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+TEXT_CACHE = TextCache()
+
+def draw_text(surf, text, pos, font=None, color=WHITE, center=False):
+    txt = TEXT_CACHE.render(str(text), font or FONT, color)
     rect = txt.get_rect()
     if center:
         rect.center = pos
@@ -120,18 +258,444 @@ def draw_text(surf, text, pos, font=FONT, color=WHITE, center=False):
 def clamp(n, a, b):
     return max(a, min(b, n))
 
+VERSIONS = itertools.count(1)  # shared, so versions of different objects never collide
+
+def next_version():
+    return next(VERSIONS)
+
+class Widget:
+    """A piece of UI kept rendered in a surface of its own (retained mode).
+
+    Subclasses implement key(state), which changes whenever the widget would
+    look different (mostly version counters bumped by the state it shows),
+    bounds(state), the screen rect it covers, and paint(surf, state, ox, oy),
+    which draws it onto a surface whose top-left is screen point (ox, oy).
+    draw() only repaints when the key changed; otherwise it is one blit.
+    """
+
+    def __init__(self):
+        self.surface = None
+        self.surface_rect = None  # where the surface goes on screen
+        self.drawn_key = None
+        self.renders = 0
+
+    def render(self, state=None):
+        key = self.key(state)
+        if self.surface is None or key != self.drawn_key:
+            rect = self.bounds(state)
+            if self.surface is None or self.surface.get_size() != rect.size:
+                self.surface = pygame.Surface(rect.size, pygame.SRCALPHA)
+            else:
+                self.surface.fill((0, 0, 0, 0))
+            self.paint(self.surface, state, rect.x, rect.y)
+            self.surface_rect = rect
+            self.drawn_key = key
+            self.renders += 1
+        return self.surface
+
+    def draw(self, surf, state=None):
+        image = self.render(state)
+        surf.blit(image, self.surface_rect)
+
 # Simple beep sounds (if desired)
+class SoundBank:
+    """Beep tones synthesized once and played through a fixed channel pool.
+
+    Building a sine wave with numpy and a new Sound object on every beep
+    stalls the frame it happens in, so each (freq, duration) tone is
+    synthesized once (up front via preload() or on first use) and reused.
+    At most `polyphony` beeps play at a time; when every channel is busy
+    the oldest one is cut off. If numpy or the mixer is unavailable the
+    bank goes silent for good instead of retrying on every call.
+    """
+
+    # every tone the game plays
+    TONES = [(300, 80), (650, 80), (220, 120), (800, 90), (250, 80), (550, 70), (240, 120), (600, 70)]
+
+    def __init__(self, polyphony=4, volume=4096):
+        self.polyphony = polyphony
+        self.volume = volume
+        self.sounds = {}
+        self.channels = []
+        self.next_channel = 0
+        self.enabled = None  # None = not initialised yet, False = silent
+
+    def _init(self):
+        try:
+            import numpy as np
+            mixer = pygame.mixer.get_init()
+            if not mixer:
+                raise RuntimeError("mixer not initialised")
+        except Exception:
+            self.enabled = False  # numpy might not be installed - just skip sound
+            return False
+        self.np = np
+        self.samplerate, _, self.mixer_channels = mixer
+        pygame.mixer.set_reserved(self.polyphony)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.polyphony)]
+        self.enabled = True
+        return True
+
+    def _synth(self, freq, duration_ms):
+        np = self.np
+        t = np.linspace(0, duration_ms/1000, int(self.samplerate * duration_ms/1000), False)
+        wave = (self.volume * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+        if self.mixer_channels > 1:
+            wave = np.ascontiguousarray(np.repeat(wave[:, None], self.mixer_channels, axis=1))
+        return pygame.sndarray.make_sound(wave)
+
+    def get(self, freq, duration_ms):
+        if self.enabled is None and not self._init():
+            return None
+        if not self.enabled:
+            return None
+        key = (freq, duration_ms)
+        sound = self.sounds.get(key)
+        if sound is None:
+            try:
+                sound = self._synth(freq, duration_ms)
+            except Exception:
+                self.enabled = False
+                return None
+            self.sounds[key] = sound
+        return sound
+
+    def preload(self, tones=None):
+        for freq, duration_ms in tones or self.TONES:
+            if self.get(freq, duration_ms) is None:
+                break
+
+    def play(self, freq, duration_ms):
+        sound = self.get(freq, duration_ms)
+        if sound is None:
+            return
+        for ch in self.channels:
+            if not ch.get_busy():
+                ch.play(sound)
+                return
+        # polyphony limit reached: steal channels round-robin
+        self.channels[self.next_channel].play(sound)
+        self.next_channel = (self.next_channel + 1) % len(self.channels)
+
+SOUNDS = SoundBank()
+
 def beep(freq=440, duration_ms=80):
-    # create a simple sound using pygame.sndarray (if available)
-    try:
-        import numpy as np
-        samplerate = 44100
-        t = np.linspace(0, duration_ms/1000, int(samplerate * duration_ms/1000), False)
-        wave = 4096 * np.sin(2 * np.pi * freq * t)
-        sound = pygame.sndarray.make_sound(wave.astype(np.int16))
-        sound.play()
-    except Exception:
-        pass  # numpy might not be installed - just skip sound
+    SOUNDS.play(freq, duration_ms)
+
+# --------- PROFILING ----------
+class FrameProfiler:
+    """Per-phase frame timings in fixed-size ring buffers.
+
+    The main loop calls start_frame(), then lap(phase) after each phase and
+    end_frame(); lap() charges the time since the previous lap to `phase`.
+    While disabled every call returns straight away. F3 toggles an overlay
+    with p50/p95/p99 per phase, and dump() writes the samples as CSV or JSON.
+    """
+
+    PHASES = ("wait", "events", "move", "pickup", "level", "draw", "present")
+    OVERLAY_POS = (12, 112)
+    OVERLAY_REFRESH = 0.5  # seconds between overlay text updates
+
+    def __init__(self, size=600, enabled=False):
+        self.size = size
+        self.enabled = enabled
+        self.show_overlay = False
+        self.slot = {phase: i for i, phase in enumerate(self.PHASES)}
+        self.samples = [array("d", bytes(8 * size)) for _ in self.PHASES]
+        self.current = [0.0] * len(self.PHASES)
+        self.frames = 0  # frames recorded so far
+        self.last = 0.0
+        self.recording = False
+        self.overlay_lines = []
+        self.overlay_version = 0
+        self.overlay_time = 0.0
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        self.enabled = self.enabled or self.show_overlay
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.current = [0.0] * len(self.PHASES)
+        self.recording = True
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        if not self.recording:
+            return
+        now = time.perf_counter()
+        self.current[self.slot[phase]] += now - self.last
+        self.last = now
+
+    def skip_frame(self):
+        """Drop the current frame (e.g. one that showed a blocking overlay screen)."""
+        self.recording = False
+
+    def end_frame(self):
+        if not self.recording:
+            return
+        self.recording = False
+        i = self.frames % self.size
+        for samples, value in zip(self.samples, self.current):
+            samples[i] = value
+        self.frames += 1
+
+    def recorded(self):
+        """Samples per phase, oldest first, plus the busy (non-wait) frame time."""
+        n = min(self.frames, self.size)
+        start = self.frames % self.size if self.frames > self.size else 0
+        series = {}
+        for phase, samples in zip(self.PHASES, self.samples):
+            series[phase] = list(samples[start:n]) + list(samples[:start])
+        work = [series[phase] for phase in self.PHASES if phase != "wait"]
+        series["busy"] = [sum(frame) for frame in zip(*work)]
+        return series
+
+    @staticmethod
+    def percentile(sorted_values, q):
+        if not sorted_values:
+            return 0.0
+        return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+    def summary(self):
+        """{phase: {"p50", "p95", "p99", "mean"}} in milliseconds."""
+        result = {}
+        for phase, values in self.recorded().items():
+            values = sorted(values)
+            result[phase] = {
+                "p50": self.percentile(values, 0.50) * 1000,
+                "p95": self.percentile(values, 0.95) * 1000,
+                "p99": self.percentile(values, 0.99) * 1000,
+                "mean": (sum(values) / len(values) * 1000) if values else 0.0,
+            }
+        return result
+
+    def overlay_rect(self):
+        return pygame.Rect(self.OVERLAY_POS, (250, 20 * (len(self.PHASES) + 3)))
+
+    def update_overlay(self):
+        """Recompute the overlay text at most every OVERLAY_REFRESH seconds."""
+        now = time.perf_counter()
+        if self.overlay_lines and now - self.overlay_time < self.OVERLAY_REFRESH:
+            return
+        self.overlay_time = now
+        summary = self.summary()
+        self.overlay_lines = [("ms", "p50", "p95", "p99")]
+        for phase in self.PHASES + ("busy",):
+            st = summary[phase]
+            self.overlay_lines.append((phase, f"{st['p50']:.2f}", f"{st['p95']:.2f}", f"{st['p99']:.2f}"))
+        self.overlay_version += 1
+
+    def draw_overlay(self, surf):
+        rect = self.overlay_rect()
+        pygame.draw.rect(surf, (10, 10, 16), rect)
+        pygame.draw.rect(surf, SUB, rect, 1)
+        for i, row in enumerate(self.overlay_lines):
+            for x, cell in zip((8, 100, 150, 200), row):
+                draw_text(surf, cell, (rect.x + x, rect.y + 4 + i*20), font=FONT, color=ACCENT if i == 0 else WHITE)
+
+    def dump(self, path):
+        """Write the recorded frames to `path` (.json for JSON, anything else CSV)."""
+        series = self.recorded()
+        names = list(self.PHASES) + ["busy"]
+        rows = list(zip(*(series[name] for name in names)))
+        with open(path, "w", newline="") as f:
+            if path.endswith(".json"):
+                json.dump({"phases": names, "summary_ms": self.summary(), "frames_s": rows}, f, indent=1)
+            else:
+                f.write(",".join(["frame"] + names) + "\n")
+                for i, row in enumerate(rows):
+                    f.write(",".join([str(i)] + [f"{v:.6f}" for v in row]) + "\n")
+
+PROFILER = FrameProfiler()
+
+def no_lap(phase):
+    """Phase callback for GameState.step when nothing is being profiled."""
+
+# --------- SPRITE ATLAS ----------
+# Painters for everything drawn once per entity per frame. Each paints its
+# sprite around an anchor point (a coin's centre, the player's top-left);
+# the *_bounds functions give the rect it covers relative to that anchor.
+def paint_coin(surf, pos, kind, value, fake):
+    radius = COIN_RADIUS[kind]
+    if kind == "coin":
+        pygame.draw.circle(surf, GOLD if not fake else SUB, pos, radius)
+        # opaque: the ring's alpha of 30 never showed on the screen, which has no alpha channel
+        pygame.draw.circle(surf, (255, 255, 255), pos, int(radius*0.85), 2)
+        draw_text(surf, f"₹{value}", (pos[0]-12, pos[1]-11), font=FONT if radius<22 else BIGFONT, color=(20,20,30))
+    else:
+        # note
+        r = pygame.Rect(pos[0]-radius, pos[1]-radius, radius*2, radius*2)
+        pygame.draw.rect(surf, (80,150,100) if not fake else (120,120,120), r, border_radius=6)
+        pygame.draw.rect(surf, (40,40,60), r, 2, border_radius=6)
+        draw_text(surf, f"₹{value}", (r.centerx-18, r.centery-12), font=FONT, color=WHITE)
+
+def coin_bounds(kind, value, fake):
+    radius = COIN_RADIUS[kind]
+    rect = pygame.Rect(-radius, -radius, radius*2, radius*2)
+    if kind == "coin":
+        return rect.union(text_rect(f"₹{value}", (-12, -11), font=FONT if radius<22 else BIGFONT, color=(20,20,30)))
+    return rect.union(text_rect(f"₹{value}", (-18, -12)))
+
+def paint_drag(surf, pos, kind, value, fake):
+    # the coin under the mouse: plainer than on the board
+    radius = COIN_RADIUS[kind]
+    mx, my = pos
+    if kind == "coin":
+        pygame.draw.circle(surf, GOLD if not fake else SUB, (mx,my), radius)
+        draw_text(surf, f"₹{value}", (mx-18, my-10), font=FONT, color=(10,10,10))
+    else:
+        rr = pygame.Rect(mx-radius, my-radius, radius*2, radius*2)
+        pygame.draw.rect(surf, (80,150,100) if not fake else (120,120,120), rr, border_radius=6)
+        draw_text(surf, f"₹{value}", (rr.x+8, rr.y+6), font=FONT, color=WHITE)
+
+def drag_bounds(kind, value, fake):
+    radius = COIN_RADIUS[kind]
+    rect = pygame.Rect(-radius, -radius, radius*2, radius*2)
+    if kind == "coin":
+        return rect.union(text_rect(f"₹{value}", (-18, -10), color=(10,10,10)))
+    return rect.union(text_rect(f"₹{value}", (rect.x+8, rect.y+6)))
+
+def paint_icon(surf, pos, value, fake):
+    # inventory coin
+    pygame.draw.circle(surf, GOLD if not fake else SUB, pos, 18)
+    draw_text(surf, f"₹{value}", (pos[0]-14, pos[1]-8), font=FONT, color=(10,10,10))
+
+def icon_bounds(value, fake):
+    return pygame.Rect(-18, -18, 36, 36).union(text_rect(f"₹{value}", (-14, -8), color=(10,10,10)))
+
+def paint_slot_icon(surf, pos, value):
+    pygame.draw.circle(surf, GOLD, pos, 10)
+    draw_text(surf, str(value), (pos[0]-8, pos[1]-8), font=FONT, color=(10,10,10))
+
+def slot_icon_bounds(value):
+    return pygame.Rect(-10, -10, 20, 20).union(text_rect(str(value), (-8, -8), color=(10,10,10)))
+
+def paint_player(surf, pos, size, color):
+    rect = pygame.Rect(pos, (size, size))
+    # friendly cartoon square
+    pygame.draw.rect(surf, color, rect, border_radius=6)
+    # face (eyes, smile)
+    eye_r = 3
+    ex = rect.x + size*0.3
+    ey = rect.y + size*0.35
+    pygame.draw.circle(surf, (30, 30, 40), (int(ex), int(ey)), eye_r)
+    pygame.draw.circle(surf, (30, 30, 40), (int(rect.x + size*0.7), int(ey)), eye_r)
+    pygame.draw.arc(surf, (30, 30, 40), (rect.x + size*0.25, rect.y + size*0.45, size*0.5, size*0.4), math.pi/8, math.pi-math.pi/8, 2)
+
+def player_bounds(size, color):
+    return pygame.Rect(0, 0, size, size)
+
+SPRITES = {
+    "coin": (coin_bounds, paint_coin),  # (kind, value, fake)
+    "drag": (drag_bounds, paint_drag),  # (kind, value, fake)
+    "icon": (icon_bounds, paint_icon),  # (value, fake)
+    "slot_icon": (slot_icon_bounds, paint_slot_icon),  # (value,)
+    "player": (player_bounds, paint_player),  # (size, color)
+}
+
+class SpriteAtlas:
+    """Every coin, note, icon and player sprite pre-rendered into one surface.
+
+    Sprites are keyed by (name, *args) - ("coin", "note", 50, False) - and
+    painted once into a shelf-packed region of the atlas. Drawing a layer is
+    then a single Surface.blits() call with one (atlas, dest, area) entry per
+    entity, instead of a handful of pygame.draw and text calls each. When
+    the atlas fills up it is cleared and refilled, like TextCache.
+    """
+
+    PAD = 2  # transparent margin, so rounding in pygame.draw never crosses sprites
+
+    def __init__(self, size=(1024, 512)):
+        self.size = size
+        self.surface = None
+        self.sprites = {}  # key -> (area in the atlas, anchor offset)
+        self.shelf = (0, 0, 0)  # x, y, height of the row being filled
+        self.prepared = None  # coin store the level's sprites were made for
+        self.board_key = None
+        self.board_entries = []
+        self.clears = 0
+        self.batches = 0
+
+    def clear(self):
+        if self.surface is None:
+            self.surface = pygame.Surface(self.size, pygame.SRCALPHA)
+            if pygame.display.get_surface() is not None:
+                self.surface = self.surface.convert_alpha()  # the screen's pixel format blits fastest
+        else:
+            self.clears += 1
+        self.surface.fill((0, 0, 0, 0))
+        self.sprites.clear()
+        self.shelf = (0, 0, 0)
+
+    def allocate(self, w, h):
+        x, y, shelf_h = self.shelf
+        if x + w > self.size[0]:
+            x, y, shelf_h = 0, y + shelf_h, 0
+        if y + h > self.size[1] or w > self.size[0]:
+            return None
+        self.shelf = (x + w, y, max(shelf_h, h))
+        return pygame.Rect(x, y, w, h)
+
+    def sprite(self, key):
+        found = self.sprites.get(key)
+        if found is None:
+            if self.surface is None:
+                self.clear()
+            bounds_of, paint = SPRITES[key[0]]
+            bounds = bounds_of(*key[1:]).inflate(self.PAD*2, self.PAD*2)
+            area = self.allocate(*bounds.size)
+            if area is None:
+                self.clear()
+                area = self.allocate(*bounds.size)
+            self.surface.set_clip(area)
+            paint(self.surface, (area.x - bounds.x, area.y - bounds.y), *key[1:])
+            self.surface.set_clip(None)
+            found = self.sprites[key] = (area, bounds.topleft)
+        return found
+
+    def prepare(self, state):
+        """Render the sprites a new board needs up front (once per level)."""
+        if state.coin_store is self.prepared:
+            return
+        self.prepared = state.coin_store
+        self.sprite(("player", state.player.size, state.player.color))
+        for value, kind, fake in {(c.value, c.kind, c.fake) for c in state.coin_store}:
+            self.sprite(("coin", kind, value, fake))
+            self.sprite(("drag", kind, value, fake))
+            self.sprite(("icon", value, fake))
+            self.sprite(("slot_icon", value))
+
+    def batch(self, items):
+        """Surface.blits() entries for (sprite key, anchor point) pairs."""
+        clears = self.clears
+        entries = []
+        for key, (x, y) in items:
+            area, (ox, oy) = self.sprite(key)
+            entries.append((self.surface, (x + ox, y + oy), area))
+        if self.clears != clears:
+            return self.batch(items)  # the atlas refilled part way through; earlier areas are stale
+        return entries
+
+    def draw(self, surf, items):
+        self.draw_batch(surf, self.batch(items))
+
+    def draw_batch(self, surf, entries):
+        self.batches += 1
+        surf.blits(entries, doreturn=False)
+
+    def board_batch(self, state):
+        """Entries for the coins lying on the board, rebuilt only when the board changes."""
+        store = state.coin_store
+        dragged = state.holding if state.drag_mode else None
+        key = (store, store.version, len(state.coins), dragged, self.clears)
+        if key != self.board_key:
+            self.board_entries = self.batch([(coin.sprite(), (coin.x, coin.y)) for coin in state.coins if coin is not dragged])
+            self.board_key = (store, store.version, len(state.coins), dragged, self.clears)
+        return self.board_entries
+
+ATLAS = SpriteAtlas()
 
 # --------- GAME OBJECTS ----------
 class Wall(pygame.sprite.Sprite):
@@ -143,23 +707,89 @@ class Wall(pygame.sprite.Sprite):
         pygame.draw.rect(surf, (40, 40, 70), self.rect)
         pygame.draw.rect(surf, (60, 60, 90), self.rect, 2)
 
+class EntitySet:
+    """Game objects keyed by id(), in insertion order, with O(1) add, remove
+    and membership.
+
+    A subset of them is "active" (for board coins: not yet collected) and can
+    be iterated on its own without scanning the rest; deactivate() and
+    activate() move an entity in and out of it, also in O(1).
+    """
+
+    def __init__(self, entities=(), active=None):
+        self.items = {id(e): e for e in entities}
+        self.active_items = dict(self.items) if active is None else {id(e): e for e in active}
+
+    def add(self, entity):
+        self.items[id(entity)] = entity
+        self.active_items[id(entity)] = entity
+
+    def remove(self, entity):
+        del self.items[id(entity)]
+        self.active_items.pop(id(entity), None)
+
+    def discard(self, entity):
+        if id(entity) in self.items:
+            self.remove(entity)
+
+    def activate(self, entity):
+        if id(entity) in self.items:
+            self.active_items[id(entity)] = entity
+
+    def deactivate(self, entity):
+        self.active_items.pop(id(entity), None)
+
+    def active(self):
+        return iter(self.active_items.values())
+
+    def at(self, index):
+        """The index-th entity in insertion order (for UI positions)."""
+        return next(itertools.islice(self.items.values(), index, None))
+
+    def __contains__(self, entity):
+        return id(entity) in self.items
+
+    def __iter__(self):
+        return iter(self.items.values())
+
+    def __len__(self):
+        return len(self.items)
+
+class Inventory(EntitySet):
+    """The player's coins; `version` changes whenever one is added or taken."""
+
+    def __init__(self, coins=()):
+        super().__init__(coins)
+        self.version = next_version()
+
+    def add(self, coin):
+        super().add(coin)
+        self.version = next_version()
+
+    def remove(self, coin):
+        super().remove(coin)
+        self.version = next_version()
+
 class Player(pygame.sprite.Sprite):
-    def __init__(self, x, y, size=32):
+    def __init__(self, x, y, size=PLAYER_SIZE):
         super().__init__()
         self.size = size
         self.rect = pygame.Rect(x, y, size, size)
-        self.speed = 3
+        self.prev_pos = self.rect.topleft  # position before the last tick, for interpolation
+        self.speed = 3  # pixels per tick
         self.color = (120, 200, 255)
-        self.inventory = []  # coins typed correctly and held (list of Coin)
+        self.inventory = Inventory()  # coins typed correctly and held
         self.coins_collected = 0
         self.moves = 0
 
     def move(self, dx, dy, walls):
+        self.prev_pos = self.rect.topleft
         if dx == 0 and dy == 0:
             return
         new_rect = self.rect.move(dx, dy)
-        # collision detection with walls
-        for w in walls:
+        # collision detection with walls (a SpatialGrid only hands back nearby walls)
+        nearby = walls.query(new_rect) if isinstance(walls, SpatialGrid) else walls
+        for w in nearby:
             if w.rect.colliderect(new_rect):
                 # Try axis separation to allow sliding
                 if dx != 0:
@@ -170,69 +800,441 @@ class Player(pygame.sprite.Sprite):
         self.rect = new_rect
         self.moves += 1
 
-    def draw(self, surf):
-        # friendly cartoon square
-        pygame.draw.rect(surf, self.color, self.rect, border_radius=6)
-        # face (eyes, smile)
-        eye_r = 3
-        ex = self.rect.x + self.size*0.3
-        ey = self.rect.y + self.size*0.35
-        pygame.draw.circle(surf, (30, 30, 40), (int(ex), int(ey)), eye_r)
-        pygame.draw.circle(surf, (30, 30, 40), (int(self.rect.x + self.size*0.7), int(ey)), eye_r)
-        pygame.draw.arc(surf, (30, 30, 40), (self.rect.x + self.size*0.25, self.rect.y + self.size*0.45, self.size*0.5, self.size*0.4), math.pi/8, math.pi-math.pi/8, 2)
-
-class Coin(pygame.sprite.Sprite):
-    def __init__(self, x, y, value, kind="coin"):
-        super().__init__()
-        self.value = value
-        self.kind = kind  # coin or note or fake
-        self.radius = 18 if kind=="coin" else 26
-        self.rect = pygame.Rect(x-self.radius, y-self.radius, self.radius*2, self.radius*2)
-        # Random small wobble for style
-        self.angle = random.uniform(0, 2*math.pi)
-        self.collected = False
-        self.fake = False
+    def draw_rect(self, alpha=1.0):
+        """Where to draw the player, `alpha` of the way from the previous tick to the last."""
+        if alpha >= 1.0 or self.prev_pos == self.rect.topleft:
+            return self.rect.copy()
+        px, py = self.prev_pos
+        return pygame.Rect(round(px + (self.rect.x - px) * alpha), round(py + (self.rect.y - py) * alpha), self.size, self.size)
+
+    def draw(self, surf, rect=None):
+        rect = rect or self.rect
+        ATLAS.draw(surf, [(("player", self.size, self.color), rect.topleft)])
+
+class Coin:
+    """A coin or note - a view onto one row of a CoinStore.
+
+    The board's coins share one store; Coin(x, y, value) on its own gets a
+    store of its own. Views are created once per coin, so identity checks
+    (`coin is state.holding`) keep working.
+    """
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, x, y, value, kind="coin", fake=False, store=None):
+        (store if store is not None else CoinStore()).append(self, x, y, value, kind, fake)
+
+    @property
+    def x(self):
+        return int(self.store.x[self.index])
+
+    @property
+    def y(self):
+        return int(self.store.y[self.index])
+
+    @property
+    def radius(self):
+        return int(self.store.radius[self.index])
+
+    @property
+    def kind(self):
+        return COIN_KINDS[self.store.kind[self.index]]  # coin or note
+
+    @property
+    def value(self):
+        return int(self.store.value[self.index])
+
+    @value.setter
+    def value(self, value):
+        self.store.set(self.index, "value", value)
+
+    @property
+    def fake(self):
+        return bool(self.store.fake[self.index])
+
+    @fake.setter
+    def fake(self, fake):
+        self.store.set(self.index, "fake", fake)
+
+    @property
+    def collected(self):
+        return bool(self.store.collected[self.index])
+
+    @collected.setter
+    def collected(self, collected):
+        self.store.set_collected(self.index, collected)
+
+    @property
+    def rect(self):
+        r = self.radius
+        return pygame.Rect(self.x-r, self.y-r, r*2, r*2)
+
+    def move_to(self, pos):
+        self.store.move(self.index, *pos)
+
+    def sprite(self):
+        return ("coin", self.kind, self.value, self.fake)
 
     def draw(self, surf):
-        # coin style
-        if self.kind == "coin":
-            pygame.draw.circle(surf, GOLD if not self.fake else SUB, self.rect.center, self.radius)
-            pygame.draw.circle(surf, (255, 255, 255, 30), self.rect.center, int(self.radius*0.85), 2)
-            draw_text(surf, f"₹{self.value}", (self.rect.centerx-12, self.rect.centery-11), font=FONT if self.radius<22 else BIGFONT, color=(20,20,30))
-        else:
-            # note
-            r = self.rect
-            pygame.draw.rect(surf, (80,150,100) if not self.fake else (120,120,120), r, border_radius=6)
-            pygame.draw.rect(surf, (40,40,60), r, 2, border_radius=6)
-            draw_text(surf, f"₹{self.value}", (r.centerx-18, r.centery-12), font=FONT, color=WHITE)
+        ATLAS.draw(surf, [(self.sprite(), (self.x, self.y))])
 
 # Slot where coins should be placed to hit target
-class Slot:
+class Slot(Widget):
     def __init__(self, x, y, w, h, target_value):
+        super().__init__()
         self.rect = pygame.Rect(x, y, w, h)
         self.target = target_value
         self.current = 0
-        self.coins_in_slot = []  # coin objects placed in slot
+        self.coins_in_slot = EntitySet()  # coin objects placed in slot
+        self.version = next_version()  # changes with current / coins_in_slot
 
     def accept_coin(self, coin):
         # place coin into slot (no collision physics)
-        self.coins_in_slot.append(coin)
+        self.coins_in_slot.add(coin)
         self.current += coin.value
-
-    def draw(self, surf):
-        pygame.draw.rect(surf, (20, 20, 40), self.rect, border_radius=6)
-        pygame.draw.rect(surf, (50, 60, 100), self.rect, 2, border_radius=6)
-        draw_text(surf, f"Place coins totalling ₹{self.target}", (self.rect.x+8, self.rect.y+6), font=FONT, color=ACCENT)
-        draw_text(surf, f"Current: ₹{self.current}", (self.rect.x+8, self.rect.y+30), font=FONT, color=WHITE)
+        self.version = next_version()
+
+    def key(self, state):
+        return self.version
+
+    def labels(self):
+        return f"Place coins totalling ₹{self.target}", f"Current: ₹{self.current}"
+
+    def bounds(self, state):
+        # labels and coin icons may run past the slot box; keep them whole
+        target, current = self.labels()
+        rect = self.rect.union(text_rect(target, (self.rect.x+8, self.rect.y+6), color=ACCENT))
+        rect.union_ip(text_rect(current, (self.rect.x+8, self.rect.y+30)))
+        if self.coins_in_slot:
+            rect.union_ip(pygame.Rect(self.rect.x+10, self.rect.y, len(self.coins_in_slot)*26 + 10, self.rect.h))
+        return rect
+
+    def paint(self, surf, state, ox, oy):
+        box = self.rect.move(-ox, -oy)
+        target, current = self.labels()
+        pygame.draw.rect(surf, (20, 20, 40), box, border_radius=6)
+        pygame.draw.rect(surf, (50, 60, 100), box, 2, border_radius=6)
+        draw_text(surf, target, (box.x+8, box.y+6), font=FONT, color=ACCENT)
+        draw_text(surf, current, (box.x+8, box.y+30), font=FONT, color=WHITE)
         # draw coin icons inside
-        cx = self.rect.centerx
-        cy = self.rect.centery + 20
-        for i, c in enumerate(self.coins_in_slot):
-            pygame.draw.circle(surf, GOLD, (self.rect.x+20 + i*26, cy), 10)
-            draw_text(surf, str(c.value), (self.rect.x+12 + i*26, cy-8), font=FONT, color=(10,10,10))
+        cy = box.centery + 20
+        ATLAS.draw(surf, [(("slot_icon", c.value), (box.x+20 + i*26, cy)) for i, c in enumerate(self.coins_in_slot)])
+
+# --------- SPATIAL INDEX ----------
+class SpatialGrid:
+    """Uniform grid (spatial hash) over objects that have a .rect.
+
+    Each object is registered in every cell its rect touches, so a query
+    only looks at the handful of objects near the query rect instead of
+    every wall or coin on the board. Built once per level and kept up to
+    date with insert()/remove() as coins are picked up or placed.
+    """
+
+    def __init__(self, items=(), cell_size=64):
+        self.cell_size = cell_size
+        self.cells = defaultdict(dict)  # (cx, cy) -> {item: None}, dict keeps insertion order
+        self.item_cells = {}
+        for item in items:
+            self.insert(item)
+
+    def _cells(self, rect):
+        cs = self.cell_size
+        for cx in range(rect.left // cs, (rect.right - 1) // cs + 1):
+            for cy in range(rect.top // cs, (rect.bottom - 1) // cs + 1):
+                yield cx, cy
+
+    def insert(self, item):
+        if item in self.item_cells:
+            self.remove(item)
+        cells = list(self._cells(item.rect))
+        for key in cells:
+            self.cells[key][item] = None
+        self.item_cells[item] = cells
+
+    def remove(self, item):
+        for key in self.item_cells.pop(item, ()):
+            bucket = self.cells[key]
+            bucket.pop(item, None)
+            if not bucket:
+                del self.cells[key]
+
+    def query(self, rect):
+        """Objects whose rect overlaps `rect`."""
+        found = {}
+        cells = self.cells
+        for key in self._cells(rect):
+            bucket = cells.get(key)
+            if bucket:
+                for item in bucket:
+                    if item not in found and item.rect.colliderect(rect):
+                        found[item] = None
+        return list(found)
+
+    def collides(self, rect):
+        cells = self.cells
+        for key in self._cells(rect):
+            bucket = cells.get(key)
+            if bucket and any(item.rect.colliderect(rect) for item in bucket):
+                return True
+        return False
+
+    def __contains__(self, item):
+        return item in self.item_cells
+
+    def __len__(self):
+        return len(self.item_cells)
+
+# --------- COIN STORE ----------
+COIN_KINDS = ("coin", "note")
+COIN_RADIUS = {"coin": 18, "note": 26}
+
+class CoinStore:
+    """The coins of one board as columns (struct of arrays).
+
+    x, y (centre), radius, value, kind (index into COIN_KINDS), fake and
+    collected live in numpy arrays (array.array without numpy); Coin objects
+    are thin views onto one row. Pickup and placement test all coins in one
+    vectorized pass instead of walking Python objects; without numpy a
+    SpatialGrid over the uncollected coins answers the same queries.
+
+    `version` goes up whenever a coin is added or collected or changes
+    value, so renderers can tell when the board needs redrawing.
+    """
+
+    COLUMNS = (("x", "i"), ("y", "i"), ("radius", "h"), ("value", "i"),
+               ("kind", "b"), ("fake", "b"), ("collected", "b"))
+
+    def __init__(self, capacity=32):
+        self.n = 0
+        self.views = []
+        self.version = 0
+        for name, code in self.COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=code) if np is not None else array(code))
+        self.grid = None if np is not None else SpatialGrid()
+        self.box = np.zeros((capacity, 4), dtype="i") if np is not None else None  # left, top, right, bottom
+        self.collected_count = 0
+
+    @classmethod
+    def gather(cls, coins):
+        """A store holding exactly `coins`: their own store when they share one,
+        otherwise a new one the views are moved into."""
+        coins = list(coins)
+        store = coins[0].store if coins else None
+        if store is not None and store.n == len(coins) and all(c.store is store for c in coins):
+            return store
+        store = cls(max(32, len(coins)))
+        for c in coins:
+            collected = c.collected
+            store.append(c, c.x, c.y, c.value, c.kind, c.fake)
+            if collected:
+                store.set_collected(c.index, True)
+        return store
+
+    def append(self, coin, x, y, value, kind="coin", fake=False):
+        """Add a row for `coin` and point the view at it."""
+        i = self.n
+        row = (x, y, COIN_RADIUS[kind], value, COIN_KINDS.index(kind), int(fake), 0)
+        if np is not None:
+            if i == len(self.x):
+                for name, _ in self.COLUMNS:
+                    column = getattr(self, name)
+                    setattr(self, name, np.concatenate([column, np.zeros_like(column)]))
+                self.box = np.concatenate([self.box, np.zeros_like(self.box)])
+            for (name, _), field in zip(self.COLUMNS, row):
+                getattr(self, name)[i] = field
+            r = row[2]
+            self.box[i] = (x-r, y-r, x+r, y+r)
+        else:
+            for (name, _), field in zip(self.COLUMNS, row):
+                getattr(self, name).append(field)
+        coin.store = self
+        coin.index = i
+        self.views.append(coin)
+        self.n += 1
+        self.version += 1
+        if self.grid is not None:
+            self.grid.insert(coin)
+        return i
+
+    def add(self, x, y, value, kind="coin", fake=False):
+        return Coin(x, y, value, kind, fake, store=self)
+
+    def set(self, i, name, value):
+        getattr(self, name)[i] = value
+        self.version += 1
+
+    def set_collected(self, i, collected):
+        if bool(self.collected[i]) != bool(collected):
+            self.collected_count += 1 if collected else -1
+        self.set(i, "collected", int(collected))
+        if self.grid is not None:
+            if collected:
+                self.grid.remove(self.views[i])
+            else:
+                self.grid.insert(self.views[i])
+
+    def move(self, i, x, y):
+        # not a version change: only the coin being dragged moves, and it is drawn apart from the board
+        self.x[i] = x
+        self.y[i] = y
+        if self.box is not None:
+            r = int(self.radius[i])
+            self.box[i] = (x-r, y-r, x+r, y+r)
+        if self.grid is not None and self.views[i] in self.grid:
+            self.grid.insert(self.views[i])
+
+    def boxes(self):
+        """(left, top, right, bottom) rows for the uncollected coins (numpy only)."""
+        box = self.box[:self.n]
+        return box if not self.collected_count else box[self.collected[:self.n] == 0]
+
+    def overlapping(self, rect):
+        """Uncollected coins whose rect overlaps `rect`, in board order."""
+        if self.grid is not None:
+            return sorted(self.grid.query(rect), key=lambda c: c.index)
+        n = self.n
+        x, y, r = self.x[:n], self.y[:n], self.radius[:n]
+        hit = ((self.collected[:n] == 0) & (x - r < rect.right) & (x + r > rect.left) &
+               (y - r < rect.bottom) & (y + r > rect.top))
+        return [self.views[i] for i in np.flatnonzero(hit)]
+
+    def collides(self, rect):
+        if self.grid is not None:
+            return self.grid.collides(rect)
+        return bool(self.overlapping(rect))
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(self.views)
+
+# --------- REACHABILITY ----------
+REACH_CELL = 8  # occupancy grid resolution in pixels
+
+class ReachMap:
+    """Where the player can walk to from the spawn point.
+
+    The walls are rasterized into an occupancy grid of player positions
+    (top-left corners, REACH_CELL px per cell), each wall inflated by the
+    player's size, so a free cell is one where the whole player fits.
+    Cells that only partly fit count as blocked, so anything reported
+    reachable really is. The flood from the spawn works on whole runs of
+    free cells with numpy: every pass spreads along all rows and then all
+    columns at once, so it takes about as many passes as the winding-est
+    path has turns (a BFS over the cells without numpy).
+    """
+
+    def __init__(self, walls, spawn=SPAWN, size=PLAYER_SIZE):
+        self.size = size
+        self.rows, self.cols = -(-HEIGHT // REACH_CELL), -(-WIDTH // REACH_CELL)
+        self.spawn = (spawn[1] // REACH_CELL, spawn[0] // REACH_CELL)
+        if np is not None:
+            blocked = np.zeros((self.rows, self.cols), dtype=bool)
+            for w in walls:
+                blocked[self.cells(w.rect)] = True
+            self.free = ~blocked
+            self.reach = self._flood_np()
+            # summed-area table: reached cells in any block of cells with four lookups
+            self.table = np.zeros((self.rows + 1, self.cols + 1), dtype=np.int32)
+            self.table[1:, 1:] = self.reach.cumsum(0, dtype=np.int32).cumsum(1)
+            self.area = int(self.table[-1, -1])
+            self.free_area = np.count_nonzero(self.free)
+        else:
+            self.free = [bytearray([1]) * self.cols for _ in range(self.rows)]
+            for w in walls:
+                rows, cols = self.cells(w.rect)
+                for row in self.free[rows]:
+                    row[cols] = bytes(len(range(*cols.indices(self.cols))))
+            self.reach = self._flood_py()
+            self.area = len(self.reach)
+            self.free_area = sum(sum(row) for row in self.free)
+
+    def cells(self, rect):
+        """(rows, cols) slices of the cells in which the player would overlap `rect`."""
+        c, size = REACH_CELL, self.size
+        # a cell [x, x+c) touches the player positions (rect.left - size, rect.right)
+        col0, col1 = max(0, (rect.left - size + 1) // c), max(0, -(-rect.right // c))
+        row0, row1 = max(0, (rect.top - size + 1) // c), max(0, -(-rect.bottom // c))
+        return slice(row0, row1), slice(col0, col1)
+
+    def _flood_np(self):
+        free = self.free
+        reach = np.zeros_like(free)
+        if not free[self.spawn]:
+            return reach
+        reach[self.spawn] = True
+        # label every horizontal and vertical run of free cells (0 = blocked)
+        runs = []
+        for grid in (free, free.T):
+            starts = grid.copy()
+            starts[:, 1:] &= ~grid[:, :-1]
+            labels = np.cumsum(starts.ravel(), dtype=np.int32).reshape(grid.shape) * grid
+            runs.append((labels, labels.max() + 1))
+        # alternate row and column passes; once a pass adds nothing, the last
+        # one left nothing to add the other way either
+        count, axis, first = 1, 0, True
+        while True:
+            labels, n = runs[axis]
+            hit = np.zeros(n, dtype=bool)
+            hit[labels[reach if axis == 0 else reach.T]] = True
+            hit[0] = False
+            reach = hit[labels] if axis == 0 else hit[labels].T
+            new = np.count_nonzero(reach)
+            if new == count and not first:
+                return reach
+            count, axis, first = new, 1 - axis, False
+
+    def _flood_py(self):
+        free, rows, cols = self.free, self.rows, self.cols
+        if not free[self.spawn[0]][self.spawn[1]]:
+            return set()
+        seen = {self.spawn}
+        todo = deque([self.spawn])
+        while todo:
+            r, c = todo.popleft()
+            for nr, nc in ((r, c+1), (r, c-1), (r+1, c), (r-1, c)):
+                if 0 <= nr < rows and 0 <= nc < cols and free[nr][nc] and (nr, nc) not in seen:
+                    seen.add((nr, nc))
+                    todo.append((nr, nc))
+        return seen
+
+    def enclosed(self):
+        """True if the spawn is walled in: the player can't get to most of the open board."""
+        return self.area * 2 < self.free_area
+
+    def reachable(self, rect):
+        """Whether the player can walk from the spawn into contact with `rect`."""
+        rows, cols = self.cells(rect)
+        if np is not None:
+            return bool(self.reach[rows, cols].any())
+        return any((r, c) in self.reach for r in range(*rows.indices(self.rows)) for c in range(*cols.indices(self.cols)))
+
+    def reachable_centres(self, xs, ys, half):
+        """reachable() for squares of half-size `half` around every (xs, ys), at once (numpy only)."""
+        c, size, t = REACH_CELL, self.size, self.table
+        row0 = np.clip((ys - half - size + 1) // c, 0, self.rows)
+        row1 = np.clip(-(-(ys + half) // c), 0, self.rows)
+        col0 = np.clip((xs - half - size + 1) // c, 0, self.cols)
+        col1 = np.clip(-(-(xs + half) // c), 0, self.cols)
+        return (t[row1, col1] - t[row0, col1] - t[row1, col0] + t[row0, col0]) > 0
+
+class Board(tuple):
+    """A board: unpacks as (walls, coins, slots). `reach` is the ReachMap of
+    its walls when the generator built one, so the game need not build it again."""
+
+    def __new__(cls, walls, coins, slots, reach=None):
+        board = super().__new__(cls, (walls, coins, slots))
+        board.reach = reach
+        return board
+
+def board_reachable(walls, coins, reach=None):
+    """True if the spawn is open and every real coin can be walked to."""
+    reach = reach or ReachMap(walls)
+    return not reach.enclosed() and all(c.fake or reach.reachable(c.rect) for c in coins)
 
 # --------- LEVEL GENERATION ----------
-def generate_walls_for_board():
+def generate_walls_for_board(rng=random):
     walls = []
     # outer walls
     thickness = 20
@@ -242,64 +1244,623 @@ def generate_walls_for_board():
     walls.append(Wall(WIDTH-thickness, 0, thickness, HEIGHT))
     # some maze rectangles
     for i in range(5):
-        x = random.randint(120, WIDTH-200)
-        y = random.randint(80, HEIGHT-220)
-        w = random.randint(80, 220)
-        h = random.randint(40, 160)
+        x = rng.randint(120, WIDTH-200)
+        y = rng.randint(80, HEIGHT-220)
+        w = rng.randint(80, 220)
+        h = rng.randint(40, 160)
         walls.append(Wall(x, y, w, h))
     return walls
 
-def generate_coins_for_level(level, walls, slot_count=2):
+class CoinPlacer:
+    """Finds free spots for coins under a hard attempt and time budget.
+
+    Candidate centres are drawn in batches and tested against every wall
+    and every coin already in `store` in one vectorized pass (pure Python
+    SpatialGrid queries when numpy is missing); the caller adds each coin
+    to the store once it has a spot. place() returns None once no spot
+    turns up within the budget, so a full board degrades to fewer coins
+    instead of hanging level generation.
+    """
+
+    WALL_MARGIN = 6  # coin rect inflated by 12 must clear walls
+    COIN_MARGIN = 10  # coin rect inflated by 20 must clear other coins
+
+    def __init__(self, walls, store, rng=random, batch=PLACEMENT_BATCH,
+                 max_attempts=PLACEMENT_MAX_ATTEMPTS, time_budget=PLACEMENT_TIME_BUDGET, reach=None):
+        self.store = store
+        self.reach = reach  # ReachMap: spots the player can't walk to are refused
+        self.rng = rng
+        self.batch = batch
+        self.max_attempts = max_attempts
+        # no time budget (None) keeps seeded boards independent of machine speed
+        self.deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.attempts = 0
+        self.placed = 0
+        if np is not None:
+            self.np_rng = np.random.default_rng(rng.getrandbits(64))
+            self.wall_box = np.array([(w.rect.left, w.rect.top, w.rect.right, w.rect.bottom) for w in walls]).reshape(-1, 4)
+            self.xs = self.ys = np.empty(0, dtype=np.int64)
+            self.cursor = 0
+            self.wall_ok = {}  # radius -> wall (and reach) test for the current batch
+        else:
+            self.wall_grid = walls if isinstance(walls, SpatialGrid) else SpatialGrid(walls)
+
+    def exhausted(self):
+        if self.attempts >= self.max_attempts:
+            return True
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    def place(self, radius):
+        """Centre (x, y) for a coin of `radius`, or None if the budget ran out."""
+        found = self._place_np(radius) if np is not None else self._place_py(radius)
+        if found:
+            self.placed += 1
+        return found
+
+    @staticmethod
+    def _hits(xs, ys, half, boxes):
+        # same test as Rect.colliderect, for every (candidate, box) pair at once
+        return ((xs[:, None] - half < boxes[:, 2]) & (xs[:, None] + half > boxes[:, 0]) &
+                (ys[:, None] - half < boxes[:, 3]) & (ys[:, None] + half > boxes[:, 1])).any(axis=1)
+
+    def _place_np(self, radius):
+        # the coin test looks at a small window of candidates first (an open
+        # board accepts one of the first few) and widens it on failure
+        window = 16
+        while not self.exhausted():
+            if self.cursor >= len(self.xs):
+                n = min(self.batch, self.max_attempts - self.attempts)
+                self.xs = self.np_rng.integers(60, WIDTH-60, size=n, endpoint=True)
+                self.ys = self.np_rng.integers(100, HEIGHT-120, size=n, endpoint=True)
+                self.cursor = 0
+                self.wall_ok.clear()
+            ok = self.wall_ok.get(radius)
+            if ok is None:
+                ok = ~self._hits(self.xs, self.ys, radius + self.WALL_MARGIN, self.wall_box)
+                if self.reach is not None:
+                    ok &= self.reach.reachable_centres(self.xs, self.ys, radius)
+                self.wall_ok[radius] = ok
+            end = self.cursor + window
+            xs, ys, ok = self.xs[self.cursor:end], self.ys[self.cursor:end], ok[self.cursor:end]
+            if len(self.store) and ok.any():
+                ok = ok & ~self._hits(xs, ys, radius + self.COIN_MARGIN, self.store.boxes())
+            if not ok.any():
+                self.attempts += len(xs)
+                self.cursor += len(xs)
+                window *= 2
+                continue
+            i = int(ok.argmax())
+            self.attempts += i + 1
+            self.cursor += i + 1
+            return int(xs[i]), int(ys[i])
+        return None
+
+    def _place_py(self, radius):
+        while not self.exhausted():
+            self.attempts += 1
+            x = self.rng.randint(60, WIDTH-60)
+            y = self.rng.randint(100, HEIGHT-120)
+            rect = pygame.Rect(x-radius, y-radius, radius*2, radius*2)
+            if self.wall_grid.collides(rect.inflate(self.WALL_MARGIN*2, self.WALL_MARGIN*2)):
+                continue
+            if self.store.collides(rect.inflate(self.COIN_MARGIN*2, self.COIN_MARGIN*2)):
+                continue
+            if self.reach is not None and not self.reach.reachable(rect):
+                continue
+            return x, y
+        return None
+
+def generate_coins_for_level(level, walls, slot_count=2, rng=random, time_budget=PLACEMENT_TIME_BUDGET, reach=None):
     coins = []
     denoms = LEVEL_DENOMS.get(level, LEVEL_DENOMS[4])
+    store = CoinStore()
+    # only where the player can walk to - a coin in a walled-off pocket could never be collected
+    placer = CoinPlacer(walls, store, rng, time_budget=time_budget, reach=reach or ReachMap(walls))
     # more coins for higher levels
     count = 8 + level*2
     for _ in range(count):
-        tries = 0
-        while True:
-            tries += 1
-            x = random.randint(60, WIDTH-60)
-            y = random.randint(100, HEIGHT-120)
-            coin_kind = "coin" if random.random() < 0.6 else "note"
-            value = random.choice(denoms)
-            c = Coin(x, y, value, kind=coin_kind)
-            
-            # Fake coins for level 3+
-            if level >= 3 and random.random() < 0.2:
-                c.fake = True
-                # Misleading value - looks like one thing but worth another
-                fake_values = [v for v in denoms if v != value]
-                c.value = random.choice(fake_values) if fake_values else value
-                
-            # ensure not inside walls and not too close to other coins
-            if any(w.rect.colliderect(c.rect.inflate(12,12)) for w in walls):
-                continue
-            if any(c.rect.colliderect(other.rect.inflate(20,20)) for other in coins):
-                continue
-            coins.append(c)
-            break
-            if tries > 200:
-                break
-                
+        coin_kind = "coin" if rng.random() < 0.6 else "note"
+        value = rng.choice(denoms)
+        # ensure not inside walls and not too close to other coins
+        pos = placer.place(COIN_RADIUS[coin_kind])
+        if pos is None:
+            break  # board is full - play with the coins we have
+        c = store.add(pos[0], pos[1], value, kind=coin_kind)
+
+        # Fake coins for level 3+
+        if level >= 3 and rng.random() < 0.2:
+            c.fake = True
+            # Misleading value - looks like one thing but worth another
+            fake_values = [v for v in denoms if v != value]
+            c.value = rng.choice(fake_values) if fake_values else value
+
+        coins.append(c)
+
+    # every slot needs at least one real coin to be paid with: unmask fakes, then add coins
+    short = slot_count - sum(not c.fake for c in coins)
+    for c in [c for c in coins if c.fake][:max(0, short)]:
+        c.fake = False
+        short -= 1
+    while short > 0:
+        pos = placer.place(COIN_RADIUS["coin"])
+        if pos is None:
+            break  # choose_slot_targets raises NotEnoughCoins and generate_board tries new walls
+        coins.append(store.add(pos[0], pos[1], rng.choice(denoms), kind="coin"))
+        short -= 1
+
     # Generate treasure slots with increasing difficulty
+    targets = choose_slot_targets(coins, level, slot_count, rng)
+    return coins, make_slots(targets, slot_count)
+
+def make_slots(targets, slot_count):
+    """Lay out treasure slots along the top of the board."""
     slots = []
     slot_width = min(280, (WIDTH - 80) // slot_count)
-    for i in range(slot_count):
+    for i, target in enumerate(targets):
         tx = 40 + i * (slot_width + 20)
         ty = 20
-        
-        # Progressive difficulty in target values
-        if level == 1:
-            target = random.choice([5, 10, 15])
-        elif level == 2:
-            target = random.choice([15, 25, 35, 50])
-        elif level == 3:
-            target = random.choice([30, 50, 75, 100])
-        else:
-            target = random.choice([50, 100, 150, 200, 250])
-            
         slots.append(Slot(tx, ty, slot_width, 80, target))
-    return coins, slots
+    return slots
+
+# --------- LEVEL SOLVER ----------
+# A level can only be finished if the real (non-fake) coins on the board can
+# be split into disjoint groups that hit every slot target exactly. Coins
+# are handled as a multiset of denominations: ((value, count), ...).
+
+def coin_multiset(values):
+    counts = defaultdict(int)
+    for v in values:
+        counts[v] += 1
+    return tuple(sorted(counts.items(), reverse=True))
+
+def _reachable_sums(counts, limit):
+    """Bitset of every sum <= limit some sub-multiset of `counts` adds up to."""
+    reach = 1
+    mask = (1 << (limit + 1)) - 1
+    for value, count in counts:
+        for _ in range(count):
+            reach = (reach | (reach << value)) & mask
+    return reach
+
+def _take(counts, target, i=0):
+    """Yield what is left of `counts` after removing each sub-multiset of
+    counts[i:] that sums to `target`."""
+    if target == 0:
+        yield counts
+        return
+    if i == len(counts) or sum(v*k for v, k in counts[i:]) < target:
+        return
+    value, count = counts[i]
+    for n in range(min(count, target // value), -1, -1):
+        rest = counts[:i] + ((value, count - n),) + counts[i+1:] if n else counts
+        yield from _take(rest, target - n*value, i + 1)
+
+@functools.lru_cache(maxsize=16384)
+def _can_fill(counts, targets):
+    # counts: multiset without zero counts, targets: sorted largest first
+    if not targets:
+        return True
+    if sum(targets) > sum(v*k for v, k in counts):
+        return False
+    reach = _reachable_sums(counts, targets[0])
+    if not all(reach >> t & 1 for t in targets):
+        return False
+    for rest in _take(counts, targets[0]):
+        if _can_fill(tuple(c for c in rest if c[1]), targets[1:]):
+            return True
+    return False
+
+def can_fill_targets(values, targets):
+    """True if `values` can be split into disjoint groups summing exactly to each target."""
+    return _can_fill(coin_multiset(values), tuple(sorted(targets, reverse=True)))
+
+def split_targets(values, targets):
+    """Groups of `values`, one per target (in order), each summing exactly to
+    its target; None if `values` cannot be split that way."""
+    if any(t < 0 for t in targets) or not can_fill_targets(values, targets):
+        return None
+    order = sorted(range(len(targets)), key=lambda i: targets[i], reverse=True)
+    counts = coin_multiset(values)
+    groups = [None] * len(targets)
+    for k, i in enumerate(order):
+        later = tuple(targets[j] for j in order[k+1:])
+        # the first way to pay this target that leaves the rest payable; one always exists
+        rest = next(rest for rest in (tuple(c for c in r if c[1]) for r in _take(counts, targets[i]))
+                    if _can_fill(rest, later))
+        used = Counter(dict(counts))
+        used.subtract(dict(rest))
+        groups[i] = sorted(used.elements(), reverse=True)
+        counts = rest
+    return groups
+
+def level_is_solvable(coins, slots):
+    """True if the real coins can fill every slot to its exact target."""
+    values = [c.value for c in coins if not c.fake]
+    return can_fill_targets(values, [s.target for s in slots])
+
+def make_change(target, denoms):
+    """Greedy split of `target` into the given denominations (None if impossible)."""
+    parts = []
+    for d in sorted(denoms, reverse=True):
+        while target >= d:
+            parts.append(d)
+            target -= d
+    return parts if target == 0 else None
+
+def repair_coin_values(coins, targets, denoms, rng=random):
+    """Re-value real coins so every target can be paid exactly.
+
+    Each target is split into denominations; coins that already carry a
+    needed value are used first, other real coins are re-valued. Returns
+    False (leaving coins untouched) if there are not enough real coins.
+    """
+    pool = [c for c in coins if not c.fake]
+    rng.shuffle(pool)
+    needed = []
+    for target in targets:
+        parts = make_change(target, denoms)
+        if parts is None:
+            return False
+        needed.extend(parts)
+    if len(needed) > len(pool):
+        return False
+    rewrite = []
+    for value in needed:
+        match = next((c for c in pool if c.value == value), None)
+        if match:
+            pool.remove(match)
+        else:
+            rewrite.append(value)
+    for coin, value in zip(pool, rewrite):
+        coin.value = value
+    return True
+
+class NotEnoughCoins(ValueError):
+    """Fewer real coins on a board than it has slots."""
+
+def choose_slot_targets(coins, level, slot_count, rng=random):
+    """Pick slot targets the real coins on the board can actually fill.
+
+    Targets are drawn from SLOT_TARGETS for the level, one slot at a time,
+    keeping only choices that leave the slots chosen so far jointly
+    solvable. If no combination works, the level is repaired by re-valuing
+    some real coins so random targets can be paid exactly; as a last resort
+    (too few coins) each target becomes the sum of a few real coins.
+
+    Always returns slot_count targets; raises NotEnoughCoins if there are
+    fewer real coins than that.
+    """
+    if sum(not c.fake for c in coins) < slot_count:
+        raise NotEnoughCoins(f"{slot_count} slots need at least {slot_count} real coins")
+    counts = coin_multiset(c.value for c in coins if not c.fake)
+    choices = SLOT_TARGETS.get(level, SLOT_TARGETS[4])
+
+    def search(chosen):
+        if len(chosen) == slot_count:
+            return chosen
+        options = choices[:]
+        rng.shuffle(options)
+        for target in options:
+            if _can_fill(counts, tuple(sorted(chosen + [target], reverse=True))):
+                found = search(chosen + [target])
+                if found:
+                    return found
+        return None
+
+    targets = search([])
+    if targets:
+        return targets
+    targets = [rng.choice(choices) for _ in range(slot_count)]
+    if repair_coin_values(coins, targets, LEVEL_DENOMS.get(level, LEVEL_DENOMS[4]), rng):
+        return targets
+    # not enough coins: build every target from coins that are on the board
+    values = [c.value for c in coins if not c.fake]
+    rng.shuffle(values)
+    targets = []
+    for i in range(slot_count):
+        # at most an even share, so every later slot keeps at least one coin
+        take = min(max(1, len(values) // (slot_count - i)), rng.randint(1, 3))
+        group, values = values[:take], values[take:]
+        targets.append(sum(group))
+    return targets
+
+def slot_count_for_level(level):
+    return min(2 + (level-1), 4)  # max 4 slots
+
+def generate_board(level, seed=None):
+    """Walls, coins and slots for one level.
+
+    A seed makes the board reproducible: placement then runs on its attempt
+    budget alone, so the result never depends on how fast the machine is.
+    """
+    if seed is None:
+        rng, time_budget = random, PLACEMENT_TIME_BUDGET
+    else:
+        rng, time_budget = random.Random(seed), None
+    while True:
+        walls = generate_walls_for_board(rng)
+        reach = ReachMap(walls)
+        if reach.enclosed():  # spawn walled in: new walls
+            continue
+        try:
+            coins, slots = generate_coins_for_level(level, walls, slot_count=slot_count_for_level(level),
+                                                    rng=rng, time_budget=time_budget, reach=reach)
+        except NotEnoughCoins:
+            continue  # too crowded for a real coin per slot: new walls
+        return Board(walls, coins, slots, reach)
+
+# --------- LEVEL PREFETCH ----------
+PREFETCH_DEPTH = 2  # ready-made boards kept per level
+
+class LevelPrefetcher:
+    """Keeps a small queue of ready-made boards per level number.
+
+    A daemon worker thread generates boards for the levels the game asked
+    for with want() (the current level, for timeouts, and the next one)
+    while the player is still playing, so get() is usually just a pop.
+    When the queue is empty get() falls back to generating synchronously.
+
+    The n-th board handed out for a level is always generated from the same
+    seed, so whether it came from the queue or not never changes the board.
+
+    Many sessions can share one prefetcher through client(): each client's
+    want() replaces only its own levels, and a level's queue is `depth`
+    boards deep per client that wants it.
+    """
+
+    def __init__(self, depth=PREFETCH_DEPTH, seed=None):
+        self.depth = depth
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.queues = defaultdict(deque)  # level -> deque of (index, board)
+        self.next_index = defaultdict(int)  # level -> index of the next board get() returns
+        self.produced = defaultdict(int)  # level -> index of the next board to generate
+        self.wants = {}  # client (None for plain want() calls) -> levels it wants
+        self.wanted = Counter()  # level -> number of clients that want it
+        self.in_flight = None  # (level, index) the worker is generating
+        self.hits = 0
+        self.misses = 0
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+    def board_seed(self, level, index):
+        return random.Random(f"{self.seed}:{level}:{index}").getrandbits(64)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="level-prefetch", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def want(self, *levels, client=None):
+        """Keep boards ready for these levels only (for this client; see client())."""
+        with self.cond:
+            self.wants[client] = set(levels)
+            self._update_wanted()
+
+    def release(self, client):
+        """Forget a client's levels, e.g. when its session ends."""
+        with self.cond:
+            if self.wants.pop(client, None) is not None:
+                self._update_wanted()
+
+    def client(self):
+        return PrefetchClient(self)
+
+    def _update_wanted(self):
+        self.wanted = Counter(level for levels in self.wants.values() for level in levels)
+        for level in list(self.queues):
+            if level not in self.wanted:
+                del self.queues[level]
+        self.cond.notify_all()
+
+    def get(self, level):
+        with self.cond:
+            index = self.next_index[level]
+            self.next_index[level] += 1
+            while self.in_flight == (level, index) and not self.stopped:
+                self.cond.wait()  # almost done - cheaper than generating it again
+            queue = self.queues[level]
+            while queue and queue[0][0] < index:
+                queue.popleft()
+            if queue and queue[0][0] == index:
+                self.hits += 1
+                board = queue.popleft()[1]
+                self.cond.notify_all()
+                return board
+            self.misses += 1
+            self.produced[level] = max(self.produced[level], index + 1)
+            self.cond.notify_all()
+        return generate_board(level, self.board_seed(level, index))
+
+    def _next_job(self):
+        for level in sorted(self.wanted):
+            if len(self.queues[level]) < self.depth * self.wanted[level]:
+                index = max(self.produced[level], self.next_index[level])
+                self.produced[level] = index + 1
+                return level, index
+        return None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                job = self._next_job()
+                while job is None and not self.stopped:
+                    self.cond.wait()
+                    job = self._next_job()
+                if self.stopped:
+                    return
+                self.in_flight = job
+            level, index = job
+            board = generate_board(level, self.board_seed(level, index))
+            with self.cond:
+                self.in_flight = None
+                if level in self.wanted and index >= self.next_index[level]:
+                    self.queues[level].append((index, board))
+                self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            lookups = self.hits + self.misses
+            return {
+                "queue_depth": {level: len(q) for level, q in self.queues.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+class PrefetchClient:
+    """One session's board source on a shared LevelPrefetcher."""
+
+    def __init__(self, prefetcher):
+        self.prefetcher = prefetcher
+
+    def get(self, level):
+        return self.prefetcher.get(level)
+
+    def want(self, *levels):
+        self.prefetcher.want(*levels, client=self)
+
+    def release(self):
+        self.prefetcher.release(self)
+
+# --------- LEVEL FILE ----------
+# Pre-generated boards (see build_levels.py) are stored as fixed-size records
+# so any board can be read straight out of an mmap by (level, index):
+#   header   magic, version, number of levels, record size
+#   index    per level: level number, record count, offset of first record
+#   records  seed, counts, walls (x, y, w, h), coins (x, y, value, flags),
+#            slot targets - unused entries are zero
+LEVEL_FILE_MAGIC = b"TCHL"
+LEVEL_FILE_VERSION = 1
+MAX_FILE_WALLS = 12
+MAX_FILE_COINS = 32
+MAX_FILE_SLOTS = 4
+COIN_NOTE, COIN_FAKE = 1, 2  # coin flag bits
+
+LEVEL_FILE_HEADER = struct.Struct("<4sHHI")
+LEVEL_FILE_INDEX = struct.Struct("<HIQ")
+LEVEL_RECORD = struct.Struct("<QBBB" + "hhhh" * MAX_FILE_WALLS + "hhHB" * MAX_FILE_COINS + "H" * MAX_FILE_SLOTS)
+
+def validate_board(level, board):
+    """True if a generated board is playable: fits the file format, coins are
+    clear of walls and each other and within the player's reach, and the
+    slots can actually be filled."""
+    walls, coins, slots = board
+    if not slots or len(walls) > MAX_FILE_WALLS or len(coins) > MAX_FILE_COINS or len(slots) > MAX_FILE_SLOTS:
+        return False
+    wall_grid = SpatialGrid(walls)
+    coin_grid = SpatialGrid(coins)
+    for c in coins:
+        if wall_grid.collides(c.rect.inflate(12, 12)):
+            return False
+        if any(other is not c for other in coin_grid.query(c.rect.inflate(20, 20))):
+            return False
+    return board_reachable(walls, coins) and level_is_solvable(coins, slots)
+
+def pack_board(seed, board):
+    walls, coins, slots = board
+    fields = [seed, len(walls), len(coins), len(slots)]
+    for w in walls:
+        fields.extend(w.rect)
+    fields.extend([0, 0, 0, 0] * (MAX_FILE_WALLS - len(walls)))
+    for c in coins:
+        flags = (COIN_NOTE if c.kind == "note" else 0) | (COIN_FAKE if c.fake else 0)
+        fields.extend((c.x, c.y, c.value, flags))
+    fields.extend([0, 0, 0, 0] * (MAX_FILE_COINS - len(coins)))
+    fields.extend(s.target for s in slots)
+    fields.extend([0] * (MAX_FILE_SLOTS - len(slots)))
+    return LEVEL_RECORD.pack(*fields)
+
+def unpack_board(level, data, offset=0):
+    """(seed, board) from one record."""
+    fields = LEVEL_RECORD.unpack_from(data, offset)
+    seed, wall_count, coin_count, slot_count = fields[:4]
+    pos = 4
+    walls = [Wall(*fields[pos + 4*i:pos + 4*i + 4]) for i in range(wall_count)]
+    pos += 4 * MAX_FILE_WALLS
+    store = CoinStore()
+    coins = []
+    for i in range(coin_count):
+        x, y, value, flags = fields[pos + 4*i:pos + 4*i + 4]
+        coins.append(store.add(x, y, value, kind="note" if flags & COIN_NOTE else "coin", fake=bool(flags & COIN_FAKE)))
+    pos += 4 * MAX_FILE_COINS
+    targets = fields[pos:pos + slot_count]
+    return seed, (walls, coins, make_slots(targets, slot_count_for_level(level)))
+
+def write_level_file(path, records_by_level):
+    """Write {level: [packed record, ...]} as a level file."""
+    levels = sorted(records_by_level)
+    offset = LEVEL_FILE_HEADER.size + LEVEL_FILE_INDEX.size * len(levels)
+    with open(path, "wb") as f:
+        f.write(LEVEL_FILE_HEADER.pack(LEVEL_FILE_MAGIC, LEVEL_FILE_VERSION, len(levels), LEVEL_RECORD.size))
+        for level in levels:
+            f.write(LEVEL_FILE_INDEX.pack(level, len(records_by_level[level]), offset))
+            offset += LEVEL_RECORD.size * len(records_by_level[level])
+        for level in levels:
+            for record in records_by_level[level]:
+                f.write(record)
+
+class LevelFile:
+    """Read-only, mmap-backed level file.
+
+    load(level, index) reads a single record in O(1) without parsing the
+    rest of the file. It can also stand in for a LevelPrefetcher as the
+    GameState board source: get(level) hands out a random stored board.
+    Levels that are not in the file, and stored boards with coins the
+    player can't reach (files from before boards were checked for reach),
+    are generated from a seed drawn from `rng`.
+    """
+
+    def __init__(self, path, rng=random):
+        self.path = path
+        self.rng = rng
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, level_count, record_size = LEVEL_FILE_HEADER.unpack_from(self.data, 0)
+        if magic != LEVEL_FILE_MAGIC or version != LEVEL_FILE_VERSION or record_size != LEVEL_RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is not a version {LEVEL_FILE_VERSION} level file")
+        self.levels = {}  # level -> (count, offset)
+        for i in range(level_count):
+            level, count, offset = LEVEL_FILE_INDEX.unpack_from(self.data, LEVEL_FILE_HEADER.size + i * LEVEL_FILE_INDEX.size)
+            self.levels[level] = (count, offset)
+
+    def count(self, level):
+        return self.levels.get(level, (0, 0))[0]
+
+    def load(self, level, index):
+        count, offset = self.levels.get(level, (0, 0))
+        if not 0 <= index < count:
+            raise IndexError(f"level {level} has {count} boards, no board {index}")
+        return unpack_board(level, self.data, offset + index * LEVEL_RECORD.size)[1]
+
+    def get(self, level):
+        count = self.count(level)
+        if count:
+            walls, coins, slots = self.load(level, self.rng.randrange(count))
+            reach = ReachMap(walls)
+            if board_reachable(walls, coins, reach):
+                return Board(walls, coins, slots, reach)
+        return generate_board(level, self.rng.getrandbits(64))
+
+    def want(self, *levels):
+        pass  # everything is already on disk
+
+    def stop(self):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
 
 # --------- UI / Overlay components ----------
 class Button:
@@ -342,12 +1903,13 @@ class InputBox:
                     self.text += event.unicode
         return None
 
-    def draw(self, surf):
-        pygame.draw.rect(surf, CARD, self.rect, border_radius=6)
-        pygame.draw.rect(surf, ACCENT if self.active else SUB, self.rect, 2, border_radius=6)
+    def draw(self, surf, rect=None):
+        rect = rect or self.rect
+        pygame.draw.rect(surf, CARD, rect, border_radius=6)
+        pygame.draw.rect(surf, ACCENT if self.active else SUB, rect, 2, border_radius=6)
         txt = self.text if self.text else self.placeholder
         color = WHITE if self.text else (150,150,150)
-        draw_text(surf, txt, (self.rect.x+8, self.rect.y+8), font=FONT, color=color)
+        draw_text(surf, txt, (rect.x+8, rect.y+8), font=FONT, color=color)
 
     def submit(self):
         txt = self.text
@@ -355,22 +1917,291 @@ class InputBox:
         self.active = False
         return txt
 
+# --------- HINTS ----------
+FAR = 0xFFFF  # distance of cells a coin can't be walked to from
+
+class HintEngine:
+    """Finds the way to the nearest coin that helps fill the current slot.
+
+    The coins that would help finish the current slot get one distance field
+    over the walkable cells of the board's ReachMap: BFS steps from every
+    cell to the nearest cell where the player touches one of them. It is
+    computed only when a walking hint is asked for, and only again when that
+    set of coins changes - a coin collected, placed or taken - so building a
+    level does no hint work at all. With numpy the BFS advances a whole
+    frontier per step. Per frame the hint is then a lookup at the player's
+    cell, and the path is read off by walking downhill.
+    """
+
+    def __init__(self, reach):
+        self.reach = reach
+        cols = self.cols = reach.cols
+        if np is not None:
+            flat = np.flatnonzero(reach.reach)
+            ids = np.full(reach.rows * cols, len(flat), dtype=np.int32)  # len(flat): the "no cell" sentinel
+            ids[flat] = np.arange(len(flat), dtype=np.int32)
+            col = flat % cols
+            right = np.where(col != cols - 1, ids[np.minimum(flat + 1, len(ids) - 1)], len(flat))
+            left = np.where(col != 0, ids[flat - 1], len(flat))
+            down = ids[np.minimum(flat + cols, len(ids) - 1)]
+            up = ids[np.maximum(flat - cols, 0)]
+            self.neighbour_array = np.stack([right, left, down, up], axis=1)
+            neighbours = self.neighbour_array.tolist()
+            flat = flat.tolist()
+        else:
+            flat = sorted(r * cols + c for r, c in reach.reach)
+            index = {f: i for i, f in enumerate(flat)}
+            neighbours = [[index.get(n, len(flat)) if ok else len(flat)
+                           for n, ok in ((f+1, f % cols != cols-1), (f-1, f % cols), (f+cols, True), (f-cols, True))]
+                          for f in flat]
+        self.flat = flat  # walkable cell i -> row * cols + col
+        self.index = {f: i for i, f in enumerate(flat)}
+        self.neighbours = neighbours  # four per cell, len(flat) where there is none
+        self.helpful = None
+        self.targets = None  # coin -> set of cells it is reached from, for the helpful board coins
+        self.field = None
+        self.key = None
+        self.path_key = None
+        self.path = None
+
+    def sources(self, rect):
+        rows, cols = self.reach.cells(rect)
+        cells = (r * self.cols + c for r in range(*rows.indices(self.reach.rows)) for c in range(*cols.indices(self.cols)))
+        return [self.index[f] for f in cells if f in self.index]
+
+    def coin_sources(self, coin):
+        # cells the player touches the coin from anywhere in, so the path's
+        # last point is on the coin; failing that, any cell touching it
+        return self.sources(coin.rect.inflate(-2*REACH_CELL, -2*REACH_CELL)) or self.sources(coin.rect)
+
+    def distances(self, coins):
+        """array('H') of BFS steps from each walkable cell (plus the sentinel)
+        to the nearest of `coins`; FAR where none can be reached."""
+        self.targets = {coin: set(self.coin_sources(coin)) for coin in coins}
+        sources = sorted(set().union(*self.targets.values()))
+        if np is not None:
+            return self._bfs_np(sources)
+        return self._bfs(sources)
+
+    def _bfs(self, sources):
+        dist = array("H", [FAR]) * len(self.flat) + array("H", [FAR - 1])  # never visited, never downhill
+        for i in sources:
+            dist[i] = 0
+        neighbours = self.neighbours
+        frontier, d = sources, 0
+        while frontier:
+            d += 1
+            nxt = []
+            for i in frontier:
+                for j in neighbours[i]:
+                    if dist[j] == FAR:
+                        dist[j] = d
+                        nxt.append(j)
+            frontier = nxt
+        return dist
+
+    def _bfs_np(self, sources):
+        dist = np.full(len(self.flat) + 1, FAR, dtype=np.uint16)
+        dist[-1] = FAR - 1
+        frontier = np.array(sources, dtype=np.int32)
+        dist[frontier] = 0
+        d = 0
+        while frontier.size:
+            d += 1
+            nxt = self.neighbour_array[frontier].ravel()
+            nxt = np.unique(nxt[dist[nxt] == FAR])
+            dist[nxt] = d
+            frontier = nxt
+        return array("H", dist.tobytes())
+
+    @staticmethod
+    def helps(state):
+        """(slot, coins in hand that help it, board coins that help it) for the
+        first slot still short of its target, or None."""
+        slot = next((s for s in state.slots if s.current < s.target), None)
+        if slot is None:
+            return None
+        need = slot.target - slot.current
+        hand = ([state.holding] if state.holding else []) + list(state.player.inventory)
+        board = [c for c in state.coins.active() if not c.fake]
+        values = [c.value for c in hand + board]
+        useful = set()
+        for value in set(values):
+            if value <= need:
+                rest = list(values)
+                rest.remove(value)
+                if value == need or can_fill_targets(rest, [need - value]):
+                    useful.add(value)
+        return slot, [c for c in hand if c.value in useful], [c for c in board if c.value in useful]
+
+    def update(self, state):
+        """Re-fold the field if the coins or slots changed since last time."""
+        key = (state.coin_store.version, state.player.inventory.version, id(state.holding),
+               tuple(s.version for s in state.slots))
+        if key != self.key:
+            self.key = key
+            self.helpful = self.helps(state)
+            self.field = None  # the walking hint computes it when it needs it
+
+    def cell(self, player):
+        """Walkable cell the player stands in (or next to, when hugging a wall)."""
+        x, y = player.rect.x // REACH_CELL, player.rect.y // REACH_CELL
+        for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1), (-1, 0), (0, -1), (-1, -1), (1, -1), (-1, 1)):
+            if not 0 <= x + dx < self.cols:
+                continue  # would wrap round to the other edge of the board
+            i = self.index.get((y + dy) * self.cols + x + dx)
+            if i is not None:
+                return i
+        return None
+
+    def hint(self, state):
+        """("drag", inventory index, slot) when a coin in the inventory helps
+        the current slot, ("walk", [cell centres], coin) to the nearest coin
+        that helps, or None."""
+        self.update(state)
+        if not self.helpful:
+            return None
+        slot, hand, board = self.helpful
+        if hand:
+            index = next((i for i, c in enumerate(state.player.inventory) if c in hand), None)
+            return ("drag", index, slot) if index is not None else None
+        start = self.cell(state.player)
+        if start is None or not board:
+            return None
+        if self.field is None:
+            self.field = self.distances(board)
+        if self.field[start] == FAR:
+            return None
+        if (start, self.key) != self.path_key:
+            field, neighbours = self.field, self.neighbours
+            path = [start]
+            while field[path[-1]] > 0:
+                here = path[-1]
+                path.append(next(j for j in neighbours[here] if field[j] < field[here]))
+            end = path[-1]
+            coin = next(c for c in board if end in self.targets[c])
+            half = state.player.size // 2 + REACH_CELL // 2
+            points = [((self.flat[i] % self.cols) * REACH_CELL + half, (self.flat[i] // self.cols) * REACH_CELL + half) for i in path]
+            self.path_key = (start, self.key)
+            self.path = ("walk", points, coin)
+        return self.path
+
 # --------- GAME STATE ----------
+class WallClock:
+    """Real time - the clock for interactive play."""
+
+    def now(self):
+        return time.time()
+
+    def advance(self, dt):
+        pass
+
+class SimClock:
+    """Simulated time that only moves when the simulation steps."""
+
+    def __init__(self, start=0.0):
+        self.t = start
+
+    def now(self):
+        return self.t
+
+    def advance(self, dt):
+        self.t += dt
+
+class FrameInput:
+    """Player input for one simulation step.
+
+    dx, dy: held movement direction, -1, 0 or 1 per axis
+    mouse: mouse position, moves the coin being dragged
+    actions: discrete actions for this frame, applied in order:
+        ("restart",)                 restart the level
+        ("choose", "type"|"drag")    pick how to handle the popup coin
+        ("answer", text)             submit a typed value for the popup coin
+        ("take_inventory", index)    start dragging an inventory coin
+        ("drop", (x, y))             release the dragged coin
+    """
+
+    __slots__ = ("dx", "dy", "mouse", "actions")
+
+    def __init__(self, dx=0, dy=0, mouse=None, actions=()):
+        self.dx = dx
+        self.dy = dy
+        self.mouse = mouse
+        self.actions = list(actions)
+
+def input_from_keys(keys, mouse=None):
+    """Build a FrameInput from pygame.key.get_pressed() style state."""
+    dx = dy = 0
+    if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        dx = -1
+    if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        dx = 1
+    if keys[pygame.K_UP] or keys[pygame.K_w]:
+        dy = -1
+    if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+        dy = 1
+    return FrameInput(dx, dy, mouse)
+
+class FixedTimestep:
+    """Advances a GameState in fixed TICK steps, however long the frames take.
+
+    Held movement applies to every tick; a frame's discrete actions go to its
+    first tick, or wait for the next frame if this one was too short to hold
+    a tick. `alpha` is how far the leftover time reaches into the next tick,
+    for drawing the player between its last two positions.
+    """
+
+    def __init__(self, tick=TICK, max_ticks=MAX_TICKS_PER_FRAME):
+        self.tick = tick
+        self.max_ticks = max_ticks
+        self.acc = 0.0
+        self.pending = []
+
+    @property
+    def alpha(self):
+        return self.acc / self.tick
+
+    def advance(self, state, inputs, dt, lap=no_lap):
+        """Run the ticks that fit into `dt` seconds; returns the level outcomes.
+
+        `lap` is passed on to GameState.step for every tick.
+        """
+        self.acc = min(self.acc + dt, self.tick * self.max_ticks)
+        self.pending.extend(inputs.actions)
+        while self.acc >= self.tick:
+            self.acc -= self.tick
+            actions, self.pending = self.pending, []
+            outcomes = state.step(FrameInput(inputs.dx, inputs.dy, inputs.mouse, actions), self.tick, lap)
+            if outcomes:
+                self.acc = 0.0  # the board changed; the next level starts on a fresh tick
+                return outcomes
+        return []
+
 class GameState:
-    def __init__(self):
+    """The whole game simulation, with no dependency on the display.
+
+    Drive it with step(inputs, dt). Time comes from `clock`: WallClock for
+    interactive play, SimClock to run headless faster than real time.
+    """
+
+    def __init__(self, clock=None, boards=None, log=None, hint_after=None):
+        self.clock = clock or WallClock()
+        self.boards = boards  # LevelPrefetcher or LevelFile; None = generate inline
+        self.log = log  # EventLog for answers, placements, levels and awards; None = keep nothing
+        self.hint_after = hint_after  # idle seconds before a hint shows; None = no hints
         self.level = 1
         self.score = 0
         self.lives = START_LIVES
-        self.player = Player(80, HEIGHT-120)
-        self.walls = generate_walls_for_board()
-        self.coins, self.slots = generate_coins_for_level(self.level, self.walls, slot_count=2)
+        self.player = Player(*SPAWN)
+        self.load_board()
         self.holding = None  # coin being dragged
         self.popup = None  # current quiz popup
         self.inputbox = None
         self.drag_mode = False
         self.drag_origin_coin = None
         self.message = ""
-        self.level_start_time = time.time()
+        self.level_start_time = self.clock.now()
+        self.last_active = self.level_start_time
         self.level_time_taken = 0
         self.streak = 0
         self.mistakes_this_level = 0
@@ -385,39 +2216,94 @@ class GameState:
         self.time_limit = None if self.level < 3 else 60  # level 3+ has time limit
         self.show_instructions = True  # show instructions at start
 
+    # score and lives bump hud_version, so the HUD knows when to repaint
+    @property
+    def score(self):
+        return self._score
+
+    @score.setter
+    def score(self, score):
+        self._score = score
+        self.hud_version = next_version()
+
+    @property
+    def lives(self):
+        return self._lives
+
+    @lives.setter
+    def lives(self, lives):
+        self._lives = lives
+        self.hud_version = next_version()
+
     def reset_level(self):
-        self.player = Player(80, HEIGHT-120)
-        self.walls = generate_walls_for_board()
-        slot_count = min(2 + (self.level-1), 4)  # max 4 slots
-        self.coins, self.slots = generate_coins_for_level(self.level, self.walls, slot_count=slot_count)
+        self.player = Player(*SPAWN)
+        self.load_board()
         self.holding = None
         self.popup = None
         self.inputbox = None
         self.drag_mode = False
         self.drag_origin_coin = None
-        self.level_start_time = time.time()
+        self.level_start_time = self.clock.now()
+        self.last_active = self.level_start_time
         self.mistakes_this_level = 0
         self.time_limit = None if self.level < 3 else max(45, 90 - self.level*10)  # decreasing time limit
 
+    def load_board(self):
+        """Next board for the current level - from the board source when there is one."""
+        if self.boards:
+            board = self.boards.get(self.level)
+            self.boards.want(self.level, self.level + 1)
+        else:
+            # seeded from `random`, which the session seeds: no time budget, so replays deal the same boards
+            board = generate_board(self.level, random.getrandbits(64))
+        self.walls, self.coins, self.slots = board
+        self.build_indexes(getattr(board, "reach", None))
+
+    def record(self, kind, **data):
+        if self.log is not None:
+            self.log.log(kind, **{"level": self.level, **data})
+
+    def build_indexes(self, reach=None):
+        """Indexes over the board, built once per level; `reach` is the walls'
+        ReachMap if the board came with one."""
+        coins = list(self.coins)
+        self.coins = EntitySet(coins, active=(c for c in coins if not c.collected))
+        self.wall_grid = SpatialGrid(self.walls)
+        self.coin_store = CoinStore.gather(coins)
+        self.hints = HintEngine(reach or ReachMap(self.walls)) if self.hint_after else None
+
+    def collect(self, coin):
+        coin.collected = True
+        self.coins.deactivate(coin)
+
+    def remove_coin(self, coin):
+        self.coins.discard(coin)
+        self.collect(coin)
+
+    def coin_touching_player(self):
+        hits = self.coin_store.overlapping(self.player.rect)
+        return hits[0] if hits else None
+
     def pick_coin(self, coin):
         """Called when player collides with a coin."""
         if coin.collected:
             return
-        coin.collected = True  # reserve it
+        self.collect(coin)  # reserve it
         self.drag_origin_coin = coin
         # create popup with two choices: TYPE or DRAG
         self.popup = {
             "coin": coin,
             "choice": None,  # "type" or "drag"
-            "timestamp": time.time(),
+            "timestamp": self.clock.now(),
             "message": "Recognize the value of this coin/note",
+            "version": next_version(),
         }
         # create input box but not active until chosen
         self.inputbox = InputBox((WIDTH//2 - 140, HEIGHT//2 - 12, 280, 36), placeholder="Type value (e.g., 10)")
 
     def commit_type_answer(self, coin, answer):
         """Check typed answer for coin recognition."""
-        answer_time = time.time() - self.popup.get("timestamp", time.time())
+        answer_time = self.clock.now() - self.popup.get("timestamp", self.clock.now())
         
         try:
             val = int(answer.strip())
@@ -427,10 +2313,12 @@ class GameState:
             self.message = "Please enter a number!"
             beep(300, 80)
             return False
-            
-        if val == coin.value and not coin.fake:
+
+        correct = val == coin.value and not coin.fake
+        self.record("answer", value=coin.value, fake=coin.fake, answer=val, correct=correct, seconds=round(answer_time, 3))
+        if correct:
             # correct recognition
-            self.player.inventory.append(coin)
+            self.player.inventory.add(coin)
             self.score += 10
             self.player.coins_collected += 1
             self.total_coins_collected += 1
@@ -482,6 +2370,9 @@ class GameState:
             if s.rect.collidepoint(pos):
                 # accept coin and check sums
                 s.accept_coin(self.holding)
+                result = "match" if s.current == s.target else "over" if s.current > s.target else "partial"
+                self.record("placement", value=self.holding.value, fake=self.holding.fake, slot=s.target,
+                            total=s.current, result=result)
                 # if the slot is exactly matched now:
                 if s.current == s.target:
                     # correct full match, award points and unlocks
@@ -491,8 +2382,7 @@ class GameState:
                     beep(800, 90)
                     # Clear coins from board that are in slot (they are already removed)
                     for c in s.coins_in_slot:
-                        if c in self.coins:
-                            self.coins.remove(c)
+                        self.remove_coin(c)
                     # check if remaining slots all done
                 else:
                     # partial or wrong (if exceed)
@@ -508,17 +2398,18 @@ class GameState:
                 break
         if not dropped_into_slot:
             # dropped in empty space -> if fake, penalty; else simply add to inventory
+            self.record("placement", value=self.holding.value, fake=self.holding.fake, slot=None,
+                        total=None, result="fake" if self.holding.fake else "inventory")
             if self.holding.fake:
                 self.lives -= 1
                 self.message = "That was a fake coin! Lost 1 life."
                 beep(240, 120)
             else:
-                self.player.inventory.append(self.holding)
+                self.player.inventory.add(self.holding)
                 self.message = f"Picked up ₹{self.holding.value} into inventory."
                 beep(600, 70)
             # remove from global coins list if present
-            if self.holding in self.coins:
-                self.coins.remove(self.holding)
+            self.remove_coin(self.holding)
         self.holding = None
         self.drag_mode = False
 
@@ -526,19 +2417,145 @@ class GameState:
         # A level is complete if all slots are exactly matched OR no coins left and slots matched
         done = all(s.current == s.target for s in self.slots)
         if done:
-            self.level_time_taken = int(time.time() - self.level_start_time)
+            self.level_time_taken = int(self.clock.now() - self.level_start_time)
             return True
         # optionally also if coins empty and all slots matched
         if not self.coins and all(s.current >= s.target for s in self.slots):
-            self.level_time_taken = int(time.time() - self.level_start_time)
+            self.level_time_taken = int(self.clock.now() - self.level_start_time)
             return True
         # time limit fail
         if self.time_limit:
-            if time.time() - self.level_start_time > self.time_limit:
+            if self.clock.now() - self.level_start_time > self.time_limit:
                 # end with timeout
                 return True
         return False
 
+    def finish_level(self):
+        """Score a finished (or timed out) level and move on.
+
+        Returns "level_complete", "victory", "timeout" or "game_over".
+        """
+        # if time_limit and time exceeded then fail; else success
+        completed = all(s.current == s.target for s in self.slots)
+        level_time = int(self.clock.now() - self.level_start_time)
+
+        if completed:
+            self.score += 50
+            self.levels_completed_in_row += 1
+            self.unlocks["chests_unlocked"] += 1
+
+            # Time bonus
+            if self.time_limit and level_time < self.time_limit // 2:
+                self.score += 25
+                self.message = f"Level Complete! Time Bonus: +25 points!"
+            else:
+                self.message = f"Level Complete! Well done!"
+
+            # Check for badges and trophies
+            self.check_badges()
+            self.check_trophies()
+            self.summary = self.level_summary()
+
+            outcome = "victory" if self.level >= 5 else "level_complete"
+            self.record("level", outcome=outcome, **self.summary)
+            self.level += 1
+            if outcome == "victory":
+                return outcome
+            self.reset_level()
+            return outcome
+
+        # failure (time out or didn't match)
+        self.levels_completed_in_row = 0
+        self.message = "Time's up! Try again!"
+        self.lives -= 1
+        outcome = "game_over" if self.lives <= 0 else "timeout"
+        self.record("level", outcome=outcome, score=self.score, stars=self.stars, lives=self.lives, time=level_time)
+        if outcome == "game_over":
+            return outcome
+        # restart same level
+        self.reset_level()
+        return outcome
+
+    def apply_action(self, action):
+        kind = action[0]
+        if kind == "restart":
+            self.reset_level()
+            self.lives = START_LIVES
+            self.score = 0
+            self.badges = []
+        elif kind == "choose":
+            if self.popup:
+                self.popup["choice"] = action[1]
+                if action[1] == "type":
+                    self.inputbox.active = True
+                else:
+                    self.start_drag_mode(self.popup["coin"])
+        elif kind == "answer":
+            if self.popup and self.popup["choice"] == "type":
+                self.commit_type_answer(self.popup["coin"], action[1])
+        elif kind == "take_inventory":
+            # pick up from inventory for drag-placing
+            index = action[1]
+            if not self.popup and not self.drag_mode and 0 <= index < len(self.player.inventory):
+                self.holding = self.player.inventory.at(index)
+                self.player.inventory.remove(self.holding)
+                self.drag_mode = True
+        elif kind == "drop":
+            if self.drag_mode and self.holding:
+                self.end_drag_mode(action[1])
+
+    def step(self, inputs, dt, lap=no_lap):
+        """Advance the game by one frame of `dt` seconds.
+
+        lap(phase) is called after the move, pickup and level phases, so the
+        main loop can profile them (PlayScene passes PROFILER.lap).
+        Returns the level outcomes that happened this frame (see finish_level).
+        """
+        self.clock.advance(dt)
+        if inputs.dx or inputs.dy or inputs.actions or self.popup or self.drag_mode:
+            self.last_active = self.clock.now()
+        for action in inputs.actions:
+            self.apply_action(action)
+        if self.drag_mode and self.holding and inputs.mouse is not None:
+            self.holding.move_to(inputs.mouse)
+
+        # ------- player movement -------
+        speed = self.player.speed
+        self.player.move(inputs.dx * speed, inputs.dy * speed, self.wall_grid)
+        lap("move")
+
+        # ------- collisions with coins -------
+        if not self.popup and not self.drag_mode:
+            coin = self.coin_touching_player()
+            if coin:
+                self.pick_coin(coin)
+        lap("pickup")
+
+        # ------- check level complete or fail -------
+        outcomes = [self.finish_level()] if self.check_level_complete() else []
+        lap("level")
+        return outcomes
+
+    def next_timer_change(self):
+        """Seconds until the HUD countdown shows a new value or a hint appears, or None if neither is due."""
+        waits = []
+        if self.time_limit:
+            elapsed = self.clock.now() - self.level_start_time
+            waits.append(1.0 - elapsed % 1.0)
+        if self.hints and not self.popup and not self.drag_mode:
+            idle = self.clock.now() - self.last_active
+            if idle < self.hint_after:
+                waits.append(self.hint_after - idle)
+        return min(waits) if waits else None
+
+    def hint(self):
+        """The HintEngine's hint once the player has been idle for hint_after seconds, else None."""
+        if not self.hints or self.popup or self.drag_mode:
+            return None
+        if self.clock.now() - self.last_active < self.hint_after:
+            return None
+        return self.hints.hint(self)
+
     def check_badges(self):
         """Check and award badges based on performance"""
         new_badges = []
@@ -562,6 +2579,7 @@ class GameState:
         for badge in new_badges:
             if badge not in self.badges:
                 self.badges.append(badge)
+                self.record("badge", name=badge)
                 self.message += f" 🏆 {badge} Badge Earned!"
                 
     def check_trophies(self):
@@ -569,17 +2587,19 @@ class GameState:
         # Gold Treasure Trophy - 3 levels in a row
         if self.levels_completed_in_row >= 3 and "Gold Treasure Trophy" not in self.trophies:
             self.trophies.append("Gold Treasure Trophy")
+            self.record("trophy", name="Gold Treasure Trophy")
             self.stars += 3
             self.message += " 🏆 Gold Treasure Trophy Earned!"
             
     def level_summary(self):
         # compute comprehensive summary
         coins_recognized = len(self.player.inventory) + self.player.coins_collected
-        level_time = int(time.time() - self.level_start_time)
+        level_time = int(self.clock.now() - self.level_start_time)
         
         # Speed Runner Badge - complete under 30s
         if level_time < 30 and "Speed Runner" not in self.badges:
             self.badges.append("Speed Runner")
+            self.record("badge", name="Speed Runner")
             self.stars += 1
             
         return {
@@ -594,9 +2614,973 @@ class GameState:
             "streak": self.streak
         }
 
+# --------- RENDERING ----------
+INV_X, INV_Y = 12, HEIGHT-90
+HUD_RECT = pygame.Rect(WIDTH-240, 12, 220, 120)
+POPUP_RECT = pygame.Rect(WIDTH//2-220, HEIGHT//2-80, 440, 160)
+TYPE_BUTTON = pygame.Rect(WIDTH//2-160, HEIGHT//2+12, 140, 36)
+DRAG_BUTTON = pygame.Rect(WIDTH//2+20, HEIGHT//2+12, 140, 36)
+MESSAGE_POS = (WIDTH//2-200, HEIGHT-36)
+
+def text_rect(text, pos, font=None, color=WHITE):
+    """Rect that draw_text() would cover, without drawing anything."""
+    return TEXT_CACHE.render(str(text), font or FONT, color).get_rect(topleft=pos)
+
+def bake_static_layer(walls):
+    """Background and walls never change during a level - draw them once."""
+    layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+    layer.fill(BG)
+    for w in walls:
+        w.draw(layer)
+    return layer
+
+def draw_board(surf, state):
+    ATLAS.prepare(state)
+    # slots, then coins still lying on the board (the dragged one is drawn under the mouse instead)
+    for s in state.slots:
+        s.draw(surf)
+    ATLAS.draw_batch(surf, ATLAS.board_batch(state))
+
+def draw_panels(surf, state):
+    # inventory at bottom-left
+    INVENTORY.draw(surf, state)
+    # achievements
+    draw_text(surf, "Recent Badges: " + ", ".join(state.badges[-2:]) if state.badges else "Badges: None yet", (12, HEIGHT-140), font=FONT, color=SUB)
+    draw_text(surf, f"Trophies: {len(state.trophies)} | Chests: {UNLOCKS['chests_unlocked']}", (12, HEIGHT-160), font=FONT, color=SUB)
+    if state.streak > 0:
+        draw_text(surf, f"Streak: {state.streak} correct! 🔥", (12, HEIGHT-120), font=FONT, color=ACCENT)
+
+def hud_values(state):
+    remaining = None
+    if state.time_limit:
+        elapsed = int(state.clock.now() - state.level_start_time)
+        remaining = max(0, state.time_limit - elapsed)
+    return state.score, state.lives, state.level, state.stars, remaining
+
+class Hud(Widget):
+    """Score, lives, level, stars and the level timer (top right)."""
+
+    def key(self, state):
+        # score and lives are covered by hud_version; level, stars and the timer are plain ints
+        return (state.hud_version,) + hud_values(state)[2:]
+
+    def bounds(self, state):
+        return HUD_RECT
+
+    def paint(self, surf, state, ox, oy):
+        score, lives, level, stars, remaining = hud_values(state)
+        x, y = HUD_RECT.x - ox + 12, HUD_RECT.y - oy
+        pygame.draw.rect(surf, CARD, HUD_RECT.move(-ox, -oy), border_radius=8)
+        draw_text(surf, f"Score: {score}", (x, y+8), font=FONT, color=ACCENT)
+        draw_text(surf, f"Lives: {lives}", (x, y+28), font=FONT, color=WHITE)
+        draw_text(surf, f"Level: {level}", (x, y+48), font=FONT, color=WHITE)
+        draw_text(surf, f"Stars: {stars}", (x, y+68), font=FONT, color=GOLD)
+        # Timer for levels 3+
+        if remaining is not None:
+            color = BAD if remaining < 10 else WHITE
+            draw_text(surf, f"Time: {remaining}s", (x, y+88), font=FONT, color=color)
+
+class InventoryPanel(Widget):
+    """The player's coins, bottom left."""
+
+    PANEL = pygame.Rect(INV_X-8, INV_Y-12, 300, 80)
+
+    def key(self, state):
+        return state.player.inventory.version
+
+    def bounds(self, state):
+        # coins past the sixth run off the right of the panel
+        return self.PANEL.union((INV_X, INV_Y+10, len(state.player.inventory)*48, 36))
+
+    def paint(self, surf, state, ox, oy):
+        pygame.draw.rect(surf, (32, 32, 48), self.PANEL.move(-ox, -oy), border_radius=8)
+        draw_text(surf, "Inventory", (INV_X-ox, INV_Y-10-oy), font=FONT, color=ACCENT)
+        ATLAS.draw(surf, [(("icon", coin.value, coin.fake), (INV_X + i*48 + 20 - ox, INV_Y + 28 - oy))
+                          for i, coin in enumerate(state.player.inventory)])
+
+def popup_rect(state):
+    rect = POPUP_RECT.union(text_rect(state.popup["message"], (WIDTH//2-200, HEIGHT//2-64), font=BIGFONT, color=ACCENT))
+    if state.popup.get("choice") == "type" and state.inputbox:
+        rect.union_ip(state.inputbox.rect)
+        rect.union_ip(text_rect("(Press Enter to submit)", (WIDTH//2-100, HEIGHT//2+62), color=SUB))
+    return rect
+
+class Popup(Widget):
+    """The coin recognition popup: the coin, the two choices and the answer box."""
+
+    def key(self, state):
+        box = state.inputbox
+        return state.popup["version"], state.popup.get("choice"), box and (box.text, box.active)
+
+    def bounds(self, state):
+        return popup_rect(state)
+
+    def paint(self, surf, state, ox, oy):
+        # draw a centered popup
+        pygame.draw.rect(surf, (24,24,36), POPUP_RECT.move(-ox, -oy), border_radius=10)
+        pygame.draw.rect(surf, (70,70,90), POPUP_RECT.move(-ox, -oy), 2, border_radius=10)
+        draw_text(surf, state.popup["message"], (WIDTH//2-200-ox, HEIGHT//2-64-oy), font=BIGFONT, color=ACCENT)
+        # show coin in popup
+        c = state.popup["coin"]
+        pygame.draw.circle(surf, GOLD if not c.fake else SUB, (WIDTH//2-ox, HEIGHT//2-4-oy), c.radius+6)
+        draw_text(surf, f"₹{c.value}", (WIDTH//2-24-ox, HEIGHT//2-18-oy), font=FONT, color=(10,10,10))
+        # two choice buttons
+        type_button, drag_button = TYPE_BUTTON.move(-ox, -oy), DRAG_BUTTON.move(-ox, -oy)
+        pygame.draw.rect(surf, CARD, type_button, border_radius=6)
+        pygame.draw.rect(surf, CARD, drag_button, border_radius=6)
+        pygame.draw.rect(surf, ACCENT, type_button, 2, border_radius=6)
+        pygame.draw.rect(surf, ACCENT, drag_button, 2, border_radius=6)
+        draw_text(surf, "Type value", (type_button.centerx-36, type_button.centery-8), font=FONT, color=WHITE, center=True)
+        draw_text(surf, "Drag to slot", (drag_button.centerx-44, drag_button.centery-8), font=FONT, color=WHITE, center=True)
+        # if the popup choice is type, draw input
+        if state.popup.get("choice") == "type" and state.inputbox:
+            state.inputbox.draw(surf, state.inputbox.rect.move(-ox, -oy))
+            draw_text(surf, "(Press Enter to submit)", (WIDTH//2-100-ox, HEIGHT//2+62-oy), font=FONT, color=SUB)
+
+HUD = Hud()
+INVENTORY = InventoryPanel()
+POPUP = Popup()
+
+def drag_sprite(state):
+    holding = state.holding
+    return ("drag", holding.kind, holding.value, holding.fake)
+
+def drag_rect(state, pos):
+    return drag_bounds(*drag_sprite(state)[1:]).move(pos)
+
+def draw_drag(surf, state, pos):
+    ATLAS.draw(surf, [(drag_sprite(state), pos)])
+
+def draw_message(surf, state):
+    draw_text(surf, state.message, MESSAGE_POS, font=FONT, color=SUB)
+
+HINT_DOT = 3  # radius of the dots along a hint path
+
+def inventory_icon_pos(index):
+    return (INV_X + index*48 + 20, INV_Y + 28)
+
+def hint_rect(hint):
+    if hint[0] == "walk":
+        _, points, coin = hint
+        dots = [pygame.Rect(x - HINT_DOT, y - HINT_DOT, HINT_DOT*2 + 1, HINT_DOT*2 + 1) for x, y in points[2::2]]
+        return coin.rect.inflate(16, 16).unionall(dots)
+    _, index, slot = hint
+    icon = pygame.Rect(0, 0, 50, 50)
+    icon.center = inventory_icon_pos(index)
+    return slot.rect.inflate(12, 12).union(icon)
+
+def draw_hint(surf, hint):
+    """A trail of dots to a coin that helps, or a line from an inventory coin to its slot."""
+    if hint[0] == "walk":
+        _, points, coin = hint
+        for p in points[2::2]:
+            pygame.draw.circle(surf, ACCENT, p, HINT_DOT)
+        pygame.draw.circle(surf, GOLD, coin.rect.center, max(coin.rect.size)//2 + 6, 3)
+    else:
+        _, index, slot = hint
+        icon = inventory_icon_pos(index)
+        pygame.draw.line(surf, GOLD, (icon[0], icon[1] - 22), slot.rect.midbottom, 3)
+        pygame.draw.circle(surf, GOLD, icon, 22, 3)
+        pygame.draw.rect(surf, GOLD, slot.rect.inflate(8, 8), 3, border_radius=8)
+
+def draw_frame(surf, state, mouse_pos, alpha=1.0):
+    """Draw a complete frame from scratch (the "full" render mode)."""
+    surf.fill(BG)
+    for w in state.walls:
+        w.draw(surf)
+    draw_board(surf, state)
+    state.player.draw(surf, state.player.draw_rect(alpha))
+    draw_panels(surf, state)
+    hint = state.hint()
+    if hint:
+        draw_hint(surf, hint)
+    HUD.draw(surf, state)
+    if state.popup:
+        POPUP.draw(surf, state)
+    if state.drag_mode and state.holding:
+        draw_drag(surf, state, mouse_pos)
+    if state.message:
+        draw_message(surf, state)
+
+class DirtyRenderer:
+    """Dirty-rectangle renderer (the "dirty" render mode).
+
+    Background and walls are baked into a static layer once per level.
+    Slots and board coins (under the player) and the inventory/achievement
+    panels (over the player) are baked into two more layers that are only
+    rebuilt when the board changes. Per frame, only the player, the hint, the
+    dragged coin, the HUD, the popup and the message line are tracked; the
+    rectangles they moved out of or changed in are restored from the layers,
+    redrawn and pushed with pygame.display.update(rects).
+    """
+
+    def __init__(self, surf):
+        self.surf = surf
+        self.walls = None
+        self.static = None
+        self.under = None
+        self.over = None
+        self.board_key = None
+        self.items = {}  # name -> (rect, signature) drawn last frame
+        self.full = True
+
+    def invalidate(self):
+        """Force a full redraw next frame (e.g. after an overlay screen)."""
+        self.full = True
+
+    def board_signature(self, state):
+        return (
+            id(state.walls),
+            id(state.holding) if state.drag_mode else None,
+            id(state.coin_store),
+            state.coin_store.version,
+            len(state.coins),
+            tuple(s.version for s in state.slots),
+            state.player.inventory.version,
+            tuple(state.badges[-2:]),
+            len(state.trophies),
+            UNLOCKS["chests_unlocked"],
+            state.streak,
+        )
+
+    def rebuild_layers(self, state):
+        if state.walls is not self.walls:
+            self.walls = state.walls
+            self.static = bake_static_layer(state.walls)
+        self.under = self.static.copy()
+        draw_board(self.under, state)
+        self.over = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA).convert_alpha()
+        draw_panels(self.over, state)
+
+    def dynamic_items(self, state, mouse_pos, alpha=1.0):
+        """(name, rect, signature, draw) for everything that may change per frame.
+
+        The player sits below the panel layer; the rest is drawn above it.
+        """
+        player_rect = state.player.draw_rect(alpha)
+        below = [("player", player_rect, None, lambda s: state.player.draw(s, player_rect))]
+        above = []
+        hint = state.hint()
+        if hint:
+            above.append(("hint", hint_rect(hint), hint, lambda s: draw_hint(s, hint)))
+        above.append(("hud", HUD_RECT, HUD.key(state), lambda s: HUD.draw(s, state)))
+        if state.popup:
+            POPUP.render(state)
+            above.append(("popup", POPUP.surface_rect, POPUP.drawn_key, lambda s: POPUP.draw(s, state)))
+        if state.drag_mode and state.holding:
+            sig = (id(state.holding), mouse_pos)
+            above.append(("drag", drag_rect(state, mouse_pos), sig, lambda s: draw_drag(s, state, mouse_pos)))
+        if state.message:
+            rect = text_rect(state.message, MESSAGE_POS, color=SUB)
+            above.append(("message", rect, state.message, lambda s: draw_message(s, state)))
+        if PROFILER.show_overlay:
+            above.append(("profiler", PROFILER.overlay_rect(), PROFILER.overlay_version, PROFILER.draw_overlay))
+        return below, above
+
+    def draw(self, state, mouse_pos, alpha=1.0):
+        board_key = self.board_signature(state)
+        if board_key != self.board_key:
+            self.board_key = board_key
+            self.rebuild_layers(state)
+            self.full = True
+        below, above = self.dynamic_items(state, mouse_pos, alpha)
+        items = below + above
+
+        if self.full:
+            self.surf.blit(self.under, (0, 0))
+            for _, _, _, draw in below:
+                draw(self.surf)
+            self.surf.blit(self.over, (0, 0))
+            for _, _, _, draw in above:
+                draw(self.surf)
+            PROFILER.lap("draw")
+            pygame.display.flip()
+            self.full = False
+        else:
+            dirty = []
+            seen = set()
+            for name, rect, sig, _ in items:
+                seen.add(name)
+                prev = self.items.get(name)
+                if prev is None:
+                    dirty.append(rect)
+                elif prev[0] != rect or prev[1] != sig:
+                    old = prev[0]
+                    dirty.append(old.union(rect) if old.colliderect(rect) else old)
+                    if not old.colliderect(rect):
+                        dirty.append(rect)
+            for name, (rect, _) in self.items.items():
+                if name not in seen:
+                    dirty.append(rect)
+            for r in dirty:
+                self.surf.set_clip(r)
+                self.surf.blit(self.under, r, r)
+                for _, rect, _, draw in below:
+                    if rect.colliderect(r):
+                        draw(self.surf)
+                self.surf.blit(self.over, r, r)
+                for _, rect, _, draw in above:
+                    if rect.colliderect(r):
+                        draw(self.surf)
+            self.surf.set_clip(None)
+            PROFILER.lap("draw")
+            if dirty:
+                pygame.display.update(dirty)
+        self.items = {name: (rect, sig) for name, rect, sig, _ in items}
+
+# --------- SCENES ----------
+STATIC_WAIT = 1.0  # longest a static screen sleeps between frames when no input arrives
+LEVEL_CARD_TIME = 2.0
+VICTORY_CARD_TIME = 3.0
+GAME_OVER_CARD_TIME = 2.0
+EXPOSE_EVENTS = {pygame.VIDEOEXPOSE, getattr(pygame, "WINDOWEXPOSED", pygame.VIDEOEXPOSE)}
+
+def handle_events(state, events, inputs):
+    """Turn this frame's pygame events into actions on `inputs`.
+
+    Returns False when the player asked to quit.
+    """
+    running = True
+    actions = inputs.actions
+    for event in events:
+        if event.type == pygame.QUIT:
+            running = False
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                running = False
+            if event.key == pygame.K_r:
+                actions.append(("restart",))
+            if event.key == pygame.K_F3:
+                PROFILER.toggle_overlay()
+            # handle enter for inputbox
+            if state.inputbox:
+                res = state.inputbox.handle_event(event)
+                if res == "SUBMIT":
+                    if state.popup and state.popup["choice"] == "type":
+                        actions.append(("answer", state.inputbox.submit()))
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            mx,my = inputs.mouse
+            # If there is a popup and clicking buttons
+            if state.popup:
+                if TYPE_BUTTON.collidepoint((mx,my)):
+                    actions.append(("choose", "type"))
+                elif DRAG_BUTTON.collidepoint((mx,my)):
+                    actions.append(("choose", "drag"))
+            # If clicking on inventory coins to place into slot
+            # Inventory coins drawn at bottom-left
+            elif not state.drag_mode:
+                for i, coin in enumerate(state.player.inventory):
+                    coin_rect = pygame.Rect(INV_X + i*48, INV_Y, 40, 40)
+                    if coin_rect.collidepoint((mx,my)):
+                        actions.append(("take_inventory", i))
+                        break
+        if event.type == pygame.MOUSEBUTTONUP:
+            if state.drag_mode and state.holding:
+                actions.append(("drop", inputs.mouse))
+        # inputbox also needs mouse events (keys were handled above)
+        if state.inputbox and event.type != pygame.KEYDOWN:
+            state.inputbox.handle_event(event)
+    return running
+
+class Scene:
+    """One screen of the game, driven by the main loop once per frame.
+
+    update() returns the scene to show next (itself to stay, None to quit)
+    and draw() paints the frame. idle_wait() is how long the loop may sleep
+    waiting for input before the next frame, or None to run at FPS.
+    """
+
+    profiled = False  # frame times only mean something during play
+
+    def __init__(self, game):
+        self.game = game
+
+    def enter(self):
+        self.invalidate()
+
+    def invalidate(self):
+        """Repaint everything next frame (e.g. after the window was uncovered)."""
+
+    def update(self, events, inputs, dt):
+        return self
+
+    def draw(self, surf, mouse_pos):
+        pass
+
+    def idle_wait(self):
+        return None
+
+class StaticScene(Scene):
+    """A screen that is drawn once and then only waits for input or time."""
+
+    def invalidate(self):
+        self.drawn = False
+
+    def draw(self, surf, mouse_pos):
+        if not self.drawn:
+            self.paint(surf)
+            pygame.display.flip()
+            self.drawn = True
+
+    def paint(self, surf):
+        pass
+
+    def idle_wait(self):
+        return STATIC_WAIT
+
+class TitleScene(StaticScene):
+    def update(self, events, inputs, dt):
+        for event in events:
+            if event.type == pygame.QUIT:
+                return None
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    return PlayScene(self.game)
+                elif event.key == pygame.K_ESCAPE:
+                    return None
+        return self
+
+    def paint(self, surf):
+        draw_instructions(surf)
+
+class CardScene(StaticScene):
+    """A summary card over the last game frame that moves on after `duration` seconds."""
+
+    def __init__(self, game, draw_card, duration, after):
+        super().__init__(game)
+        self.draw_card = draw_card
+        self.duration = duration
+        self.after = after  # () -> the scene that follows
+        self.elapsed = 0.0
+
+    def update(self, events, inputs, dt):
+        for event in events:
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return None
+        self.elapsed += dt
+        if self.elapsed >= self.duration:
+            return self.after()
+        return self
+
+    def paint(self, surf):
+        self.draw_card(surf, self.game.state)
+
+    def idle_wait(self):
+        return max(0.0, min(STATIC_WAIT, self.duration - self.elapsed))
+
+class PlayScene(Scene):
+    """The game itself: fixed-tick updates, drawn every frame unless idle."""
+
+    profiled = True
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.stepper = FixedTimestep()
+        self.idle_time = 0.0
+        self.last_mouse = None
+
+    def invalidate(self):
+        if self.game.renderer:
+            self.game.renderer.invalidate()
+
+    def update(self, events, inputs, dt):
+        game = self.game
+        state = game.state
+        if not handle_events(state, events, inputs):
+            return None
+        PROFILER.lap("events")
+        player = state.player
+        quiet = (not any(e.type in EVENT_CODES for e in events) and not inputs.dx and not inputs.dy
+                 and inputs.mouse == self.last_mouse and not state.drag_mode
+                 and player.prev_pos == player.rect.topleft and not PROFILER.show_overlay)
+        self.idle_time = self.idle_time + dt if quiet else 0.0
+        self.last_mouse = inputs.mouse
+
+        for outcome in self.stepper.advance(state, inputs, dt, PROFILER.lap):
+            game.outcomes[outcome] += 1
+            if outcome == "level_complete":
+                return CardScene(game, draw_level_complete, LEVEL_CARD_TIME, lambda: self)
+            if outcome == "victory":
+                victory = lambda: CardScene(game, draw_victory, VICTORY_CARD_TIME, game.new_game)
+                return CardScene(game, draw_level_complete, LEVEL_CARD_TIME, victory)
+            if outcome == "game_over":
+                return CardScene(game, draw_game_over, GAME_OVER_CARD_TIME, game.new_game)
+            self.invalidate()  # timeout: the level restarted on a new board
+        return self
+
+    def draw(self, surf, mouse_pos):
+        state = self.game.state
+        if PROFILER.show_overlay:
+            PROFILER.update_overlay()
+        if self.game.renderer:
+            self.game.renderer.draw(state, mouse_pos, self.stepper.alpha)
+        else:
+            draw_frame(surf, state, mouse_pos, self.stepper.alpha)
+            if PROFILER.show_overlay:
+                PROFILER.draw_overlay(surf)
+            PROFILER.lap("draw")
+            pygame.display.flip()
+
+    def idle_wait(self):
+        if self.idle_time < IDLE_AFTER:
+            return None
+        timer = self.game.state.next_timer_change()
+        return IDLE_MAX_WAIT if timer is None else min(IDLE_MAX_WAIT, timer)
+
+class SceneManager:
+    """Holds one session's game state and runs whichever scene is current.
+
+    Every frame goes update(), then draw(); nothing blocks, so the window
+    keeps handling events while the title and summary screens are up.
+    """
+
+    def __init__(self, boards, clock, renderer=None, log=None, hint_after=None):
+        self.boards = boards
+        self.renderer = renderer
+        self.log = log
+        self.hint_after = hint_after
+        self.state = GameState(clock=clock, boards=boards, log=log, hint_after=hint_after)
+        self.outcomes = defaultdict(int)
+        self.running = True
+        self.scene = TitleScene(self)
+        self.scene.enter()
+
+    def new_game(self):
+        self.state = GameState(clock=self.state.clock, boards=self.boards, log=self.log, hint_after=self.hint_after)
+        return TitleScene(self)
+
+    def update(self, events, inputs, dt):
+        if any(e.type in EXPOSE_EVENTS for e in events):
+            self.scene.invalidate()
+        scene = self.scene.update(events, inputs, dt)
+        if scene is None:
+            self.running = False
+        elif scene is not self.scene:
+            self.scene = scene
+            scene.enter()
+
+    def draw(self, surf, mouse_pos):
+        self.scene.draw(surf, mouse_pos)
+
+    def idle_wait(self):
+        return self.scene.idle_wait()
+
+# --------- RECORD / REPLAY ----------
+# A recording is a header (magic, version, seed) followed by one record per
+# frame: a flags byte, the frame time in ms as a varint, then only what
+# changed since the previous frame - the held-key bitmask (XOR delta), the
+# mouse position, and the events the game reacts to.
+REPLAY_MAGIC = b"TCHR"
+REPLAY_VERSION = 2
+REPLAY_HEADER = struct.Struct("<4sHQ")
+REPLAY_POS = struct.Struct("<hh")
+FRAME_KEYS = 1
+FRAME_MOUSE = 2
+FRAME_EVENTS = 4
+
+RECORDED_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN,
+                 pygame.K_a, pygame.K_d, pygame.K_w, pygame.K_s)
+KEY_BITS = {key: 1 << i for i, key in enumerate(RECORDED_KEYS)}
+EV_QUIT, EV_KEYDOWN, EV_MOUSEDOWN, EV_MOUSEUP = range(4)
+EVENT_CODES = {pygame.QUIT: EV_QUIT, pygame.KEYDOWN: EV_KEYDOWN,
+               pygame.MOUSEBUTTONDOWN: EV_MOUSEDOWN, pygame.MOUSEBUTTONUP: EV_MOUSEUP}
+EVENT_TYPES = {code: kind for kind, code in EVENT_CODES.items()}
+
+def write_varint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def read_varint(data, i):
+    n = shift = 0
+    while True:
+        b = data[i]
+        i += 1
+        n |= (b & 0x7f) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+
+class RecordedKeys:
+    """pygame.key.get_pressed() stand-in rebuilt from a recorded bitmask."""
+
+    __slots__ = ("mask",)
+
+    def __init__(self, mask=0):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        return bool(self.mask & KEY_BITS.get(key, 0))
+
+class LiveInput:
+    """Frame timing and input from pygame, optionally written to a recording."""
+
+    def __init__(self, recorder=None):
+        self.recorder = recorder
+        self.ms = 0
+
+    def tick(self, wait=None):
+        """Wait for the next frame and return the frame time in ms.
+
+        With `wait` (seconds) the frame is an idle one: sleep until input
+        arrives or `wait` runs out instead of pacing to FPS.
+        """
+        if wait is not None:
+            event = pygame.event.wait(max(1, int(wait * 1000)))
+            if event.type != pygame.NOEVENT:
+                pygame.event.post(event)  # leave it for poll()
+            self.ms = clock.tick()
+        else:
+            self.ms = clock.tick(FPS)
+        return self.ms
+
+    def poll(self):
+        events = pygame.event.get()
+        keys = pygame.key.get_pressed()
+        mouse = pygame.mouse.get_pos()
+        if self.recorder:
+            self.recorder.record(self.ms, events, keys, mouse)
+        return events, keys, mouse
+
+    def close(self):
+        if self.recorder:
+            self.recorder.close()
+
+class InputRecorder:
+    """Writes the frames of a session to a recording file."""
+
+    def __init__(self, path, seed):
+        self.file = open(path, "wb")
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed))
+        self.mask = 0
+        self.mouse = None
+        self.frames = 0
+
+    def record(self, ms, events, keys, mouse):
+        mask = 0
+        for key, bit in KEY_BITS.items():
+            if keys[key]:
+                mask |= bit
+        recorded = [e for e in events if e.type in EVENT_CODES]
+        flags = 0
+        body = bytearray()
+        if mask != self.mask:
+            flags |= FRAME_KEYS
+            body.append(mask ^ self.mask)
+            self.mask = mask
+        if mouse != self.mouse:
+            flags |= FRAME_MOUSE
+            body += REPLAY_POS.pack(*mouse)
+            self.mouse = mouse
+        if recorded:
+            flags |= FRAME_EVENTS
+            write_varint(body, len(recorded))
+            for event in recorded:
+                code = EVENT_CODES[event.type]
+                body.append(code)
+                if code == EV_KEYDOWN:
+                    text = event.unicode.encode("utf-8")
+                    write_varint(body, event.key)
+                    write_varint(body, len(text))
+                    body += text
+                elif code in (EV_MOUSEDOWN, EV_MOUSEUP):
+                    body.append(event.button)
+                    body += REPLAY_POS.pack(*event.pos)
+        head = bytearray([flags])
+        write_varint(head, ms)
+        self.file.write(head + body)
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+class ReplayInput:
+    """Plays a recording back as frame timing and input, as fast as it can.
+
+    Ends with a QUIT event after the last recorded frame.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version, self.seed = REPLAY_HEADER.unpack_from(self.data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} recording")
+        self.pos = REPLAY_HEADER.size
+        self.keys = RecordedKeys()
+        self.mouse = (0, 0)
+        self.events = []
+        self.frames = 0
+
+    def tick(self, wait=None):
+        """Decode the next frame and return its frame time in ms."""
+        data = self.data
+        if self.pos >= len(data):
+            self.events = [pygame.event.Event(pygame.QUIT)]
+            return 0
+        flags = data[self.pos]
+        ms, i = read_varint(data, self.pos + 1)
+        self.events = []
+        if flags & FRAME_KEYS:
+            self.keys = RecordedKeys(self.keys.mask ^ data[i])
+            i += 1
+        if flags & FRAME_MOUSE:
+            self.mouse = REPLAY_POS.unpack_from(data, i)
+            i += REPLAY_POS.size
+        if flags & FRAME_EVENTS:
+            count, i = read_varint(data, i)
+            for _ in range(count):
+                code = data[i]
+                i += 1
+                if code == EV_KEYDOWN:
+                    key, i = read_varint(data, i)
+                    size, i = read_varint(data, i)
+                    text = data[i:i + size].decode("utf-8")
+                    i += size
+                    event = pygame.event.Event(pygame.KEYDOWN, key=key, unicode=text, mod=0)
+                elif code in (EV_MOUSEDOWN, EV_MOUSEUP):
+                    button = data[i]
+                    pos = REPLAY_POS.unpack_from(data, i + 1)
+                    i += 1 + REPLAY_POS.size
+                    event = pygame.event.Event(EVENT_TYPES[code], button=button, pos=pos)
+                else:
+                    event = pygame.event.Event(EVENT_TYPES[code])
+                self.events.append(event)
+        self.pos = i
+        self.frames += 1
+        return ms
+
+    def poll(self):
+        if pygame.display.get_init():
+            pygame.event.pump()  # keep the window responsive; live input is ignored
+        return self.events, self.keys, self.mouse
+
+    def close(self):
+        pass
+
+def open_boards(seed, level_file=None):
+    """The board source for a session; the same seed always deals the same boards."""
+    if level_file:
+        return LevelFile(level_file, rng=random.Random(seed))
+    return LevelPrefetcher(seed=seed)
+
+def replay(path, level_file=None):
+    """Run the scenes through a recording without drawing anything.
+
+    Returns the final state, the number of frames and a count of level
+    outcomes. Pass the same level_file the session was recorded with.
+    """
+    source = ReplayInput(path)
+    random.seed(source.seed)
+    boards = open_boards(source.seed, level_file)
+    game = SceneManager(boards, SimClock())
+    while game.running:
+        dt = source.tick() / 1000.0
+        events, keys, mouse = source.poll()
+        game.update(events, input_from_keys(keys, mouse), dt)
+    boards.stop()
+    return game.state, source.frames, dict(game.outcomes)
+
+# --------- EVENT LOG ----------
+PROGRESS_FILE = os.path.join(os.path.expanduser("~"), ".local", "share", "treasure_coin_hunt", "progress.db")
+EVENT_QUEUE_SIZE = 4096  # events waiting for the writer; more than that are dropped
+EVENT_BATCH = 256  # events per transaction at most
+EVENT_FLUSH_INTERVAL = 0.5  # seconds an event may wait for its batch to fill
+
+class EventLog:
+    """Append-only log of play sessions: answers, placements, level results
+    and awards, one row per event in SQLite (WAL mode).
+
+    log() only puts the event on a bounded queue, so a frame never waits for
+    the disk. A writer thread takes events off in batches and commits each
+    batch in one transaction; when the queue is full, events are dropped and
+    counted rather than blocking the game. close() - also run at exit -
+    writes whatever is still queued.
+
+    Committed batches survive a crash: SQLite recovers its WAL on the next
+    open. A database that cannot be read at all is moved aside and a new
+    one started.
+
+    Lifetime totals (chests, stars, badges, trophies) are kept in the
+    one-row progress table, updated in the same transaction as each batch,
+    so startup reads one row instead of the whole history. Once open, the
+    writer reads them (see progress()); restore() puts them in UNLOCKS.
+    """
+
+    SCHEMA = ("""CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        session TEXT NOT NULL,
+        time REAL NOT NULL,
+        kind TEXT NOT NULL,
+        data TEXT NOT NULL)""",
+              """CREATE TABLE IF NOT EXISTS progress (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        last_event INTEGER NOT NULL,
+        chests INTEGER NOT NULL,
+        stars INTEGER NOT NULL,
+        badges TEXT NOT NULL,
+        trophies TEXT NOT NULL)""")
+    PROGRESS_KINDS = ("level", "badge", "trophy")
+
+    def __init__(self, path=PROGRESS_FILE, queue_size=EVENT_QUEUE_SIZE, batch=EVENT_BATCH,
+                 flush_interval=EVENT_FLUSH_INTERVAL):
+        self.path = path
+        self.session = os.urandom(8).hex()  # not from `random`, which must stay seeded for replays
+        self.queue = queue.Queue(queue_size)
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.error = None  # why nothing is being saved, if the database could not be opened
+        self.ready = threading.Event()  # set once the database is open and the saved totals read
+        self.saved = None  # progress() of the database, None if it could not be opened
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+        return self
+
+    def restore(self, unlocks=UNLOCKS):
+        """Wait for the database to open and set `unlocks` to the saved totals.
+
+        The totals cover every session logged so far, this process's earlier
+        ones included, so they replace what is in `unlocks` rather than add
+        to it - a resident host restoring once per session counts each chest once.
+        """
+        self.ready.wait()
+        if self.saved is None:
+            return
+        unlocks["chests_unlocked"] = self.saved["chests_unlocked"]
+        unlocks["stars"] = self.saved["stars"]
+        for key in ("badges", "trophies"):
+            unlocks[key][:] = self.saved[key]
+
+    def log(self, kind, **data):
+        try:
+            self.queue.put_nowait((time.time(), kind, data))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Write out everything logged so far and stop the writer."""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        atexit.unregister(self.close)
+
+    def _connect(self, sqlite3):
+        db = sqlite3.connect(self.path)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # with WAL: a crash may lose the last batches, never corrupts
+            for statement in self.SCHEMA:
+                db.execute(statement)
+            db.execute("SELECT count(*) FROM events").fetchone()
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    def _open(self):
+        import sqlite3  # only the writer thread needs it; keeps startup fast
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        try:
+            return self._connect(sqlite3)
+        except sqlite3.DatabaseError:
+            # unreadable (not a database, or damaged beyond what the WAL recovers):
+            # keep it for inspection and start a new one
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.replace(self.path + suffix, self.path + ".corrupt" + suffix)
+            return self._connect(sqlite3)
+
+    def progress(self, db):
+        """Lifetime totals from earlier sessions, in the shape of UNLOCKS.
+
+        Reads the progress row and adds any events logged after it - all of
+        them the first time a database from before the table is opened.
+        """
+        with db:
+            last = db.execute("SELECT coalesce(max(last_event), 0) FROM progress").fetchone()[0]
+            totals = self._totals(db)
+            rows = db.execute(f"SELECT kind, data FROM events WHERE id > ? AND kind IN {self.PROGRESS_KINDS}",
+                              (last,)).fetchall()
+            for kind, data in rows:
+                self._count(totals, kind, json.loads(data))
+            self._save_totals(db, totals)
+        return totals
+
+    @staticmethod
+    def _totals(db):
+        row = db.execute("SELECT chests, stars, badges, trophies FROM progress WHERE id = 1").fetchone()
+        chests, stars, badges, trophies = row or (0, 0, "[]", "[]")
+        return {"chests_unlocked": chests, "badges": json.loads(badges), "trophies": json.loads(trophies), "stars": stars}
+
+    @staticmethod
+    def _count(totals, kind, data):
+        """Add one logged event to `totals`."""
+        if kind in ("badge", "trophy"):
+            names = totals["badges" if kind == "badge" else "trophies"]
+            if data["name"] not in names:
+                names.append(data["name"])
+                names.sort()
+        elif kind == "level":
+            if data.get("outcome") in ("level_complete", "victory"):
+                totals["chests_unlocked"] += 1
+            if data.get("outcome") in ("victory", "game_over"):
+                totals["stars"] += data.get("stars", 0)  # a game's stars, counted once when it ends
+
+    @staticmethod
+    def _save_totals(db, totals):
+        db.execute("INSERT OR REPLACE INTO progress (id, last_event, chests, stars, badges, trophies) "
+                   "VALUES (1, (SELECT coalesce(max(id), 0) FROM events), ?, ?, ?, ?)",
+                   (totals["chests_unlocked"], totals["stars"], json.dumps(totals["badges"]), json.dumps(totals["trophies"])))
+
+    def _run(self):
+        try:
+            db = self._open()
+        except Exception as e:  # no saving this session, but keep draining the queue
+            self.error = e
+            db = None
+        if db is not None:
+            self.saved = self.progress(db)
+        self.ready.set()
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            events = batch[:len(batch) - stop]
+            rows = [(self.session, t, kind, json.dumps(data)) for t, kind, data in events]
+            if rows and db is not None:
+                with db:
+                    db.executemany("INSERT INTO events (session, time, kind, data) VALUES (?, ?, ?, ?)", rows)
+                    # read after the insert, inside the write transaction, so another writer's batch is kept
+                    totals = self._totals(db)
+                    for t, kind, data in events:
+                        self._count(totals, kind, data)
+                    self._save_totals(db, totals)
+                self.written += len(rows)
+                self.batches += 1
+            if stop:
+                break
+        if db is not None:
+            db.close()
+
 # --------- MAIN GAME LOOP & DRAW ----------
-def show_instructions(screen):
-    """Show game instructions at the start"""
+def draw_instructions(screen):
+    """Game instructions - the title screen"""
     screen.fill(BG)
     
     # Title
@@ -636,273 +3620,189 @@ def show_instructions(screen):
             draw_text(screen, line, (WIDTH//2, y), font=FONT, color=WHITE, center=True)
         y += 25
     
-    pygame.display.flip()
-    
-    # Wait for space key
-    waiting = True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    waiting = False
-                elif event.key == pygame.K_ESCAPE:
-                    return False
-    return True
-
-def main():
-    state = GameState()
-    
-    # Show instructions first
-    if not show_instructions(screen):
-        return
-    
-    state.show_instructions = False
-    running = True
-    mouse_down = False
-
-    while running:
-        dt = clock.tick(FPS) / 1000.0
-        screen.fill(BG)
-
-        # ------- input handling -------
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-                if event.key == pygame.K_r:
-                    # restart level
-                    state.reset_level()
-                    state.lives = START_LIVES
-                    state.score = 0
-                    state.badges = []
-                # handle enter for inputbox
-                if state.inputbox:
-                    res = state.inputbox.handle_event(event)
-                    if res == "SUBMIT":
-                        if state.popup and state.popup["choice"] == "type":
-                            ans = state.inputbox.submit()
-                            state.commit_type_answer(state.popup["coin"], ans)
-                else:
-                    # movement handled below
-                    pass
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_down = True
-                mx,my = pygame.mouse.get_pos()
-                # If in drag mode and holding coin, click should grab coin
-                if state.drag_mode and state.holding:
-                    # manual drag handled by mouse position
-                    pass
-                # If there is a popup and clicking buttons
-                if state.popup:
-                    # type button
-                    tb = pygame.Rect(WIDTH//2-160, HEIGHT//2+12, 140, 36)
-                    db = pygame.Rect(WIDTH//2+20, HEIGHT//2+12, 140, 36)
-                    if tb.collidepoint((mx,my)):
-                        state.popup["choice"] = "type"
-                        state.inputbox.active = True
-                    elif db.collidepoint((mx,my)):
-                        state.popup["choice"] = "drag"
-                        state.start_drag_mode(state.popup["coin"])
-                # If clicking on inventory coins to place into slot
-                # Inventory coins drawn at bottom-left
-                inv_x = 12
-                inv_y = HEIGHT-90
-                if not state.popup and not state.drag_mode:
-                    for i, coin in enumerate(state.player.inventory):
-                        coin_rect = pygame.Rect(inv_x + i*48, inv_y, 40, 40)
-                        if coin_rect.collidepoint((mx,my)):
-                            # pick up from inventory for drag-placing
-                            state.holding = coin
-                            if coin in state.player.inventory:
-                                state.player.inventory.remove(coin)
-                            state.drag_mode = True
-                            break
-            if event.type == pygame.MOUSEBUTTONUP:
-                mouse_down = False
-                if state.drag_mode and state.holding:
-                    state.end_drag_mode(pygame.mouse.get_pos())
-            if event.type == pygame.MOUSEMOTION:
-                pass
-            # inputbox also needs mouse events
-            if state.inputbox:
-                state.inputbox.handle_event(event)
-
-        # ------- player movement -------
-        keys = pygame.key.get_pressed()
-        dx = dy = 0
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            dx = -state.player.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            dx = state.player.speed
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
-            dy = -state.player.speed
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-            dy = state.player.speed
-        state.player.move(dx, dy, state.walls)
-
-        # ------- collisions with coins -------
-        if not state.popup and not state.drag_mode:
-            for coin in state.coins[:]:
-                if coin.rect.colliderect(state.player.rect) and not coin.collected:
-                    state.pick_coin(coin)
-                    break
-
-        # ------- draw walls -------
-        for w in state.walls:
-            w.draw(screen)
-
-        # ------- draw slots -------
-        for s in state.slots:
-            s.draw(screen)
-
-        # ------- draw coins (remaining on board) -------
-        for coin in state.coins:
-            coin.draw(screen)
-
-        # ------- draw player -------
-        state.player.draw(screen)
-
-        # ------- draw inventory at bottom-left -------
-        inv_x = 12
-        inv_y = HEIGHT-90
-        pygame.draw.rect(screen, (32, 32, 48), (inv_x-8, inv_y-12, 300, 80), border_radius=8)
-        draw_text(screen, "Inventory", (inv_x, inv_y-10), font=FONT, color=ACCENT)
-        for i, coin in enumerate(state.player.inventory):
-            cx = inv_x + i*48
-            cy = inv_y + 28
-            pygame.draw.circle(screen, GOLD if not coin.fake else SUB, (cx+20, cy), 18)
-            draw_text(screen, f"₹{coin.value}", (cx+6, cy-8), font=FONT, color=(10,10,10))
-
-        # ------- draw HUD (score/lives/time) -------
-        hud_x = WIDTH-240
-        hud_y = 12
-        pygame.draw.rect(screen, CARD, (hud_x, hud_y, 220, 120), border_radius=8)
-        draw_text(screen, f"Score: {state.score}", (hud_x+12, hud_y+8), font=FONT, color=ACCENT)
-        draw_text(screen, f"Lives: {state.lives}", (hud_x+12, hud_y+28), font=FONT, color=WHITE)
-        draw_text(screen, f"Level: {state.level}", (hud_x+12, hud_y+48), font=FONT, color=WHITE)
-        draw_text(screen, f"Stars: {state.stars}", (hud_x+12, hud_y+68), font=FONT, color=GOLD)
-        
-        # Timer for levels 3+
-        if state.time_limit:
-            elapsed = int(time.time() - state.level_start_time)
-            remaining = max(0, state.time_limit - elapsed)
-            color = BAD if remaining < 10 else WHITE
-            draw_text(screen, f"Time: {remaining}s", (hud_x+12, hud_y+88), font=FONT, color=color)
 
-        # ------- popup quiz UI -------
-        if state.popup:
-            # draw a centered popup
-            pygame.draw.rect(screen, (24,24,36), (WIDTH//2-220, HEIGHT//2-80, 440, 160), border_radius=10)
-            pygame.draw.rect(screen, (70,70,90), (WIDTH//2-220, HEIGHT//2-80, 440, 160), 2, border_radius=10)
-            draw_text(screen, state.popup["message"], (WIDTH//2-200, HEIGHT//2-64), font=BIGFONT, color=ACCENT)
-            # show coin in popup
-            c = state.popup["coin"]
-            # coin center
-            pygame.draw.circle(screen, GOLD if not c.fake else SUB, (WIDTH//2, HEIGHT//2-4), c.radius+6)
-            draw_text(screen, f"₹{c.value}", (WIDTH//2-24, HEIGHT//2-18), font=FONT, color=(10,10,10))
-            # two choice buttons
-            tb = pygame.Rect(WIDTH//2-160, HEIGHT//2+12, 140, 36)
-            db = pygame.Rect(WIDTH//2+20, HEIGHT//2+12, 140, 36)
-            pygame.draw.rect(screen, CARD, tb, border_radius=6)
-            pygame.draw.rect(screen, CARD, db, border_radius=6)
-            pygame.draw.rect(screen, ACCENT, tb, 2, border_radius=6)
-            pygame.draw.rect(screen, ACCENT, db, 2, border_radius=6)
-            draw_text(screen, "Type value", (tb.centerx-36, tb.centery-8), font=FONT, color=WHITE, center=True)
-            draw_text(screen, "Drag to slot", (db.centerx-44, db.centery-8), font=FONT, color=WHITE, center=True)
-            # if the popup choice is type, draw input
-            if state.popup.get("choice") == "type" and state.inputbox:
-                state.inputbox.draw(screen)
-                draw_text(screen, "(Press Enter to submit)", (WIDTH//2-100, HEIGHT//2+62), font=FONT, color=SUB)
-
-        # ------- during drag mode: draw holding coin under mouse -------
-        if state.drag_mode and state.holding:
-            mx,my = pygame.mouse.get_pos()
-            r = state.holding.rect
-            r.center = (mx, my)
-            # draw coin under cursor
-            if state.holding.kind == "coin":
-                pygame.draw.circle(screen, GOLD if not state.holding.fake else SUB, (mx,my), state.holding.radius)
-                draw_text(screen, f"₹{state.holding.value}", (mx-18, my-10), font=FONT, color=(10,10,10))
-            else:
-                rr = pygame.Rect(mx-state.holding.radius, my-state.holding.radius, state.holding.radius*2, state.holding.radius*2)
-                pygame.draw.rect(screen, (80,150,100) if not state.holding.fake else (120,120,120), rr, border_radius=6)
-                draw_text(screen, f"₹{state.holding.value}", (rr.x+8, rr.y+6), font=FONT, color=WHITE)
-
-        # ------- messages & hints -------
-        if state.message:
-            draw_text(screen, state.message, (WIDTH//2-200, HEIGHT-36), font=FONT, color=SUB)
+def report_first_frame(ms):
+    print(f"first frame after {ms:.0f} ms")
+
+def main(render_mode="dirty", level_file=None, profile_path=None, seed=None, record_path=None, replay_path=None,
+         started=None, on_first_frame=None, progress_path=PROGRESS_FILE, hint_after=HINT_AFTER):
+    """Play the game in a window.
+
+    record_path writes the session to a recording; replay_path plays one
+    back as fast as possible instead of reading the keyboard and mouse.
+    Game time is the sum of frame times, so a replay runs the same timers.
+
+    Play is logged to the EventLog at progress_path (None: not saved);
+    replays are not logged again.
+
+    After hint_after seconds without moving or acting, a hint shows the way
+    to a coin that helps fill the current slot (None: no hints).
+
+    One frame-paced loop runs the scenes (see SceneManager); static screens
+    and idle play sleep until input arrives or something is due to change.
+
+    on_first_frame(ms), if given, gets the time from `started` (perf_counter,
+    default: module import) to the first frame on screen; the command line
+    prints it with --profile. The window stays open on return; close it
+    with close_window() or pygame.quit().
+    """
+    started = IMPORT_TIME if started is None else started
+    open_window()
+    if profile_path:
+        PROFILER.enabled = True
+    if replay_path:
+        source = ReplayInput(replay_path)
+        seed = source.seed
+    else:
+        if seed is None:
+            seed = random.getrandbits(32)
+        seed &= 0xFFFFFFFFFFFFFFFF  # what REPLAY_HEADER can store; seed with the same value a replay will
+        source = LiveInput(InputRecorder(record_path, seed) if record_path else None)
+    random.seed(seed)
+    log = EventLog(progress_path).start() if progress_path and not replay_path else None  # opens while we load
+    SOUNDS.preload()
+    boards = open_boards(seed, level_file)
+    if not level_file:
+        boards.start()
+    if log:
+        log.restore()  # before the first frame, so the HUD starts with the saved totals
+        log.log("session", seed=seed)
+    renderer = DirtyRenderer(screen) if render_mode == "dirty" else None
+    game = SceneManager(boards, SimClock(), renderer, log, hint_after)
+
+    while game.running:
+        PROFILER.start_frame()
+        dt = source.tick(game.idle_wait()) / 1000.0
+        PROFILER.lap("wait")
+
+        events, keys, mouse = source.poll()
+        inputs = input_from_keys(keys, mouse)
+        game.update(events, inputs, dt)
+        if not game.running:
+            break
+        if not game.scene.profiled:
+            PROFILER.skip_frame()
+
+        game.draw(screen, inputs.mouse)
+        PROFILER.lap("present")
+        PROFILER.end_frame()
+        if started is not None:
+            if on_first_frame:
+                on_first_frame((time.perf_counter() - started) * 1000)
+            started = None
+
+    if profile_path:
+        PROFILER.dump(profile_path)
+    source.close()
+    boards.stop()
+    if log:
+        log.close()
+    return game.state
+
+# --------- GAME HOST ----------
+HOST_PORT = 3002
+
+def host(port=HOST_PORT, **session_args):
+    """Resident game host: keeps Python, pygame, fonts and caches warm.
+
+    Listens on 127.0.0.1:port for one JSON request per connection line:
+        {"cmd": "start"}  open a window and play a session (replies at once,
+                          then sends {"event": "first_frame", "ms": ...})
+        {"cmd": "ping"}   is the host up, and is a session running?
+        {"cmd": "stop"}   shut the host down
+    Sessions run one at a time on the main thread, as pygame needs;
+    `session_args` are passed to main() for every session.
+    """
+    import socket
+
+    init()
+    SOUNDS.preload()
+    requests = queue.Queue()
+    busy = threading.Event()
+
+    def reply(conn, message, close=False):
+        try:
+            conn.sendall((json.dumps(message) + "\n").encode())
+        except OSError:
+            pass
+        if close:
+            conn.close()
 
-        # ------- check level complete or fail -------
-        if state.check_level_complete():
-            # if time_limit and time exceeded then fail; else success
-            completed = all(s.current == s.target for s in state.slots)
-            level_time = int(time.time() - state.level_start_time)
-            
-            if completed:
-                state.score += 50
-                state.levels_completed_in_row += 1
-                UNLOCKS["chests_unlocked"] += 1
-                
-                # Time bonus
-                if state.time_limit and level_time < state.time_limit // 2:
-                    state.score += 25
-                    state.message = f"Level Complete! Time Bonus: +25 points!"
+    def listen(server):
+        while True:
+            conn, _ = server.accept()
+            conn.settimeout(5.0)
+            try:
+                line = conn.makefile("r").readline()
+                cmd = json.loads(line).get("cmd")
+            except OSError:
+                conn.close()
+                continue
+            except (ValueError, AttributeError):
+                cmd = None
+            if cmd == "ping":
+                reply(conn, {"ok": True, "busy": busy.is_set()}, close=True)
+            elif cmd == "stop":
+                reply(conn, {"ok": True}, close=True)
+                requests.put(None)
+                return
+            elif cmd == "start":
+                if busy.is_set():
+                    reply(conn, {"ok": False, "error": "busy"}, close=True)
                 else:
-                    state.message = f"Level Complete! Well done!"
-                
-                # Check for badges and trophies
-                state.check_badges()
-                state.check_trophies()
-                
-                # Show level summary
-                draw_level_complete(screen, state)
-                pygame.display.flip()
-                pygame.time.delay(2000)
-                
-                state.level += 1
-                if state.level > 5:
-                    # Show victory screen
-                    draw_victory(screen, state)
-                    pygame.display.flip()
-                    pygame.time.delay(3000)
-                    state = GameState()
-                    if not show_instructions(screen):
-                        running = False
-                    continue
-                    
-                state.reset_level()
+                    busy.set()
+                    reply(conn, {"ok": True})
+                    requests.put((conn, time.perf_counter()))
             else:
-                # failure (time out or didn't match)
-                state.levels_completed_in_row = 0
-                state.message = "Time's up! Try again!"
-                state.lives -= 1
-                
-                if state.lives <= 0:
-                    # game over: reset everything
-                    draw_game_over(screen, state)
-                    pygame.display.flip()
-                    pygame.time.delay(2000)
-                    state = GameState()
-                    if not show_instructions(screen):
-                        running = False
-                    continue
-                else:
-                    # restart same level
-                    state.reset_level()
-
-        # ------- draw bottom-left UI hints & achievements -------
-        draw_text(screen, "Recent Badges: " + ", ".join(state.badges[-2:]) if state.badges else "Badges: None yet", (12, HEIGHT-140), font=FONT, color=SUB)
-        draw_text(screen, f"Trophies: {len(state.trophies)} | Chests: {UNLOCKS['chests_unlocked']}", (12, HEIGHT-160), font=FONT, color=SUB)
-        if state.streak > 0:
-            draw_text(screen, f"Streak: {state.streak} correct! 🔥", (12, HEIGHT-120), font=FONT, color=ACCENT)
-
-        pygame.display.flip()
+                reply(conn, {"ok": False, "error": f"unknown request {line.strip()!r}"}, close=True)
 
-    pygame.quit()
+    server = socket.create_server(("127.0.0.1", port))
+    threading.Thread(target=listen, args=(server,), name="game-host", daemon=True).start()
+    print(f"game host ready on 127.0.0.1:{server.getsockname()[1]}", flush=True)
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            conn, started = request
+
+            def first_frame(ms, conn=conn):
+                if session_args.get("profile_path"):
+                    report_first_frame(ms)
+                reply(conn, {"event": "first_frame", "ms": round(ms, 1)}, close=True)
+            try:
+                main(started=started, on_first_frame=first_frame, **session_args)
+            finally:
+                conn.close()  # in case the session ended before its first frame
+                close_window()
+                busy.clear()
+    finally:
+        server.close()
+        pygame.quit()
+
+def simulate(frames, seed=None, dt=TICK):
+    """Run the game headless with a simple wandering player.
+
+    Uses a SimClock, so timers run on simulated time and nothing waits on
+    the display. Returns the final state and a count of level outcomes.
+    """
+    if seed is not None:
+        random.seed(seed)
+    rng = random.Random(seed)
+    state = GameState(clock=SimClock())
+    direction = (0, 0)
+    outcomes = defaultdict(int)
+    for frame in range(frames):
+        actions = []
+        if state.popup and state.popup["choice"] is None:
+            actions = [("choose", "type"), ("answer", str(state.popup["coin"].value))]
+        if frame % 30 == 0:
+            direction = (rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)))
+        for outcome in state.step(FrameInput(*direction, actions=actions), dt):
+            outcomes[outcome] += 1
+            if outcome in ("victory", "game_over"):
+                state = GameState(clock=state.clock)
+    return state, dict(outcomes)
 
 def draw_level_complete(surf, state):
     pygame.draw.rect(surf, CARD, (WIDTH//2-200, HEIGHT//2-100, 400, 200), border_radius=12)
@@ -937,4 +3837,54 @@ def draw_game_over(surf, state):
     draw_text(surf, "Starting new game...", (WIDTH//2, HEIGHT//2+70), font=FONT, color=SUB, center=True)
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Treasure Coin Hunt")
+    parser.add_argument("--render", choices=("dirty", "full", "none"), default="dirty",
+                        help="dirty: redraw only changed rectangles (default); full: redraw the whole screen every frame; "
+                             "none: with --replay, step the game without a window")
+    parser.add_argument("--headless", type=int, metavar="FRAMES",
+                        help="run FRAMES simulated frames without rendering and report the speed "
+                             "(use with SDL_VIDEODRIVER=dummy)")
+    parser.add_argument("--seed", type=int, help="random seed for --headless and --record")
+    parser.add_argument("--levels", metavar="PATH", help="play boards from a level file made by build_levels.py")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="record per-phase frame times and write them to PATH on exit (.json or .csv), and print the "
+                             "time to the first frame; F3 shows them in game")
+    parser.add_argument("--record", metavar="PATH", help="record the session's input to PATH for --replay")
+    parser.add_argument("--replay", metavar="PATH", help="play back a recorded session at full speed")
+    parser.add_argument("--progress", metavar="PATH", default=PROGRESS_FILE,
+                        help=f"database the play history and progress are saved in (default: {PROGRESS_FILE})")
+    parser.add_argument("--no-progress", action="store_true", help="do not save play history or progress")
+    parser.add_argument("--hint-after", type=float, default=HINT_AFTER, metavar="SECONDS",
+                        help=f"show a hint after SECONDS without moving or acting; 0 turns hints off (default: {HINT_AFTER:g})")
+    parser.add_argument("--host", type=int, nargs="?", const=HOST_PORT, metavar="PORT",
+                        help=f"stay resident and start a session per request on 127.0.0.1:PORT (default: {HOST_PORT})")
+    args = parser.parse_args()
+    progress = None if args.no_progress else args.progress
+    hint_after = args.hint_after or None
+    if args.render == "none" and not args.replay:
+        parser.error("--render none needs --replay")
+    if args.headless:
+        start = time.perf_counter()
+        state, outcomes = simulate(args.headless, seed=args.seed)
+        elapsed = time.perf_counter() - start
+        print(f"{args.headless} frames in {elapsed:.2f}s ({args.headless / elapsed:.0f} frames/s)")
+        print(f"level {state.level}, score {state.score}, outcomes {outcomes}")
+    elif args.replay and args.render == "none":
+        start = time.perf_counter()
+        state, frames, outcomes = replay(args.replay, level_file=args.levels)
+        elapsed = time.perf_counter() - start
+        print(f"{frames} frames in {elapsed:.2f}s ({frames / elapsed:.0f} frames/s)")
+        print(f"level {state.level}, score {state.score}, lives {state.lives}, outcomes {outcomes}")
+    elif args.host is not None:
+        host(args.host, render_mode=args.render, level_file=args.levels, profile_path=args.profile,
+             progress_path=progress, hint_after=hint_after)
+    else:
+        start = time.perf_counter()
+        state = main(render_mode=args.render, level_file=args.levels, profile_path=args.profile,
+                     seed=args.seed, record_path=args.record, replay_path=args.replay, progress_path=progress,
+                     hint_after=hint_after, on_first_frame=report_first_frame if args.profile else None)
+        pygame.quit()
+        if args.replay:
+            elapsed = time.perf_counter() - start
+            print(f"replayed in {elapsed:.2f}s: level {state.level}, score {state.score}, lives {state.lives}")
@@ -0,0 +1,252 @@
+"""
+Treasure Coin Hunt - learning analytics
+
+Reads the event logs the game writes (progress.db, see EventLog) and
+reports how children are doing: accuracy and response times per coin
+value, mistakes per level and how long levels take to finish. Each
+database is one child's; the file name is used as the child's name:
+
+    python analytics.py school/*.db
+    python analytics.py school/ --json report.json
+
+Events are streamed from each file, never loaded all at once. Every file
+is reduced to a small partial aggregate in its own worker process and
+the partials are merged; response and completion times go into mergeable
+quantile sketches, so percentiles cost the same for a thousand answers
+or a hundred million.
+"""
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+
+SKETCH_ACCURACY = 0.01  # relative error of reported percentiles
+PERCENTILES = (50, 90, 99)
+
+
+# --------- QUANTILE SKETCH ----------
+class Sketch:
+    """Mergeable quantile sketch with relative error `alpha`.
+
+    Values go into logarithmic buckets (bucket k holds gamma**(k-1) < x <=
+    gamma**k, gamma = (1 + alpha) / (1 - alpha)), so any quantile comes
+    back within alpha of the true value. Two sketches merge by adding
+    bucket counts, which is what lets workers summarize files separately.
+    """
+
+    def __init__(self, alpha=SKETCH_ACCURACY):
+        self.alpha = alpha
+        self.log_gamma = math.log((1 + alpha) / (1 - alpha))
+        self.buckets = Counter()
+        self.zeros = 0  # values too small for a bucket (<= 1e-9)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x):
+        if x <= 1e-9:
+            self.zeros += 1
+        else:
+            self.buckets[math.ceil(math.log(x) / self.log_gamma)] += 1
+        self.count += 1
+        self.total += x
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("cannot merge sketches with different accuracy")
+        self.buckets.update(other.buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q (0..1); None when the sketch is empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        gamma = math.exp(self.log_gamma)
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if rank < seen:
+                # middle of the bucket, clamped to what was actually seen
+                return min(self.max, max(self.min, 2 * gamma**k / (gamma + 1)))
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+# --------- AGGREGATION ----------
+class Report:
+    """Partial or merged totals over any number of event logs."""
+
+    def __init__(self):
+        self.events = 0
+        self.answers = defaultdict(Counter)  # value -> {"right", "wrong"} (value "fake" for fake coins)
+        self.response = defaultdict(Sketch)  # value -> seconds to answer
+        self.children = defaultdict(Counter)  # child -> {"right", "wrong"}
+        self.child_response = defaultdict(Sketch)  # child -> seconds to answer
+        self.levels = defaultdict(Counter)  # level -> {"wrong_answers", "bad_placements", "completed", ...}
+        self.completion = defaultdict(Sketch)  # level -> seconds to complete
+
+    def add(self, child, kind, data):
+        self.events += 1
+        level = data.get("level")
+        if kind == "answer":
+            value = "fake" if data.get("fake") else data["value"]
+            outcome = "right" if data["correct"] else "wrong"
+            self.answers[value][outcome] += 1
+            self.children[child][outcome] += 1
+            self.response[value].add(data["seconds"])
+            self.child_response[child].add(data["seconds"])
+            if outcome == "wrong":
+                self.levels[level]["wrong_answers"] += 1
+        elif kind == "placement":
+            if data["result"] in ("over", "fake"):
+                self.levels[level]["bad_placements"] += 1
+        elif kind == "level":
+            outcome = data.get("outcome")
+            self.levels[level][outcome] += 1
+            if outcome in ("level_complete", "victory"):
+                self.levels[level]["completed"] += 1
+                self.levels[level]["mistakes"] += data.get("mistakes", 0)
+                self.completion[level].add(data["time"])
+
+    def merge(self, other):
+        self.events += other.events
+        for mine, theirs in ((self.answers, other.answers), (self.children, other.children), (self.levels, other.levels)):
+            for key, counts in theirs.items():
+                mine[key].update(counts)
+        for mine, theirs in ((self.response, other.response), (self.child_response, other.child_response),
+                             (self.completion, other.completion)):
+            for key, sketch in theirs.items():
+                mine[key].merge(sketch)
+        return self
+
+    def to_dict(self):
+        def accuracy(counts):
+            total = counts["right"] + counts["wrong"]
+            return {"answers": total, "accuracy": counts["right"] / total if total else None}
+
+        def times(sketch):
+            out = {f"p{p}": sketch.quantile(p / 100) for p in PERCENTILES}
+            out["mean"] = sketch.mean()
+            return out
+
+        def order(key):
+            return (isinstance(key, str), key)  # coin values first, then "fake"
+
+        return {
+            "events": self.events,
+            "denominations": {str(v): {**accuracy(self.answers[v]), "seconds": times(self.response[v])}
+                              for v in sorted(self.answers, key=order)},
+            "children": {child: {**accuracy(self.children[child]), "seconds": times(self.child_response[child])}
+                         for child in sorted(self.children)},
+            "levels": {str(level): {
+                "wrong_answers": counts["wrong_answers"],
+                "bad_placements": counts["bad_placements"],
+                "completed": counts["completed"],
+                "timeouts": counts["timeout"] + counts["game_over"],
+                "mistakes_per_completion": counts["mistakes"] / counts["completed"] if counts["completed"] else None,
+                "seconds_to_complete": times(self.completion[level]),
+            } for level, counts in sorted(self.levels.items(), key=lambda item: order(item[0]))},
+        }
+
+
+def child_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def aggregate_file(path):
+    """Stream one event log into a partial Report (runs in a worker)."""
+    report = Report()
+    child = child_name(path)
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)  # read only: the game may still be writing
+    try:
+        rows = db.execute("SELECT kind, data FROM events WHERE kind IN ('answer', 'placement', 'level')")
+        for kind, data in rows:  # the cursor fetches as it goes
+            report.add(child, kind, json.loads(data))
+    finally:
+        db.close()
+    return report
+
+
+def aggregate(paths, workers=None):
+    total = Report()
+    with Pool(workers) as pool:
+        # merging is order independent, so take partials as they finish
+        for part in pool.imap_unordered(aggregate_file, paths):
+            total.merge(part)
+    return total
+
+
+def find_logs(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".db")))
+        else:
+            found.append(path)
+    return found
+
+
+# --------- REPORTING ----------
+def fmt(x, spec=".1f"):
+    return "-" if x is None else format(x, spec)
+
+
+def print_report(report):
+    def table(title, rows):
+        print(f"\n{title:<16}{'answers':>9}{'accuracy':>10}" + "".join(f"{'p' + str(p) + ' s':>9}" for p in PERCENTILES))
+        for name, row in rows.items():
+            s = row["seconds"]
+            print(f"{name:<16}{row['answers']:>9}{fmt(row['accuracy'], '.0%'):>10}"
+                  + "".join(f"{fmt(s['p' + str(p)], '.2f'):>9}" for p in PERCENTILES))
+
+    table("value", {("fake coin" if v == "fake" else f"₹{v}"): row for v, row in report["denominations"].items()})
+    table("child", report["children"])
+    print(f"\n{'level':<8}{'wrong':>8}{'bad drop':>10}{'done':>7}{'timeout':>9}{'mistakes':>10}{'p50 s':>8}{'p90 s':>8}")
+    for level, row in report["levels"].items():
+        s = row["seconds_to_complete"]
+        print(f"{level:<8}{row['wrong_answers']:>8}{row['bad_placements']:>10}{row['completed']:>7}{row['timeouts']:>9}"
+              f"{fmt(row['mistakes_per_completion'], '.2f'):>10}{fmt(s['p50'], '.0f'):>8}{fmt(s['p90'], '.0f'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy and timing reports from Treasure Coin Hunt event logs")
+    parser.add_argument("paths", nargs="+", help="event log databases, or directories of them (one per child)")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    paths = find_logs(args.paths)
+    if not paths:
+        sys.exit("no event logs found")
+    start = time.perf_counter()
+    report = aggregate(paths, workers=args.workers).to_dict()
+    elapsed = time.perf_counter() - start
+
+    print_report(report)
+    print(f"\n{report['events']} events from {len(paths)} logs in {elapsed:.1f}s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
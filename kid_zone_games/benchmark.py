@@ -0,0 +1,319 @@
+"""
+Treasure Coin Hunt - benchmark suite
+
+Times the game's hot paths under the SDL dummy video driver with fixed
+seeds, so runs on the same machine are comparable:
+
+    python benchmark.py                       # run everything, print a table
+    python benchmark.py --save base.json      # keep the results as a baseline
+    python benchmark.py --baseline base.json  # compare, exit 1 on regressions
+    python benchmark.py -k generate           # only benchmarks matching "generate"
+
+Each result is the best of several repeats, in microseconds per operation.
+Boards come from fixed seeds with no wall-clock placement budget, so every
+run times the same work. The repeats are spread over several rounds of the
+whole suite, so a machine that is briefly slow (CPU steal, frequency
+scaling) slows down a round, not every sample of a benchmark. Some slowdowns
+last a whole process (heap and surface layout), so before --baseline reports
+a regression it times that benchmark again in fresh processes.
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import pygame
+
+import Treasure_Coin_Hunt as game
+
+SEED = 1234
+WALL_SWEEP = (10, 100, 1000)
+COIN_SWEEP = (16, 100, 1000)
+ROUNDS = 8  # passes over the whole suite; each result is the best of every round's repeats
+GENERATION_BOARDS = 20  # seeded boards each generation benchmark cycles through
+SIM_FRAMES = 600  # frames per headless simulate() run
+
+
+PATTERN = None  # set by -k
+
+
+def measure(fn, number, repeat=2):
+    """Best time per call of fn() in microseconds, over `repeat` runs of `number` calls.
+
+    One warm-up call comes first, and the garbage collector is off while
+    timing (as in timeit).
+    """
+    fn()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            best = min(best, (time.perf_counter() - start) / number)
+    finally:
+        if enabled:
+            gc.enable()
+    return best * 1e6
+
+
+def timed(results, name, fn, number, repeat=2, ops=1):
+    """Record the time per operation of fn(), which does `ops` operations per call."""
+    if PATTERN and PATTERN not in name:
+        return
+    us = measure(fn, number, repeat) / ops
+    results[name] = min(us, results.get(name, us))  # best over the rounds so far
+
+
+# --------- FIXTURES ----------
+def seeded_state(level=1, seed=SEED):
+    random.seed(seed)
+    state = game.GameState(clock=game.SimClock())
+    if level != 1:
+        state.level = level
+        state.reset_level()
+    return state
+
+
+def crowded_board(state, wall_count, coin_count, seed=SEED):
+    """Replace the board with `wall_count` small walls and `coin_count` coins."""
+    rng = random.Random(seed)
+    walls = game.generate_walls_for_board(rng)[:4]  # keep the outer walls
+    while len(walls) < wall_count:
+        walls.append(game.Wall(rng.randint(40, game.WIDTH - 80), rng.randint(120, game.HEIGHT - 80), 24, 24))
+    coins = []
+    for i in range(coin_count):
+        kind = "coin" if rng.random() < 0.6 else "note"
+        coins.append(game.Coin(rng.randint(40, game.WIDTH - 40), rng.randint(120, game.HEIGHT - 40),
+                               rng.choice(game.LEVEL_DENOMS[4]), kind=kind))
+    state.walls = walls
+    state.coins = coins
+    state.build_indexes()
+    return state
+
+
+def scripted_inputs(frames):
+    """A fixed walk through all eight directions while the mouse sweeps across the screen."""
+    pattern = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+    return [game.FrameInput(*pattern[(i // 20) % len(pattern)], mouse=(i % game.WIDTH, 300)) for i in range(frames)]
+
+
+# --------- BENCHMARKS ----------
+def bench_draw_text(results):
+    surf = game.screen
+    timed(results, "draw_text/cached", lambda: game.draw_text(surf, "Score: 120", (10, 10)), 700)
+
+    def uncached():
+        game.TEXT_CACHE.clear()
+        game.draw_text(surf, "Score: 120", (10, 10))
+    timed(results, "draw_text/uncached", uncached, 150)
+
+
+def bench_sprites(results):
+    surf = game.screen
+    coin = game.Coin(200, 200, 10, kind="coin")
+    note = game.Coin(300, 200, 100, kind="note")
+    timed(results, "Coin.draw/coin", lambda: coin.draw(surf), 700)
+    timed(results, "Coin.draw/note", lambda: note.draw(surf), 700)
+    slot = game.Slot(40, 20, 280, 80, 50)
+    for value in (10, 20, 5):
+        slot.accept_coin(game.Coin(0, 0, value))
+    timed(results, "Slot.draw", lambda: slot.draw(surf), 300)
+    state = seeded_state()
+    timed(results, "Hud.draw", lambda: game.HUD.draw(surf, state), 700)
+    for coin_count in COIN_SWEEP:
+        board = crowded_board(seeded_state(), 4, coin_count)
+        timed(results, f"draw_board/coins={coin_count}", lambda: game.draw_board(surf, board), 30)
+
+
+def bench_player_move(results):
+    for wall_count in WALL_SWEEP:
+        state = crowded_board(seeded_state(), wall_count, 0)
+        player = game.Player(400, 300)
+        steps = [(3, 0), (-3, 0), (0, 3), (0, -3)]
+        i = [0]
+
+        def move(walls):
+            player.rect.topleft = (400, 300)
+            player.move(*steps[i[0] % 4], walls)
+            i[0] += 1
+        timed(results, f"Player.move/list/walls={wall_count}", lambda: move(state.walls), 150)
+        timed(results, f"Player.move/grid/walls={wall_count}", lambda: move(state.wall_grid), 150)
+
+
+def bench_generation(results):
+    for level in range(1, 6):
+        walls = game.generate_walls_for_board(random.Random(SEED + level))
+        # every repeat generates the same boards, one per seed
+        seeds = [SEED * 1000 + level * 100 + i for i in range(GENERATION_BOARDS)]
+        i = [0]
+
+        def next_seed():
+            i[0] += 1
+            return seeds[i[0] % len(seeds)]
+
+        def generate():
+            game.generate_coins_for_level(level, walls, game.slot_count_for_level(level),
+                                          rng=random.Random(next_seed()), time_budget=None)
+        timed(results, f"generate_coins_for_level/level={level}", generate, GENERATION_BOARDS)
+        timed(results, f"generate_board/level={level}", lambda: game.generate_board(level, next_seed()), GENERATION_BOARDS)
+
+
+def bench_frames(results):
+    inputs = scripted_inputs(240)
+    for level in (1, 4):
+        state = seeded_state(level)
+        i = [0]
+
+        def update():
+            state.step(inputs[i[0] % len(inputs)], 1 / game.FPS)
+            i[0] += 1
+        timed(results, f"frame/update/level={level}", update, 80)
+
+        state = seeded_state(level)
+        renderer = game.DirtyRenderer(game.screen)
+
+        def frame_full():
+            inp = inputs[i[0] % len(inputs)]
+            state.step(inp, 1 / game.FPS)
+            game.draw_frame(game.screen, state, inp.mouse)
+            pygame.display.flip()
+            i[0] += 1
+
+        def frame_dirty():
+            inp = inputs[i[0] % len(inputs)]
+            state.step(inp, 1 / game.FPS)
+            renderer.draw(state, inp.mouse)
+            i[0] += 1
+        timed(results, f"frame/full/level={level}", frame_full, 40)
+        timed(results, f"frame/dirty/level={level}", frame_dirty, 40)
+
+    # the whole headless engine: wandering, popups, level changes and new boards
+    timed(results, "frame/simulate", lambda: game.simulate(SIM_FRAMES, seed=SEED), 2, ops=SIM_FRAMES)
+
+
+def bench_scaling(results):
+    inputs = scripted_inputs(240)
+    for wall_count in WALL_SWEEP:
+        for coin_count in COIN_SWEEP:
+            state = crowded_board(seeded_state(), wall_count, coin_count)
+            i = [0]
+
+            def frame():
+                inp = inputs[i[0] % len(inputs)]
+                state.step(inp, 1 / game.FPS)
+                game.draw_frame(game.screen, state, inp.mouse)
+                i[0] += 1
+            timed(results, f"scaling/frame/walls={wall_count}/coins={coin_count}", frame, 10, repeat=1)
+
+
+BENCHMARKS = [bench_draw_text, bench_sprites, bench_player_move, bench_generation, bench_frames, bench_scaling]
+
+
+# --------- REPORTING ----------
+def run():
+    game.open_window()
+    results = {}
+    for _ in range(ROUNDS):
+        for bench in BENCHMARKS:
+            bench(results)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "seed": SEED,
+            "unit": "us/op",
+        },
+        "results": results,
+    }
+
+
+def slower(current, baseline, threshold):
+    """Names whose time grew by more than threshold since the baseline."""
+    return [name for name, now in current["results"].items()
+            if name in baseline["results"] and now > baseline["results"][name] * (1 + threshold)]
+
+
+def retime(name):
+    """Time one benchmark again in a fresh interpreter."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "retime.json")
+        subprocess.run([sys.executable, os.path.abspath(__file__), "-k", name, "--save", path],
+                       check=True, stdout=subprocess.DEVNULL)
+        with open(path) as f:
+            return json.load(f)["results"][name]
+
+
+def compare(current, baseline, threshold):
+    """Print current vs baseline and return the names that got slower than threshold."""
+    regressions = []
+    print(f"{'benchmark':<48}{'base':>12}{'now':>12}{'change':>9}")
+    for name, now in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<48}{'-':>12}{now:>12.1f}{'new':>9}")
+            continue
+        change = (now - base) / base
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(f"{name:<48}{base:>12.1f}{now:>12.1f}{change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Treasure Coin Hunt hot paths")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--save", metavar="PATH", help="write results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against saved results")
+    parser.add_argument("--threshold", type=float, default=0.30,
+                        help="slowdown that counts as a regression (default: 0.30 = 30%%)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="fresh processes to re-time a slower benchmark in before reporting it (default: 2)")
+    args = parser.parse_args()
+
+    global PATTERN
+    PATTERN = args.pattern
+    current = run()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for _ in range(args.retries):
+            names = slower(current, baseline, args.threshold)
+            if not names:
+                break
+            print(f"re-timing {len(names)} slower benchmark(s) in a fresh process", file=sys.stderr)
+            for name in names:
+                current["results"][name] = min(current["results"][name], retime(name))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+    if baseline:
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        for name, us in current["results"].items():
+            fps = f"{1e6 / us:>10.0f} /s" if name.startswith(("frame/", "scaling/")) else ""
+            print(f"{name:<48}{us:>12.1f} us{fps}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Treasure Coin Hunt - offline level farm
+
+Generates seeded boards for every level on all CPU cores, throws away
+boards that are invalid or cannot be finished, and stores the rest in a
+compact level file the game can read by (level, index) in O(1):
+
+    python build_levels.py -o levels.bin --per-level 10000
+    python Treasure_Coin_Hunt.py --levels levels.bin
+
+The same --seed always produces the same file.
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # workers never open a window
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import signal
+import time
+from multiprocessing import Pool
+
+import Treasure_Coin_Hunt as game
+
+CHUNK = 256  # candidate boards per worker task
+
+
+def board_seed(seed, level, n):
+    return random.Random(f"farm:{seed}:{level}:{n}").getrandbits(64)
+
+
+def init_worker():
+    # SDL turns SIGTERM into a quit event; restore the default so Pool.terminate() works
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def build_chunk(job):
+    """Generate and validate one chunk of candidates: (level, [seed, ...]) -> [record or None]."""
+    level, seeds = job
+    records = []
+    for seed in seeds:
+        board = game.generate_board(level, seed)
+        records.append(game.pack_board(seed, board) if game.validate_board(level, board) else None)
+    return records
+
+
+def build(levels, per_level, seed=0, workers=None, max_candidates=None):
+    """{level: [record, ...]} with up to `per_level` valid boards per level, plus stats."""
+    max_candidates = max_candidates or per_level * 4
+    records = {level: [] for level in levels}
+    stats = {level: {"candidates": 0, "rejected": 0} for level in levels}
+
+    def jobs():
+        # enough chunks per level to cover max_candidates, interleaved across levels
+        for start in range(0, max_candidates, CHUNK):
+            for level in levels:
+                n = min(CHUNK, max_candidates - start)
+                yield level, [board_seed(seed, level, start + i) for i in range(n)]
+
+    with Pool(workers, initializer=init_worker) as pool:
+        # imap keeps submission order, so the output does not depend on scheduling
+        for (level, _), chunk in zip(jobs(), pool.imap(build_chunk, jobs())):
+            kept = records[level]
+            for record in chunk:
+                if len(kept) >= per_level:
+                    break
+                stats[level]["candidates"] += 1
+                if record is None:
+                    stats[level]["rejected"] += 1
+                else:
+                    kept.append(record)
+            if all(len(records[lv]) >= per_level for lv in levels):
+                pool.terminate()
+                break
+    return records, stats
+
+
+def parse_levels(text):
+    levels = set()
+    for part in text.split(","):
+        lo, _, hi = part.partition("-")
+        levels.update(range(int(lo), int(hi or lo) + 1))
+    return sorted(levels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate Treasure Coin Hunt boards into a level file")
+    parser.add_argument("-o", "--output", default="levels.bin", help="level file to write (default: levels.bin)")
+    parser.add_argument("--levels", default="1-5", help="levels to build, e.g. 1-5 or 1,3,4 (default: 1-5)")
+    parser.add_argument("--per-level", type=int, default=1000, help="valid boards to keep per level (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed (default: 0)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    levels = parse_levels(args.levels)
+    start = time.perf_counter()
+    records, stats = build(levels, args.per_level, seed=args.seed, workers=args.workers)
+    game.write_level_file(args.output, records)
+    elapsed = time.perf_counter() - start
+
+    for level in levels:
+        st = stats[level]
+        print(f"level {level}: {len(records[level])} boards kept, {st['rejected']} of {st['candidates']} candidates rejected")
+    total = sum(len(r) for r in records.values())
+    size = os.path.getsize(args.output)
+    print(f"wrote {total} boards ({size / 1024:.0f} KiB) to {args.output} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Treasure Coin Hunt - classroom server
+
+Runs many independent game sessions in one process, so a lab server does
+not need an interpreter and an SDL window per child. Clients connect over
+TCP and speak JSON lines (one object per line, like the game host):
+
+    python classroom.py --port 3003
+    python classroom.py --load 200 --seconds 20    # simulated class, then report
+
+Client -> server:
+    {"input": {"dx": -1, "dy": 0, "mouse": [x, y]}}   held keys / mouse (any subset)
+    {"action": ["choose", "type"]}                    see FrameInput for the actions
+    {"cmd": "stats"}                                  server load numbers
+Server -> client:
+    {"hello": {"session": id, "tick": seconds, "width": w, "height": h}}
+    {"tick": n, "state": {...}}    only the parts of the state that changed
+    {"tick": n, "outcomes": [...], "state": {...}}    a level ended
+    {"parked": true}               idle; input wakes the session up again
+
+All sessions tick together at the game's fixed rate on one asyncio loop.
+A session's GameState is built on a worker thread (a board the prefetcher
+has not got ready yet is generated right there), so a child joining or
+starting a new game never holds up everyone else's tick.
+A session with no held keys and no input for PARK_AFTER seconds is parked:
+it is not ticked (its game clock stops too) until the client sends input.
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # sessions never open a window
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import math
+import random
+import sys
+import time
+import traceback
+from collections import deque
+
+import Treasure_Coin_Hunt as game
+
+PORT = 3003
+PARK_AFTER = 10.0  # seconds without input before a session stops ticking
+MAX_LATE_TICKS = 30  # further behind than this, skip ticks instead of catching up
+SEND_BUFFER_LIMIT = 64 * 1024  # a client this far behind gets no state until it catches up
+STATS_INTERVAL = 10.0  # seconds between load reports on stdout
+STATS_WINDOW = 600  # ticks kept for the latency percentiles
+
+ACTIONS = {"restart", "choose", "answer", "take_inventory", "drop"}
+
+
+def parse_number(raw, lo, hi):
+    """An int from client JSON, clamped to lo..hi; ValueError if it is not a finite number."""
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(f"not a finite number: {raw!r}")
+    return max(lo, min(hi, int(value)))
+
+
+def parse_point(raw):
+    """An on-screen (x, y) from client JSON, clamped to the window."""
+    x, y = raw
+    return parse_number(x, 0, game.WIDTH - 1), parse_number(y, 0, game.HEIGHT - 1)
+
+
+def parse_action(raw):
+    """A FrameInput action from client JSON; ValueError if it is not one."""
+    kind, *args = raw
+    if kind not in ACTIONS:
+        raise ValueError(f"unknown action {kind!r}")
+    if kind == "restart":
+        return (kind,)
+    (arg,) = args
+    if kind == "choose" and arg in ("type", "drag"):
+        return kind, arg
+    if kind == "answer" and isinstance(arg, str):
+        return kind, arg[:8]
+    if kind == "take_inventory" and isinstance(arg, int):
+        return kind, arg
+    if kind == "drop":
+        return kind, parse_point(arg)
+    raise ValueError(f"bad argument for {kind!r}")
+
+
+# --------- SESSIONS ----------
+class Session:
+    """One child's game: a GameState, its held input and what the client has seen.
+
+    `boards` is the server's shared board source. On a LevelPrefetcher the
+    session wants levels through a client of its own, so children on
+    different levels do not throw away each other's queued boards.
+
+    `state` is None until the server has built the first game, and
+    `loading` is the task building the next one after a game ends; the
+    session is not ticked in the meantime.
+    """
+
+    def __init__(self, sid, boards, writer, now):
+        self.sid = sid
+        self.boards = boards.client() if isinstance(boards, game.LevelPrefetcher) else boards
+        self.writer = writer
+        self.state = None
+        self.loading = None
+        self.stepper = game.FixedTimestep()
+        self.dx = self.dy = 0
+        self.mouse = None
+        self.actions = []
+        self.last_input = now
+        self.last_step = now
+        self.parked = False
+        self.ticks = 0
+        self.sent = {}  # key -> value the client has
+        self.coins_key = None
+        self.coins = None
+
+    def on_input(self, msg, now):
+        if "input" in msg:
+            held = msg["input"]
+            self.dx = parse_number(held.get("dx", self.dx), -1, 1)
+            self.dy = parse_number(held.get("dy", self.dy), -1, 1)
+            if "mouse" in held:
+                self.mouse = parse_point(held["mouse"])
+        if "action" in msg:
+            self.actions.append(parse_action(msg["action"]))
+        self.last_input = now
+        if self.parked:
+            self.parked = False
+            self.last_step = now  # parked time is not played
+
+    def should_park(self, now):
+        return not (self.dx or self.dy or self.actions) and now - self.last_input > PARK_AFTER
+
+    def advance(self, now):
+        dt, self.last_step = now - self.last_step, now
+        inputs = game.FrameInput(self.dx, self.dy, self.mouse, self.actions)
+        self.actions = []
+        outcomes = self.stepper.advance(self.state, inputs, dt)
+        self.ticks += 1
+        return outcomes
+
+    def view(self):
+        """The client's picture of the game, as JSON-ready values."""
+        state = self.state
+        score, lives, level, stars, remaining = game.hud_values(state)
+        holding = state.holding if state.drag_mode else None
+        coins_key = (id(state.coin_store), state.coin_store.version, len(state.coins), id(holding))
+        if coins_key != self.coins_key:
+            # rebuilt only when the board changes, not every tick
+            self.coins_key = coins_key
+            self.coins = [[c.x, c.y, c.kind, c.value, c.fake] for c in state.coins if c is not holding]
+        popup = state.popup
+        return {
+            "player": state.player.rect.topleft,
+            "hud": [score, lives, level, stars, remaining],
+            "message": state.message,
+            "popup": popup and [popup["coin"].value, popup["coin"].kind, popup["coin"].fake, popup["choice"]],
+            "holding": holding and [holding.value, holding.kind, holding.fake],
+            "inventory": [c.value for c in state.player.inventory],
+            "slots": [[s.rect.x, s.rect.y, s.rect.w, s.rect.h, s.target, s.current] for s in state.slots],
+            "coins": self.coins,
+        }
+
+    def close(self):
+        if isinstance(self.boards, game.PrefetchClient):
+            self.boards.release()
+        self.writer.close()
+
+    def send(self, message):
+        self.writer.write((json.dumps(message, separators=(",", ":")) + "\n").encode())
+
+    def send_state(self, outcomes):
+        if self.writer.transport.get_write_buffer_size() > SEND_BUFFER_LIMIT and not outcomes:
+            return  # slow client: skip, the next delta covers what it missed
+        view = self.view()
+        changed = {key: value for key, value in view.items() if self.sent.get(key) != value}
+        if not changed and not outcomes:
+            return
+        self.sent.update(changed)
+        message = {"tick": self.ticks, "state": changed}
+        if outcomes:
+            message["outcomes"] = outcomes
+        self.send(message)
+
+
+# --------- SERVER ----------
+class ClassroomServer:
+    """Ticks every active session at game.TICK on one asyncio loop."""
+
+    def __init__(self, boards, tick=game.TICK):
+        self.boards = boards
+        self.tick = tick
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.ticks = 0
+        self.latency = deque(maxlen=STATS_WINDOW)  # tick due -> every session done, seconds
+        self.work = deque(maxlen=STATS_WINDOW)  # (seconds stepping, sessions stepped)
+        self.skipped = 0  # ticks dropped because the loop fell behind
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        session = Session(next(self.ids), self.boards, writer, loop.time())
+        self.sessions[session.sid] = session
+        session.send({"hello": {"session": session.sid, "tick": self.tick, "width": game.WIDTH, "height": game.HEIGHT}})
+        try:
+            await self.new_game(session)
+            if session.state is None:
+                return  # its first game failed to build and it was dropped
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # longer than the stream limit; readline() has thrown it away
+                    session.send({"error": "bad message: line too long"})
+                    continue
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                    if msg.get("cmd") == "stats":
+                        session.send({"stats": self.stats()})
+                    else:
+                        session.on_input(msg, loop.time())
+                except (ValueError, TypeError, KeyError, AttributeError) as e:
+                    session.send({"error": f"bad message: {e}"})
+        except ConnectionError:
+            pass
+        finally:
+            if self.sessions.pop(session.sid, None) is not None:  # it may have been dropped already
+                session.close()
+
+    def drop(self, session):
+        """Disconnect a session whose game raised; the others keep playing."""
+        print(f"session {session.sid} failed and was dropped:", file=sys.stderr)
+        traceback.print_exc()
+        if self.sessions.pop(session.sid, None) is not None:
+            session.close()
+
+    async def new_game(self, session, clock=None):
+        """Give `session` a fresh GameState, built on a worker thread."""
+        loop = asyncio.get_running_loop()
+        try:
+            state = await loop.run_in_executor(
+                None, functools.partial(game.GameState, clock=clock or game.SimClock(), boards=session.boards))
+        except Exception:
+            self.drop(session)
+            return
+        session.state, session.loading = state, None
+        session.last_step = loop.time()  # time spent loading is not played
+
+    def step_all(self, now):
+        stepped = 0
+        for session in list(self.sessions.values()):
+            if session.parked or session.state is None or session.loading:
+                continue
+            if session.should_park(now):
+                session.parked = True
+                session.send({"parked": True})
+                continue
+            try:
+                outcomes = session.advance(now)
+                session.send_state(outcomes)
+            except Exception:
+                # one broken session must not stop the ticks for the whole class
+                self.drop(session)
+                continue
+            if "victory" in outcomes or "game_over" in outcomes:
+                session.loading = asyncio.ensure_future(self.new_game(session, session.state.clock))
+            stepped += 1
+        return stepped
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        due = loop.time() + self.tick
+        while True:
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            now = loop.time()
+            start = time.perf_counter()
+            stepped = self.step_all(now)
+            done = time.perf_counter()
+            self.latency.append(now - due + done - start)
+            self.work.append((done - start, stepped))
+            self.ticks += 1
+            due += self.tick
+            behind = int((loop.time() - due) / self.tick)
+            if behind > MAX_LATE_TICKS:
+                self.skipped += behind
+                due += behind * self.tick
+
+    def stats(self):
+        """Session counts, tick latency and an estimate of sessions one core can tick."""
+        latency = sorted(self.latency)
+        seconds = sum(w for w, _ in self.work)
+        stepped = sum(n for _, n in self.work)
+        per_session = seconds / stepped if stepped else None
+        parked = sum(s.parked for s in self.sessions.values())
+        return {
+            "sessions": len(self.sessions),
+            "active": len(self.sessions) - parked,
+            "parked": parked,
+            "ticks": self.ticks,
+            "skipped_ticks": self.skipped,
+            "tick_ms": {f"p{int(q * 100)}": round(game.FrameProfiler.percentile(latency, q) * 1000, 3)
+                        for q in (0.5, 0.9, 0.99)},
+            "session_tick_us": round(per_session * 1e6, 1) if per_session else None,
+            # sessions whose ticks would fill one core at this tick rate
+            "sessions_per_core": int(self.tick / per_session) if per_session else None,
+        }
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            if self.sessions:
+                print_stats(self.stats())
+
+
+def print_stats(st):
+    tick = st["tick_ms"]
+    print(f"{st['sessions']} sessions ({st['active']} active, {st['parked']} parked) | "
+          f"tick p50 {tick['p50']:.2f} ms, p99 {tick['p99']:.2f} ms | "
+          f"{st['session_tick_us']} us per session tick, ~{st['sessions_per_core']} sessions per core", flush=True)
+
+
+# --------- LOAD TEST ----------
+async def fake_child(port, seconds, rng, finished):
+    """A client that wanders, answers every popup and goes quiet now and then;
+    it stays connected until `finished` is set."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    end = asyncio.get_running_loop().time() + seconds
+    popup = None
+
+    def send(msg):
+        writer.write((json.dumps(msg) + "\n").encode())
+
+    async def listen():
+        nonlocal popup
+        while line := await reader.readline():
+            state = json.loads(line).get("state", {})
+            if "popup" in state:
+                popup = state["popup"]
+
+    listener = asyncio.ensure_future(listen())
+    try:
+        while asyncio.get_running_loop().time() < end:
+            if popup and popup[3] is None:
+                send({"action": ["choose", "type"]})
+                send({"action": ["answer", str(popup[0])]})
+                popup = None
+            if rng.random() < 0.1:
+                send({"input": {"dx": 0, "dy": 0}})  # stop and think
+                await asyncio.sleep(rng.uniform(1, 3))
+            send({"input": {"dx": rng.choice((-1, 0, 1)), "dy": rng.choice((-1, 0, 1))}})
+            await asyncio.sleep(rng.uniform(0.2, 1.0))
+        await finished.wait()
+    finally:
+        listener.cancel()
+        writer.close()
+
+
+async def serve(port, level_file=None, load=0, seconds=20.0):
+    boards = game.open_boards(random.getrandbits(32), level_file)
+    if not level_file:
+        boards.start()
+    server = ClassroomServer(boards)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", port)
+    port = listener.sockets[0].getsockname()[1]
+    tasks = [asyncio.ensure_future(server.run()), asyncio.ensure_future(server.report())]
+    try:
+        if load:
+            print(f"{load} simulated clients for {seconds:.0f}s on 127.0.0.1:{port}", flush=True)
+            rng = random.Random(0)
+            finished = asyncio.Event()
+            clients = []
+            for _ in range(load):
+                clients.append(asyncio.ensure_future(fake_child(port, seconds, random.Random(rng.getrandbits(32)), finished)))
+                await asyncio.sleep(0.005)  # stagger the connects like a class logging in
+            await asyncio.sleep(seconds)
+            print_stats(server.stats())  # while every client is still connected
+            finished.set()
+            await asyncio.gather(*clients)
+        else:
+            print(f"classroom server on 127.0.0.1:{port}", flush=True)
+            await listener.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        listener.close()
+        boards.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many Treasure Coin Hunt sessions in one process")
+    parser.add_argument("--port", type=int, default=PORT, help=f"TCP port on 127.0.0.1 (default: {PORT})")
+    parser.add_argument("--levels", metavar="PATH", help="deal boards from a level file made by build_levels.py")
+    parser.add_argument("--load", type=int, metavar="N",
+                        help="instead of serving, run N simulated clients against the server and report the load")
+    parser.add_argument("--seconds", type=float, default=20.0, help="length of the --load run (default: 20)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(0 if args.load else args.port, level_file=args.levels, load=args.load or 0,
+                          seconds=args.seconds))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Treasure Coin Hunt - auto-play fuzzer
+
+A scripted bot plays whole seeded games through GameState: it walks the
+player to coins around the walls, types their values (with optional
+deliberate mistakes) and drags them into the slots that need them.
+Thousands of games run on all CPU cores, and the report lists the levels
+the bot could not finish, how long levels take, and every board where
+generation or the level checks misbehaved:
+
+    python fuzz_levels.py --games 2000
+    python fuzz_levels.py --games 500 --mistakes 0.1 --json fuzz.json
+
+Every failure comes with its game seed and board seed, so it can be
+replayed with generate_board(level, board_seed).
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import Counter, defaultdict, deque
+from multiprocessing import Pool
+
+from build_levels import init_worker  # first: importing it points SDL at the dummy drivers
+
+import pygame
+
+import Treasure_Coin_Hunt as game
+
+CELL = 8  # path grid resolution in pixels
+LEVEL_TIME_CAP = 240.0  # game seconds before the bot gives up on a level without a time limit
+STALL_TICKS = 90  # ticks without getting closer before the bot re-plans its path
+MAX_SHOWN = 20  # failing boards listed in the text report
+
+
+# --------- PLANNING ----------
+def plan_slots(state):
+    """{coin: slot} filling every unfinished slot exactly from the inventory
+    and the real coins still on the board, or None if that cannot be done."""
+    open_slots = [s for s in state.slots if s.current != s.target]
+    held = [state.holding] if state.holding else []
+    coins = held + list(state.player.inventory) + [c for c in state.coins.active() if not c.fake]
+    # an overshot slot has a negative need and can never be finished: no split
+    groups = game.split_targets([c.value for c in coins], [s.target - s.current for s in open_slots])
+    if groups is None:
+        return None
+    assignment = {}
+    free = coins[:]  # coins in hand first, so they are used before walking
+    for slot, values in zip(open_slots, groups):
+        for value in values:
+            coin = next(c for c in free if c.value == value)
+            free.remove(coin)
+            assignment[coin] = slot
+    return assignment
+
+
+class PathGrid:
+    """Cells of the player's top-left corner where the player fits between the walls."""
+
+    def __init__(self, state):
+        self.cols, self.rows = game.WIDTH // CELL, game.HEIGHT // CELL
+        self.size = size = state.player.size
+        self.free = [[True] * self.cols for _ in range(self.rows)]
+        for wall in (w.rect for w in state.walls):
+            # cells whose player rect, with 3px of slack around it, overlaps the wall
+            for cy in range(max(0, (wall.top - size - 3) // CELL), min(self.rows, (wall.bottom + 3) // CELL + 1)):
+                if not (cy*CELL - 3 < wall.bottom and wall.top < cy*CELL + size + 3):
+                    continue
+                row = self.free[cy]
+                for cx in range(max(0, (wall.left - size - 3) // CELL), min(self.cols, (wall.right + 3) // CELL + 1)):
+                    if cx*CELL - 3 < wall.right and wall.left < cx*CELL + size + 3:
+                        row[cx] = False
+
+    def cell(self, pos):
+        return round(pos[0] / CELL), round(pos[1] / CELL)
+
+    def path(self, start, goals, blocked=()):
+        """Cells from start to the nearest goal cell (4-neighbour BFS), or None."""
+        came, cur = self.search(start, set(goals), blocked)
+        if cur is None:
+            return None
+        path = []
+        while cur is not None:
+            path.append(cur)
+            cur = came[cur]
+        return path[::-1]
+
+    def search(self, start, goals=(), blocked=()):
+        """({cell: previous cell}, goal reached) searching out from start until a goal is found."""
+        came = {start: None}
+        todo = deque([start])
+        while todo:
+            cur = todo.popleft()
+            if cur in goals:
+                return came, cur
+            cx, cy = cur
+            for nxt in ((cx+1, cy), (cx-1, cy), (cx, cy+1), (cx, cy-1)):
+                x, y = nxt
+                if 0 <= x < self.cols and 0 <= y < self.rows and nxt not in came and self.free[y][x] and nxt not in blocked:
+                    came[nxt] = cur
+                    todo.append(nxt)
+        return came, None
+
+    def touching(self, rect, margin=0):
+        """Cells where the player would overlap `rect` (grown by margin)."""
+        rect = rect.inflate(margin * 2, margin * 2)
+        x0, y0 = (rect.left - self.size) // CELL, (rect.top - self.size) // CELL
+        x1, y1 = rect.right // CELL + 1, rect.bottom // CELL + 1
+        return {(cx, cy) for cx in range(max(0, x0), min(self.cols, x1 + 1)) for cy in range(max(0, y0), min(self.rows, y1 + 1))
+                if pygame.Rect(cx*CELL, cy*CELL, self.size, self.size).colliderect(rect)}
+
+
+# --------- BOT ----------
+class Bot:
+    """Chooses each frame's FrameInput for a GameState."""
+
+    def __init__(self, state, rng, mistake_rate=0.0):
+        self.state = state
+        self.rng = rng
+        self.mistake_rate = mistake_rate
+        self.mistakes = 0
+        self.plan_key = self.plan = None
+        self.new_level()
+
+    def new_level(self):
+        self.grid = PathGrid(self.state)
+        self.path = None
+        self.target = None
+        self.best = None
+        self.stalled = 0
+        self.stuck = None  # why the bot cannot go on, once it knows
+
+    def blocked(self):
+        cells = set()
+        for c in self.state.coins.active():
+            if c.fake:
+                cells |= self.grid.touching(c.rect, margin=4)
+        return cells
+
+    def decide(self):
+        state = self.state
+        if state.popup and state.popup["choice"] is None:
+            coin = state.popup["coin"]
+            answer = coin.value
+            if self.rng.random() < self.mistake_rate:
+                denoms = game.LEVEL_DENOMS.get(state.level, game.LEVEL_DENOMS[4])
+                answer = self.rng.choice([v for v in denoms if v != coin.value] or [0])
+                self.mistakes += 1
+            return game.FrameInput(actions=[("choose", "type"), ("answer", str(answer))])
+        # re-plan only when the coins in play or the slots change
+        key = (state.player.inventory.version, state.holding, len(state.coins.active_items), tuple(s.version for s in state.slots))
+        if key != self.plan_key:
+            self.plan_key, self.plan = key, plan_slots(state)
+        plan = self.plan
+        if plan is None:
+            self.stuck = "slots can no longer be filled"
+            return game.FrameInput()
+        if state.drag_mode and state.holding:
+            slot = plan.get(state.holding)
+            return game.FrameInput(actions=[("drop", slot.rect.center if slot else (game.WIDTH // 2, game.HEIGHT // 2))])
+        for i, coin in enumerate(state.player.inventory):
+            if coin in plan:
+                return game.FrameInput(actions=[("take_inventory", i)])
+        return self.walk(plan)
+
+    def walk(self, plan):
+        player = self.state.player
+        targets = [c for c in plan if c in self.state.coins]
+        if not targets:
+            return game.FrameInput()
+        if self.path is None or self.target not in targets or self.stalled > STALL_TICKS:
+            goals = {}
+            for coin in targets:
+                for cell in self.grid.touching(coin.rect, margin=-4):  # well inside, whatever the rounding
+                    goals[cell] = coin
+            start = self.grid.cell(player.rect.topleft)
+            # walk around fake coins if possible, through them (and lose a life) if not
+            self.path = self.grid.path(start, goals, self.blocked() - {start}) or self.grid.path(start, goals)
+            if self.path is None:
+                self.stuck = "no path to a needed coin"
+                return game.FrameInput()
+            self.target = goals[self.path[-1]]
+            self.best = None
+            self.stalled = 0
+        # head for the next waypoint, one axis at a time; 3px steps can always
+        # stop within 1px of it, which the 3px of slack in PathGrid allows for
+        x, y = player.rect.topleft
+        while len(self.path) > 1 and abs(self.path[0][0]*CELL - x) <= 1 and abs(self.path[0][1]*CELL - y) <= 1:
+            self.path.pop(0)
+            self.best = None
+        wx, wy = self.path[0][0] * CELL, self.path[0][1] * CELL
+        dist = abs(wx - x) + abs(wy - y)
+        if self.best is None or dist < self.best:
+            self.best, self.stalled = dist, 0
+        else:
+            self.stalled += 1
+        dx = (wx > x + 1) - (wx < x - 1)
+        dy = 0 if dx else (wy > y + 1) - (wy < y - 1)
+        if not dx and not dy:
+            # at the last cell but not touching yet: nudge straight at the coin
+            cx, cy = self.target.rect.center
+            px, py = player.rect.center
+            dx = (cx > px) - (cx < px)
+            dy = 0 if dx else (cy > py) - (cy < py)
+        return game.FrameInput(dx, dy)
+
+
+# --------- CHECKS ----------
+def board_anomalies(state, grid):
+    """Problems with a freshly loaded board that generation should have prevented."""
+    found = []
+    board = (state.walls, list(state.coins), state.slots)
+    if not game.level_is_solvable(*board[1:]):
+        found.append("unsolvable slots")
+    elif not game.validate_board(state.level, board):
+        found.append("coins overlapping walls or each other")
+    if len(board[1]) < 8 + state.level * 2:
+        found.append("placement ran out of room")
+    reachable, _ = grid.search(grid.cell(state.player.rect.topleft))
+    for coin in board[1]:
+        # the bot's grid keeps some slack from walls, so confirm on the exact positions
+        if not coin.fake and reachable.keys().isdisjoint(grid.touching(coin.rect, margin=-4)) and not player_can_reach(state, coin.rect):
+            found.append("real coin out of reach")
+            break
+    return found
+
+
+def player_can_reach(state, rect):
+    """Whether the player can walk from where it stands to touch rect.
+
+    Moves that would hit a wall are dropped whole (Player.move), so the player
+    only ever stands on a lattice of `speed` pixels around its start.
+    """
+    player = state.player.rect
+    step = state.player.speed
+    seen = {player.topleft}
+    todo = deque([player.topleft])
+    while todo:
+        x, y = todo.popleft()
+        if rect.colliderect((x, y, player.w, player.h)):
+            return True
+        for nxt in ((x+step, y), (x-step, y), (x, y+step), (x, y-step)):
+            if nxt not in seen and not state.wall_grid.collides(pygame.Rect(nxt, player.size)):
+                seen.add(nxt)
+                todo.append(nxt)
+    return False
+
+
+def play_game(job):
+    """Play one seeded game; returns a record per level attempt."""
+    seed, mistake_rate, max_frames = job
+    random.seed(seed)
+    boards = game.LevelPrefetcher(seed=seed)  # never started: boards are made on demand from the seed
+    state = game.GameState(clock=game.SimClock(), boards=boards)
+    bot = Bot(state, random.Random(seed), mistake_rate)
+    records = []
+
+    def level_started():
+        return {"seed": seed, "level": state.level,
+                "board_seed": boards.board_seed(state.level, boards.next_index[state.level] - 1),
+                "start": state.clock.now(), "mistakes": bot.mistakes, "anomalies": board_anomalies(state, bot.grid)}
+
+    current = level_started()
+    for _ in range(max_frames):
+        inputs = bot.decide()
+        outcome = None
+        if bot.stuck and state.time_limit is None:
+            outcome = "stuck: " + bot.stuck  # nothing will ever end this level
+        elif state.time_limit is None and state.clock.now() - current["start"] > LEVEL_TIME_CAP:
+            outcome = "gave up"
+        else:
+            # a stuck bot on a timed level idles until the timeout restarts it
+            started, time_limit = state.level_start_time, state.time_limit
+            outcomes = state.step(inputs, game.TICK)
+            if any(s.current > s.target for s in state.slots) and "slot overshoot" not in current["anomalies"]:
+                current["anomalies"].append("slot overshoot")
+            if state.lives <= 0 and not outcomes and "out of lives without game over" not in current["anomalies"]:
+                current["anomalies"].append("out of lives without game over")
+            if outcomes:
+                outcome = outcomes[0]
+                if outcome in ("timeout", "game_over") and (time_limit is None or state.clock.now() - started <= time_limit):
+                    current["anomalies"].append(f"{outcome} before the time limit")
+                if bot.stuck:
+                    current["stuck"] = bot.stuck
+        if outcome is None:
+            continue
+        current.update(outcome=outcome, time=round(state.clock.now() - current["start"], 2),
+                       mistakes=bot.mistakes - current["mistakes"])
+        del current["start"]
+        records.append(current)
+        if outcome in ("victory", "game_over") or outcome.startswith("stuck") or outcome == "gave up":
+            return records
+        bot.new_level()
+        current = level_started()
+    current.update(outcome="frame limit", time=round(state.clock.now() - current["start"], 2),
+                   mistakes=bot.mistakes - current["mistakes"])
+    del current["start"]
+    records.append(current)
+    return records
+
+
+# --------- REPORT ----------
+def percentile(sorted_values, q):
+    return game.FrameProfiler.percentile(sorted_values, q) if sorted_values else None
+
+
+def fuzz(games, seed=0, mistake_rate=0.0, workers=None, max_frames=200000):
+    rng = random.Random(seed)
+    jobs = [(rng.getrandbits(32), mistake_rate, max_frames) for _ in range(games)]
+    levels = defaultdict(lambda: {"attempts": 0, "completed": 0, "failures": Counter(), "times": []})
+    anomalies = Counter()
+    failing = []
+    with Pool(workers, initializer=init_worker) as pool:
+        for records in pool.imap_unordered(play_game, jobs, chunksize=4):
+            for r in records:
+                lv = levels[r["level"]]
+                lv["attempts"] += 1
+                if r["outcome"] in ("level_complete", "victory"):
+                    lv["completed"] += 1
+                    lv["times"].append(r["time"])
+                else:
+                    lv["failures"][r["outcome"]] += 1
+                anomalies.update(r["anomalies"])
+                if r["anomalies"] or r["outcome"] not in ("level_complete", "victory"):
+                    failing.append(r)
+    report = {"games": games, "seed": seed, "mistake_rate": mistake_rate, "levels": {}, "anomalies": dict(anomalies)}
+    for level in sorted(levels):
+        lv = levels[level]
+        times = sorted(lv["times"])
+        report["levels"][level] = {
+            "attempts": lv["attempts"],
+            "completed": lv["completed"],
+            "failures": dict(lv["failures"]),
+            "seconds_to_complete": {"p50": percentile(times, 0.5), "p90": percentile(times, 0.9), "max": times[-1] if times else None},
+        }
+    failing.sort(key=lambda r: (r["level"], r["seed"]))
+    report["failing"] = failing
+    return report
+
+
+def print_report(report):
+    print(f"{'level':<7}{'tries':>7}{'done':>7}{'p50 s':>8}{'p90 s':>8}{'max s':>8}  failures")
+    for level, lv in report["levels"].items():
+        t = lv["seconds_to_complete"]
+        fmt = lambda x: "-" if x is None else f"{x:.0f}"
+        failures = ", ".join(f"{n} {why}" for why, n in sorted(lv["failures"].items(), key=lambda kv: -kv[1])) or "-"
+        print(f"{level:<7}{lv['attempts']:>7}{lv['completed']:>7}{fmt(t['p50']):>8}{fmt(t['p90']):>8}{fmt(t['max']):>8}  {failures}")
+    if report["anomalies"]:
+        print("\nanomalies:")
+        for what, n in sorted(report["anomalies"].items(), key=lambda kv: -kv[1]):
+            print(f"  {n:>6}  {what}")
+    if report["failing"]:
+        print(f"\nfailing levels (first {MAX_SHOWN} of {len(report['failing'])}):")
+        for r in report["failing"][:MAX_SHOWN]:
+            notes = "; ".join(r["anomalies"] + (["bot stuck: " + r["stuck"]] if "stuck" in r else []))
+            print(f"  level {r['level']} game seed {r['seed']} board seed {r['board_seed']}: {r['outcome']}"
+                  + (f" ({notes})" if notes else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz generated Treasure Coin Hunt levels with an auto-play bot")
+    parser.add_argument("--games", type=int, default=200, help="games to play (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed (default: 0)")
+    parser.add_argument("--mistakes", type=float, default=0.0, metavar="RATE",
+                        help="chance the bot types a wrong value for a coin (default: 0)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--json", metavar="PATH", help="also write the full report, every failing level included, as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = fuzz(args.games, seed=args.seed, mistake_rate=args.mistakes, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print_report(report)
+    print(f"\n{args.games} games in {elapsed:.1f}s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
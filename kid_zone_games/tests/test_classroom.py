@@ -0,0 +1,92 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import classroom
+import Treasure_Coin_Hunt as game
+
+
+class Boards:
+    """Seeded boards; remembers which threads asked for them."""
+
+    def __init__(self):
+        self.threads = set()
+
+    def get(self, level):
+        self.threads.add(threading.current_thread())
+        return game.generate_board(level, level)
+
+    def want(self, *levels):
+        pass
+
+
+async def with_server(boards, client):
+    server = classroom.ClassroomServer(boards)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    ticker = asyncio.ensure_future(server.run())
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+        try:
+            return await asyncio.wait_for(client(server, reader, writer), 10)
+        finally:
+            writer.close()
+    finally:
+        ticker.cancel()
+        listener.close()
+
+
+async def reply(reader, key):
+    """The next message from the server that has `key`."""
+    while True:
+        msg = json.loads(await reader.readline())
+        if key in msg:
+            return msg[key]
+
+
+def test_parse_point_clamps_to_the_window():
+    assert classroom.parse_point([1e10, -5]) == (game.WIDTH - 1, 0)
+    with pytest.raises(ValueError):
+        classroom.parse_point([float("inf"), 0])
+    with pytest.raises(ValueError):
+        classroom.parse_point([float("nan"), 0])
+
+
+def test_an_oversized_line_is_refused_and_the_session_goes_on():
+    async def client(server, reader, writer):
+        await reply(reader, "hello")
+        writer.write(b'{"input": {"dx": 1}, "pad": "' + b"x" * 100_000 + b'"}\n')
+        error = await reply(reader, "error")
+        writer.write(b'{"cmd": "stats"}\n')
+        return error, await reply(reader, "stats")
+
+    error, stats = asyncio.run(with_server(Boards(), client))
+    assert "too long" in error
+    assert stats["sessions"] == 1
+
+
+def test_games_are_built_off_the_event_loop():
+    boards = Boards()
+
+    async def client(server, reader, writer):
+        await reply(reader, "hello")
+        await reply(reader, "state")  # the first game is built and ticking
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(with_server(boards, client))
+    assert boards.threads and loop_thread not in boards.threads
+
+
+def test_a_failing_session_is_dropped_and_the_rest_keep_ticking():
+    async def client(server, reader, writer):
+        await reply(reader, "hello")
+        await reply(reader, "state")
+        (session,) = server.sessions.values()
+        session.state.step = None  # the next tick raises
+        ticks = server.ticks
+        while server.ticks < ticks + 3:
+            await asyncio.sleep(game.TICK)
+        return server.sessions
+
+    assert asyncio.run(with_server(Boards(), client)) == {}
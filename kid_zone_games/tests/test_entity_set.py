@@ -0,0 +1,80 @@
+import pytest
+
+import Treasure_Coin_Hunt as game
+
+
+class Thing:
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, other):
+        return True  # membership must go by identity, not equality
+
+    __hash__ = object.__hash__
+
+
+def names(entities):
+    return [e.name for e in entities]
+
+
+def test_keeps_insertion_order():
+    a, b, c = Thing("a"), Thing("b"), Thing("c")
+    entities = game.EntitySet([a, b])
+    entities.add(c)
+    assert names(entities) == ["a", "b", "c"]
+    assert len(entities) == 3
+    assert entities.at(0) is a and entities.at(2) is c
+
+
+def test_membership_is_by_identity():
+    a = Thing("a")
+    entities = game.EntitySet([a])
+    assert a in entities
+    assert Thing("a") not in entities
+
+
+def test_remove_and_discard():
+    a, b, c = Thing("a"), Thing("b"), Thing("c")
+    entities = game.EntitySet([a, b, c])
+    entities.remove(b)
+    assert names(entities) == ["a", "c"]
+    assert names(entities.active()) == ["a", "c"]
+    with pytest.raises(KeyError):
+        entities.remove(b)
+    entities.discard(b)  # already gone: no error
+    entities.discard(a)
+    assert names(entities) == ["c"]
+
+
+def test_active_subset():
+    a, b, c = Thing("a"), Thing("b"), Thing("c")
+    entities = game.EntitySet([a, b, c], active=[a, c])
+    assert names(entities.active()) == ["a", "c"]
+    entities.deactivate(a)
+    assert names(entities.active()) == ["c"]
+    assert a in entities
+    entities.activate(b)
+    assert names(entities.active()) == ["c", "b"]
+    entities.activate(Thing("d"))  # not a member: ignored
+    assert names(entities.active()) == ["c", "b"]
+    entities.remove(c)
+    assert names(entities.active()) == ["b"]
+
+
+def test_add_makes_an_entity_active():
+    a = Thing("a")
+    entities = game.EntitySet(active=[])
+    entities.add(a)
+    assert names(entities.active()) == ["a"]
+
+
+def test_inventory_version_changes_on_add_and_remove():
+    coin = game.Coin(0, 0, 5)
+    inventory = game.Inventory()
+    versions = [inventory.version]
+    inventory.add(coin)
+    versions.append(inventory.version)
+    inventory.remove(coin)
+    versions.append(inventory.version)
+    assert len(set(versions)) == 3
+    assert len(inventory) == 0
@@ -0,0 +1,83 @@
+import copy
+import json
+import sqlite3
+
+import Treasure_Coin_Hunt as game
+
+
+def play(path, *events):
+    log = game.EventLog(str(path)).start()
+    log.ready.wait()
+    for kind, data in events:
+        log.log(kind, **data)
+    log.close()
+    return log
+
+
+def blank_unlocks():
+    unlocks = copy.deepcopy(game.UNLOCKS)
+    unlocks.update(chests_unlocked=0, stars=0, badges=[], trophies=[])
+    return unlocks
+
+
+SESSION = [
+    ("level", {"outcome": "level_complete", "stars": 3}),
+    ("answer", {"correct": True}),
+    ("badge", {"name": "Quick Counter"}),
+    ("level", {"outcome": "victory", "stars": 7}),
+]
+
+
+def test_totals_carry_over_to_the_next_session(tmp_path):
+    path = tmp_path / "progress.db"
+    assert play(path).saved == {"chests_unlocked": 0, "badges": [], "trophies": [], "stars": 0}
+    play(path, *SESSION)
+    play(path, ("badge", {"name": "Quick Counter"}), ("trophy", {"name": "Gold"}),
+         ("level", {"outcome": "game_over", "stars": 2}))
+    saved = play(path).saved
+    assert saved == {"chests_unlocked": 2, "badges": ["Quick Counter"], "trophies": ["Gold"], "stars": 9}
+
+
+def test_restore_replaces_rather_than_adds(tmp_path):
+    path = tmp_path / "progress.db"
+    play(path, *SESSION)
+    unlocks = blank_unlocks()
+    for _ in range(3):  # a resident host restores once per session
+        play(path).restore(unlocks)
+    assert unlocks["chests_unlocked"] == 2
+    assert unlocks["stars"] == 7
+    assert unlocks["badges"] == ["Quick Counter"]
+
+
+def test_progress_row_follows_every_batch(tmp_path):
+    path = tmp_path / "progress.db"
+    play(path, *SESSION)
+    db = sqlite3.connect(str(path))
+    last_event, chests, stars, badges = db.execute(
+        "SELECT last_event, chests, stars, badges FROM progress").fetchone()
+    assert last_event == db.execute("SELECT max(id) FROM events").fetchone()[0]
+    assert (chests, stars, json.loads(badges)) == (2, 7, ["Quick Counter"])
+    db.close()
+
+
+def test_databases_without_a_progress_table_are_caught_up(tmp_path):
+    path = tmp_path / "progress.db"
+    db = sqlite3.connect(str(path))
+    db.execute(game.EventLog.SCHEMA[0])
+    db.executemany("INSERT INTO events (session, time, kind, data) VALUES ('old', 0, ?, ?)",
+                   [(kind, json.dumps(data)) for kind, data in SESSION])
+    db.commit()
+    db.close()
+    assert play(path).saved["chests_unlocked"] == 2
+    assert play(path, ("level", {"outcome": "level_complete"})).saved["chests_unlocked"] == 2
+    assert play(path).saved["chests_unlocked"] == 3
+
+
+def test_startup_reads_only_the_progress_row(tmp_path):
+    path = tmp_path / "progress.db"
+    play(path, *SESSION)
+    db = sqlite3.connect(str(path))
+    db.execute("UPDATE events SET data = 'not json'")  # the history is not decoded again
+    db.commit()
+    db.close()
+    assert play(path).saved["stars"] == 7
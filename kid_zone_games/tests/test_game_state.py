@@ -0,0 +1,57 @@
+import random
+
+import pygame
+
+import Treasure_Coin_Hunt as game
+
+
+def new_state(seed=1):
+    random.seed(seed)
+    return game.GameState(clock=game.SimClock())
+
+
+def test_step_reports_its_phases():
+    state = new_state()
+    phases = []
+    state.step(game.FrameInput(1, 0), game.TICK, phases.append)
+    assert phases == ["move", "pickup", "level"]
+
+
+def test_step_leaves_the_profiler_alone():
+    state = new_state()
+    game.PROFILER.start_frame()
+    game.PROFILER.recording = True
+    before = list(game.PROFILER.current)
+    try:
+        state.step(game.FrameInput(1, 0), game.TICK)
+        assert game.PROFILER.current == before
+    finally:
+        game.PROFILER.recording = False
+
+
+def typing_popup():
+    state = new_state()
+    coin = next(c for c in state.coins.active() if not c.fake)
+    state.pick_coin(coin)
+    state.step(game.FrameInput(actions=[("choose", "type")]), game.TICK)
+    assert state.inputbox.active
+    return state, coin
+
+
+def key(k, text=""):
+    return pygame.event.Event(pygame.KEYDOWN, key=k, unicode=text, mod=0)
+
+
+def test_a_key_press_types_one_character():
+    state, coin = typing_popup()
+    inputs = game.FrameInput(mouse=(0, 0))
+    assert game.handle_events(state, [key(pygame.K_7, "7")], inputs)
+    assert state.inputbox.text == "7"
+
+
+def test_typed_answer_is_submitted_once():
+    state, coin = typing_popup()
+    inputs = game.FrameInput(mouse=(0, 0))
+    typed = [key(getattr(pygame, f"K_{ch}"), ch) for ch in str(coin.value)]
+    game.handle_events(state, typed + [key(pygame.K_RETURN, "\r")], inputs)
+    assert inputs.actions == [("answer", str(coin.value))]
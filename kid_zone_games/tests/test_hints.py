@@ -0,0 +1,61 @@
+import random
+
+import pygame
+import pytest
+
+import Treasure_Coin_Hunt as game
+
+
+def hinting_state(seed=3):
+    random.seed(seed)
+    return game.GameState(clock=game.SimClock(), hint_after=game.HINT_AFTER)
+
+
+def test_cell_does_not_wrap_round_the_board():
+    # the player hugs the left edge inside a wall; the cell "left" of column 0
+    # is the last cell of the row above, on the far side of the board
+    walls = [game.Wall(0, 60, 40, 100)]
+    engine = game.HintEngine(game.ReachMap(walls))
+    player = game.Player(0, 100)
+    row = player.rect.y // game.REACH_CELL
+    assert row * engine.cols - 1 in engine.index  # the wrapped-to cell is walkable
+    assert engine.cell(player) is None
+
+
+def test_board_reach_map_is_reused():
+    state = hinting_state()
+    board = game.generate_board(1, 42)
+    state.boards = type("Boards", (), {"get": lambda self, level: board, "want": lambda self, *levels: None})()
+    state.load_board()
+    assert state.hints.reach is board.reach
+
+
+def test_level_start_does_no_hint_work():
+    state = hinting_state()
+    for _ in range(5):
+        state.step(game.FrameInput(1, 0), game.TICK)
+    assert state.hints.field is None
+
+
+@pytest.mark.skipif(game.np is None, reason="needs numpy")
+def test_numpy_bfs_matches_the_plain_one():
+    state = hinting_state()
+    engine = state.hints
+    for coin in list(state.coins)[:3]:
+        sources = engine.coin_sources(coin)
+        assert engine._bfs_np(sources) == engine._bfs(sources)
+
+
+def test_walking_hint_leads_to_a_helpful_coin():
+    state = hinting_state()
+    hint = state.hints.hint(state)
+    assert hint is not None and hint[0] == "walk"
+    _, points, coin = hint
+    slot, hand, board = state.hints.helpful
+    assert coin in board
+    # every step moves one cell, and the player standing at the end touches the coin
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        assert abs(x1 - x0) + abs(y1 - y0) == game.REACH_CELL
+    half = state.player.size // 2 + game.REACH_CELL // 2
+    end = pygame.Rect(points[-1][0] - half, points[-1][1] - half, state.player.size, state.player.size)
+    assert end.colliderect(coin.rect)
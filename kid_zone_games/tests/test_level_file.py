@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+import Treasure_Coin_Hunt as game
+
+
+def board_fields(board):
+    walls, coins, slots = board
+    return ([tuple(w.rect) for w in walls],
+            [(c.x, c.y, c.value, c.kind, c.fake) for c in coins],
+            [s.target for s in slots])
+
+
+@pytest.fixture(scope="module")
+def records():
+    """{level: [packed record, ...]}, two seeded boards per level."""
+    return {level: [game.pack_board(seed, game.generate_board(level, seed)) for seed in (level * 10, level * 10 + 1)]
+            for level in (1, 2, 3)}
+
+
+@pytest.fixture
+def level_file(tmp_path, records):
+    path = str(tmp_path / "levels.bin")
+    game.write_level_file(path, records)
+    levels = game.LevelFile(path, rng=random.Random(5))
+    yield levels
+    levels.close()
+
+
+def test_record_layout_is_fixed_size():
+    # seed, three counts, then every wall/coin/slot field padded to the maximum
+    assert game.LEVEL_RECORD.size == (8 + 3 + 4 * 2 * game.MAX_FILE_WALLS
+                                      + (2 + 2 + 2 + 1) * game.MAX_FILE_COINS + 2 * game.MAX_FILE_SLOTS)
+
+
+@pytest.mark.parametrize("level", range(1, 6))
+def test_pack_unpack_round_trip(level):
+    board = game.generate_board(level, seed=77)
+    record = game.pack_board(77, board)
+    assert len(record) == game.LEVEL_RECORD.size
+    seed, unpacked = game.unpack_board(level, record)
+    assert seed == 77
+    assert board_fields(unpacked) == board_fields(board)
+
+
+def test_unpack_reads_a_record_at_an_offset(records):
+    data = b"".join(records[2])
+    seed, board = game.unpack_board(2, data, game.LEVEL_RECORD.size)
+    assert seed == 21
+    assert board_fields(board) == board_fields(game.unpack_board(2, records[2][1])[1])
+
+
+def test_level_file_loads_every_record(level_file, records):
+    for level, packed in records.items():
+        assert level_file.count(level) == len(packed)
+        for i, record in enumerate(packed):
+            assert board_fields(level_file.load(level, i)) == board_fields(game.unpack_board(level, record)[1])
+
+
+def test_level_file_rejects_missing_boards(level_file):
+    assert level_file.count(4) == 0
+    with pytest.raises(IndexError):
+        level_file.load(1, 2)
+    with pytest.raises(IndexError):
+        level_file.load(4, 0)
+
+
+def test_missing_levels_are_generated_from_the_file_rng(tmp_path, records):
+    path = str(tmp_path / "levels.bin")
+    game.write_level_file(path, records)
+    boards = []
+    for _ in range(2):
+        levels = game.LevelFile(path, rng=random.Random(9))
+        boards.append(board_fields(levels.get(4)))
+        levels.close()
+    assert boards[0] == boards[1]
+    assert len(boards[0][2]) == game.slot_count_for_level(4)
+
+
+def test_level_file_rejects_other_files(tmp_path):
+    path = tmp_path / "levels.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        game.LevelFile(str(path))
@@ -0,0 +1,121 @@
+import itertools
+import random
+
+import pytest
+
+import Treasure_Coin_Hunt as game
+
+
+def coins(values, fakes=()):
+    return [game.Coin(0, 0, v) for v in values] + [game.Coin(0, 0, v, fake=True) for v in fakes]
+
+
+def brute_force_fill(values, targets):
+    """Try every assignment of coins to a target (or to no target)."""
+    for assignment in itertools.product(range(len(targets) + 1), repeat=len(values)):
+        sums = [0] * (len(targets) + 1)
+        for value, slot in zip(values, assignment):
+            sums[slot] += value
+        if sums[:-1] == list(targets):
+            return True
+    return False
+
+
+@pytest.mark.parametrize("values, targets, expected", [
+    ([10, 5, 5], [10, 10], True),
+    ([10, 5, 5], [15, 10], False),
+    ([20, 10, 5], [25, 15], False),  # enough in total, but both targets need the 5
+    ([20, 10, 5, 2, 1], [23, 15], True),
+    ([20, 10, 5, 2, 1], [22, 15], True),
+    ([50, 20, 20, 10], [40, 50], True),
+    ([3, 3], [6], True),
+    ([], [], True),
+    ([1, 2], [], True),
+    ([5], [4], False),
+])
+def test_can_fill_targets(values, targets, expected):
+    assert game.can_fill_targets(values, targets) is expected
+
+
+def test_can_fill_targets_agrees_with_brute_force():
+    rng = random.Random(7)
+    for _ in range(200):
+        values = [rng.choice((1, 2, 5, 10, 20)) for _ in range(rng.randint(0, 6))]
+        targets = [rng.randint(1, 30) for _ in range(rng.randint(1, 3))]
+        assert game.can_fill_targets(values, targets) == brute_force_fill(values, targets), (values, targets)
+
+
+def test_split_targets_pays_each_target_from_disjoint_coins():
+    rng = random.Random(11)
+    for _ in range(200):
+        values = [rng.choice((1, 2, 5, 10, 20)) for _ in range(rng.randint(1, 8))]
+        targets = [rng.randint(1, 40) for _ in range(rng.randint(1, 3))]
+        groups = game.split_targets(values, targets)
+        if not game.can_fill_targets(values, targets):
+            assert groups is None
+            continue
+        assert [sum(g) for g in groups] == targets
+        left = list(values)
+        for value in itertools.chain.from_iterable(groups):
+            left.remove(value)  # raises if a coin is used twice
+
+
+def test_split_targets_rejects_negative_targets():
+    assert game.split_targets([5, 5], [-5, 15]) is None
+
+
+def test_level_is_solvable_ignores_fake_coins():
+    slots = game.make_slots([10], 1)
+    assert game.level_is_solvable(coins([5, 5]), slots)
+    assert not game.level_is_solvable(coins([5], fakes=[5]), slots)
+
+
+@pytest.mark.parametrize("level", range(1, 6))
+def test_choose_slot_targets_returns_fillable_targets(level):
+    rng = random.Random(level)
+    for _ in range(20):
+        board = coins([rng.choice(game.LEVEL_DENOMS[min(level, 4)]) for _ in range(rng.randint(4, 10))])
+        slot_count = game.slot_count_for_level(level)
+        targets = game.choose_slot_targets(board, level, slot_count, rng)
+        assert len(targets) == slot_count
+        assert game.can_fill_targets([c.value for c in board if not c.fake], targets)
+
+
+def test_choose_slot_targets_needs_a_real_coin_per_slot():
+    with pytest.raises(game.NotEnoughCoins):
+        game.choose_slot_targets(coins([10], fakes=[10, 10]), 2, 2)
+
+
+@pytest.mark.parametrize("values", [[7, 11, 13], [7, 11, 13, 3, 3, 3, 3]])
+def test_choose_slot_targets_last_resort_keeps_every_slot(monkeypatch, values):
+    # no table target fits these values, and the repair is made to fail
+    monkeypatch.setattr(game, "repair_coin_values", lambda *args: False)
+    board = coins(values, fakes=[10])
+    targets = game.choose_slot_targets(board, 4, 3, random.Random(3))
+    assert len(targets) == 3
+    assert all(t > 0 for t in targets)
+    assert game.can_fill_targets(values, targets)
+
+
+def test_repair_coin_values_makes_targets_payable():
+    board = coins([1, 1, 1, 1, 1, 1], fakes=[50])
+    assert game.repair_coin_values(board, [15, 20], [1, 2, 5, 10, 20], random.Random(0))
+    assert game.can_fill_targets([c.value for c in board if not c.fake], [15, 20])
+    assert [c.value for c in board if c.fake] == [50]
+
+
+def test_repair_coin_values_leaves_coins_alone_when_short():
+    board = coins([1, 1])
+    assert not game.repair_coin_values(board, [15, 20], [1, 2, 5, 10, 20], random.Random(0))
+    assert [c.value for c in board] == [1, 1]
+
+
+@pytest.mark.parametrize("level", range(1, 6))
+def test_seeded_boards_are_valid_and_reproducible(level):
+    board = game.generate_board(level, seed=1000 + level)
+    walls, board_coins, slots = board
+    assert len(slots) == game.slot_count_for_level(level)
+    assert game.validate_board(level, board)
+    again = game.generate_board(level, seed=1000 + level)
+    assert [(c.x, c.y, c.value, c.fake) for c in board_coins] == [(c.x, c.y, c.value, c.fake) for c in again[1]]
+    assert [s.target for s in slots] == [s.target for s in again[2]]
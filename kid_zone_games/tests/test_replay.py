@@ -0,0 +1,108 @@
+import pygame
+import pytest
+
+import Treasure_Coin_Hunt as game
+
+RIGHT, DOWN = game.KEY_BITS[pygame.K_RIGHT], game.KEY_BITS[pygame.K_DOWN]
+
+
+def key(k, text=""):
+    return pygame.event.Event(pygame.KEYDOWN, key=k, unicode=text, mod=0)
+
+
+def click(kind, pos, button=1):
+    return pygame.event.Event(kind, button=button, pos=pos)
+
+
+def as_tuple(event):
+    return (event.type, getattr(event, "key", None), getattr(event, "unicode", None),
+            getattr(event, "button", None), getattr(event, "pos", None))
+
+
+FRAMES = [  # (ms, events, held key bitmask, mouse)
+    (16, [], 0, (10, 10)),
+    (17, [key(pygame.K_SPACE, " ")], RIGHT, (10, 10)),
+    (16, [], RIGHT | DOWN, (400, 300)),
+    (300, [click(pygame.MOUSEBUTTONDOWN, (5, 6)), click(pygame.MOUSEBUTTONUP, (950, 630), 3)], DOWN, (950, 630)),
+    (16, [key(pygame.K_3, "3"), key(pygame.K_KP_ENTER, "é")], 0, (950, 630)),
+    (16, [pygame.event.Event(pygame.ACTIVEEVENT, gain=1, state=1)], 0, (0, 0)),
+]
+
+
+def test_recording_plays_back_frame_for_frame(tmp_path):
+    path = str(tmp_path / "session.tchr")
+    recorder = game.InputRecorder(path, 1234)
+    for ms, events, mask, mouse in FRAMES:
+        recorder.record(ms, events, game.RecordedKeys(mask), mouse)
+    recorder.close()
+
+    source = game.ReplayInput(path)
+    assert source.seed == 1234
+    for ms, events, mask, mouse in FRAMES:
+        assert source.tick() == ms
+        played, keys, played_mouse = source.poll()
+        assert [as_tuple(e) for e in played] == [as_tuple(e) for e in events if e.type in game.EVENT_CODES]
+        assert keys.mask == mask
+        assert played_mouse == mouse
+    source.tick()
+    assert [e.type for e in source.poll()[0]] == [pygame.QUIT]
+    assert source.frames == len(FRAMES)
+
+
+def test_idle_frames_cost_two_bytes(tmp_path):
+    path = tmp_path / "idle.tchr"
+    recorder = game.InputRecorder(str(path), 1)
+    recorder.record(16, [], game.RecordedKeys(), (0, 0))
+    recorder.file.flush()
+    start = path.stat().st_size
+    for _ in range(10):
+        recorder.record(16, [], game.RecordedKeys(), (0, 0))
+    recorder.close()
+    assert path.stat().st_size - start == 20
+
+
+def test_replay_rejects_other_files(tmp_path):
+    path = tmp_path / "session.tchr"
+    path.write_bytes(game.REPLAY_HEADER.pack(b"NOPE", game.REPLAY_VERSION, 0))
+    with pytest.raises(ValueError):
+        game.ReplayInput(str(path))
+
+
+def scripted_session(monkeypatch, frames):
+    """Feed main() a fixed session: start the game, then walk a square."""
+    frame = [0]
+    real_get = pygame.event.get
+
+    def get(*args, **kwargs):
+        events = real_get(*args, **kwargs)
+        frame[0] += 1
+        if frame[0] == 2:
+            events.append(key(pygame.K_SPACE, " "))
+        if frame[0] > frames:
+            events.append(pygame.event.Event(pygame.QUIT))
+        return events
+
+    def pressed():
+        return game.RecordedKeys((RIGHT, DOWN, game.KEY_BITS[pygame.K_LEFT], game.KEY_BITS[pygame.K_UP])[frame[0] // 40 % 4])
+
+    monkeypatch.setattr(pygame.event, "get", get)
+    monkeypatch.setattr(pygame.key, "get_pressed", pressed)
+    monkeypatch.setattr(pygame.mouse, "get_pos", lambda: (frame[0] % game.WIDTH, 300))
+
+
+def snapshot(state):
+    return (state.level, state.score, state.lives, state.player.rect.topleft, state.player.coins_collected,
+            state.clock.now(), sorted((c.x, c.y, c.value) for c in state.coins.active()))
+
+
+def test_recorded_session_replays_to_the_same_state(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.tchr")
+    scripted_session(monkeypatch, 120)
+    played = game.main(render_mode="none", seed=-5, record_path=path, progress_path=None, hint_after=None)
+    monkeypatch.undo()
+
+    replayed, frames, _ = game.replay(path)
+    assert frames == 121
+    assert game.ReplayInput(path).seed == -5 & 0xFFFFFFFFFFFFFFFF
+    assert snapshot(replayed) == snapshot(played)
+    assert played.clock.now() > 0